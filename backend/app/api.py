@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+
+from backend.app.calendar_export import FORMATS, CalendarCache, find_area
+from backend.app.db.init_db import missing_schema
+from backend.app.db.snapshot import current_snapshot
+from backend.app.next_pickup import DB_PATH, collection_events_between, next_pickup, next_pickups_bulk
+from backend.app.pool import ReadOnlyPool
+from backend.app.query import find_items_bulk, forget_item_index, get_item_index
+from backend.app.virtual_events import ENV_OPEN_ENDED, forget_virtual_schedule
+
+if TYPE_CHECKING:
+    from backend.app.inference import LabelMap, Predictor
+
+# 環境変数で上書きできる設定
+# NONOICHI_DB: DBファイル / NONOICHI_DB_IMMUTABLE=1: 実行中に書き換えないDB（スナップショット）
+# NONOICHI_SNAPSHOTS: スナップショットのディレクトリ（指定すると CURRENT の版を開き、更新されたら切り替える）
+# NONOICHI_SNAPSHOT_POLL: CURRENT を見に行く間隔（秒）
+# NONOICHI_POOL_SIZE: 接続プールの本数
+# NONOICHI_OPEN_ENDED=1: 最後の版の期間を過ぎても次の収集日をルールで計算する（virtual_events.py）
+# NONOICHI_MODEL: 画像分類モデル（モジュール:クラス）。指定しなければ /predict は無効（503）
+# NONOICHI_INFER_WORKERS: 推論プロセス数（既定: NONOICHI_MODEL があれば 1、なければ 0）
+# NONOICHI_PREDICT_CACHE: 推論結果キャッシュの件数（0 で無効） / NONOICHI_PREDICT_CACHE_TTL: 有効秒数
+ENV_DB = "NONOICHI_DB"
+ENV_IMMUTABLE = "NONOICHI_DB_IMMUTABLE"
+ENV_SNAPSHOTS = "NONOICHI_SNAPSHOTS"
+ENV_SNAPSHOT_POLL = "NONOICHI_SNAPSHOT_POLL"
+ENV_POOL_SIZE = "NONOICHI_POOL_SIZE"
+ENV_MODEL = "NONOICHI_MODEL"
+ENV_INFER_WORKERS = "NONOICHI_INFER_WORKERS"
+ENV_PREDICT_CACHE = "NONOICHI_PREDICT_CACHE"
+ENV_PREDICT_CACHE_TTL = "NONOICHI_PREDICT_CACHE_TTL"
+
+# /predict で受け取る画像の上限
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+# まとめて引くときの上限（写真1枚・買い物リスト1つ分を想定）
+MAX_BULK_NAMES = 100
+
+
+@dataclass
+class BulkLookupRequest:
+    names: list[str] = field(default_factory=list)
+    area: str | None = None   # 指定すると次の収集日も返す
+    now: str | None = None    # YYYY-MM-DDTHH:MM（テスト用）
+
+
+def open_db(path: str | Path, immutable: bool) -> tuple[ReadOnlyPool, CalendarCache]:
+    pool = ReadOnlyPool(path, size=int(os.environ.get(ENV_POOL_SIZE, "0")) or None, immutable=immutable)
+    try:
+        with pool.connection() as conn:
+            # 古い形のDB（apply_schema 前）は実行時のSQLが通らないので、開くときに断る
+            missing = missing_schema(conn)
+            if missing:
+                raise RuntimeError(
+                    f"{Path(path).name} needs a schema upgrade (missing {', '.join(missing)}); "
+                    "run python -m backend.app.db.init_db or backend.app.db.seed_schedule"
+                )
+            # 品目の索引（あいまい検索用も）を起動時に作っておき、最初のリクエストを待たせない
+            get_item_index(conn).warm()
+            # 全地区の収集カレンダーも先に組み立てておく
+            calendars = CalendarCache()
+            calendars.warm(conn)
+    except BaseException:
+        pool.close()
+        raise
+    return pool, calendars
+
+
+def open_snapshot(
+    path: Path, predictor: Predictor | None
+) -> tuple[ReadOnlyPool, CalendarCache, LabelMap | None]:
+    # 切り替え先の版を開き、推論のラベル対応（model_label_maps）もその版から読み直す
+    pool, calendars = open_db(path, True)
+    label_map = None
+    try:
+        if predictor is not None:
+            with pool.connection() as conn:
+                label_map = predictor.read_label_map(conn)
+    except BaseException:
+        pool.close()
+        raise
+    return pool, calendars, label_map
+
+
+async def watch_snapshots(app: FastAPI, directory: Path, interval: float) -> None:
+    """
+    CURRENT が別の版を指したら、新しい版を裏で開いて索引を温めてから差し替える。
+    差し替え前に始まったリクエストは古いプールの接続で最後まで処理される（返ってきた接続から閉じる）。
+    """
+    while True:
+        await asyncio.sleep(interval)
+        path = current_snapshot(directory)
+        if path is None or path.resolve() == app.state.pool.path.resolve():
+            continue
+        predictor: Predictor | None = app.state.predictor
+        try:
+            pool, calendars, label_map = await run_in_threadpool(open_snapshot, path, predictor)
+        except (OSError, RuntimeError, sqlite3.Error) as e:
+            print(f"⚠️ snapshot switch failed: {path.name}: {e}")
+            continue
+        old = app.state.pool
+        app.state.pool, app.state.calendars = pool, calendars
+        if predictor is not None:
+            predictor.label_map = label_map
+        old.close()
+        forget_item_index(str(old.path.resolve()))
+        forget_virtual_schedule(str(old.path.resolve()))
+        print(f"✅ switched to snapshot {path.name}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    snapshots = os.environ.get(ENV_SNAPSHOTS)
+    watcher = None
+    if snapshots:
+        # スナップショットは書き換わらないので immutable で開く（ロックも変更確認もしない）
+        path = current_snapshot(Path(snapshots))
+        if path is None:
+            raise RuntimeError(f"no snapshot published in {snapshots} (run backend.app.db.snapshot)")
+        app.state.pool, app.state.calendars = open_db(path, True)
+        interval = float(os.environ.get(ENV_SNAPSHOT_POLL, "2"))
+        watcher = asyncio.create_task(watch_snapshots(app, Path(snapshots), interval))
+    else:
+        app.state.pool, app.state.calendars = open_db(
+            os.environ.get(ENV_DB, str(DB_PATH)),
+            os.environ.get(ENV_IMMUTABLE) == "1",
+        )
+    pool = app.state.pool
+
+    # 推論用のプロセスプール（model_label_maps もここでメモリに読む）
+    # モデルを明示したときだけ /predict を有効にする（スタブモデルを本番で返さない）
+    predictor = None
+    model_spec = os.environ.get(ENV_MODEL)
+    infer_workers = int(os.environ.get(ENV_INFER_WORKERS, "1" if model_spec else "0"))
+    if infer_workers > 0:
+        if not model_spec:
+            raise RuntimeError(f"{ENV_INFER_WORKERS}={infer_workers} needs {ENV_MODEL} (module:Class)")
+        # 画像まわり（numpy / Pillow）は /predict を使うときだけ読む
+        from backend.app.inference import Predictor
+        from backend.app.phash_cache import PHashCache
+
+        capacity = int(os.environ.get(ENV_PREDICT_CACHE, "4096"))
+        cache = None
+        if capacity > 0:
+            cache = PHashCache(capacity=capacity, ttl=float(os.environ.get(ENV_PREDICT_CACHE_TTL, "86400")))
+        predictor = Predictor(model_spec, workers=infer_workers, cache=cache)
+        with pool.connection() as conn:
+            await predictor.start(conn)
+    app.state.predictor = predictor
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if predictor is not None:
+            await predictor.close()
+        app.state.pool.close()
+
+
+app = FastAPI(title="nonoichi-waste-app", lifespan=lifespan)
+
+
+def _pool(request: Request) -> ReadOnlyPool:
+    return request.app.state.pool
+
+
+@app.get("/health")
+async def health(request: Request):
+    # db: 今開いているDB（スナップショットなら版ごとのファイル名）
+    return {"status": "ok", "db": _pool(request).path.name}
+
+
+# 品目の検索もスレッドプール上で処理する（接続を借りるのは待つことがあり、
+# DBが変わった直後は索引の作り直しでSQLを引くので、イベントループ上では動かさない）
+@app.get("/items/lookup")
+def lookup_item(request: Request, name: str = Query(..., min_length=1)):
+    # 完全一致 → 別名 → 読み（ひらがな/カタカナ/ローマ字）の順に探す
+    with _pool(request).connection() as conn:
+        hit = get_item_index(conn).lookup(name)
+    if hit is None:
+        raise HTTPException(status_code=404, detail=f"Item not found: {name}")
+    return JSONResponse(asdict(hit))
+
+
+@app.get("/items/suggest")
+def suggest(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=50),
+):
+    # 前方一致の候補を優先し、足りなければあいまい検索で補う
+    with _pool(request).connection() as conn:
+        index = get_item_index(conn)
+        hits = index.prefix(q, k=k)
+        if len(hits) < k:
+            seen = {id(h) for h in hits}
+            hits += [h for h in index.suggest(q, k=k) if id(h) not in seen][: k - len(hits)]
+    return JSONResponse([asdict(h) for h in hits])
+
+
+# 次の収集日はSQLを引くので、スレッドプール上で処理する（接続はプールから借りる）
+@app.get("/next_pickup")
+def get_next_pickup(
+    request: Request,
+    area: str = Query(..., min_length=1),
+    category: str | None = None,
+    item: str | None = None,
+    now: str | None = Query(None, description="YYYY-MM-DDTHH:MM（テスト用）"),
+):
+    if not item and not category:
+        raise HTTPException(status_code=422, detail="Either item or category is required")
+    with _pool(request).connection() as conn:
+        if item:
+            hit = get_item_index(conn).lookup(item)
+            if hit is None:
+                raise HTTPException(status_code=404, detail=f"Item not found: {item}")
+            category = hit.category
+        try:
+            result = next_pickup(conn, area, category, now=now)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid now: {now}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="No upcoming pickup found.")
+    return JSONResponse(asdict(result))
+
+
+# 複数の品目（と次の収集日）を1回で引く。結果は names と同じ順
+@app.post("/items/bulk")
+def lookup_items_bulk(request: Request, body: BulkLookupRequest):
+    if len(body.names) > MAX_BULK_NAMES:
+        raise HTTPException(status_code=422, detail=f"Too many names (max {MAX_BULK_NAMES})")
+    with _pool(request).connection() as conn:
+        hits = find_items_bulk(conn, body.names)
+        pickups = [None] * len(hits)
+        if body.area:
+            try:
+                pickups = next_pickups_bulk(
+                    conn, body.area, [h.category if h else None for h in hits], now=body.now
+                )
+            except ValueError:
+                raise HTTPException(status_code=422, detail=f"Invalid now: {body.now}")
+    return JSONResponse([
+        {
+            "query": name,
+            "item": asdict(hit) if hit else None,
+            "next_pickup": asdict(pickup) if pickup else None,
+        }
+        for name, hit, pickup in zip(body.names, hits, pickups)
+    ])
+
+
+# 期間内の収集日（collection_events を作っていないDBではルールから計算する）
+@app.get("/areas/{area}/events")
+def area_events(
+    request: Request,
+    area: str,
+    start: str = Query(..., description="YYYY-MM-DD"),
+    end: str = Query(..., description="YYYY-MM-DD"),
+    category: str | None = None,
+):
+    try:
+        with _pool(request).connection() as conn:
+            rows = collection_events_between(conn, area, start, end, category)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid start/end")
+    return JSONResponse([
+        {"category": name, "collection_date": d, "deadline_time": deadline} for name, d, deadline in rows
+    ])
+
+
+# 地区の収集カレンダー（.ics / .json）。出力済みのバイト列を返し、If-None-Match が合えば 304
+@app.get("/areas/{area}/calendar.{fmt}")
+def area_calendar(request: Request, area: str, fmt: str):
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown format: {fmt}")
+    calendars: CalendarCache = request.app.state.calendars
+    with _pool(request).connection() as conn:
+        found = find_area(conn, area)
+        if found is None:
+            raise HTTPException(status_code=404, detail=f"Area not found: {area}")
+        area_id, area_name = found
+        etag = calendars.current_etag(conn, area_id, fmt)
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        rendered = calendars.get(conn, area_id, area_name, fmt)
+    return Response(rendered.body, media_type=rendered.media_type, headers={**headers, "ETag": rendered.etag})
+
+
+@app.post("/predict")
+async def predict(
+    request: Request,
+    file: UploadFile = File(...),
+    area: str | None = Form(None),
+    now: str | None = Form(None),
+):
+    # 写真 → ラベル → 区分（・品目）→（地区があれば）次の収集日
+    predictor: Predictor | None = request.app.state.predictor
+    if predictor is None:
+        raise HTTPException(status_code=503, detail="Prediction is disabled")
+    data = await file.read()
+    if len(data) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    try:
+        pred = await predictor.predict(data)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid image")
+
+    pickup = None
+    if area and pred.target is not None:
+        def lookup():
+            with _pool(request).connection() as conn:
+                return next_pickup(conn, area, pred.target.category, now=now)
+        try:
+            pickup = await run_in_threadpool(lookup)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid now: {now}")
+
+    return JSONResponse({
+        "model_version": pred.model_version,
+        "label_index": pred.label_index,
+        "score": round(pred.score, 4),
+        "target": asdict(pred.target) if pred.target else None,
+        "cached": pred.cached,
+        "next_pickup": asdict(pickup) if pickup else None,
+    })
+
+
+@app.get("/predict/cache")
+async def predict_cache_stats(request: Request):
+    # 推論結果キャッシュのヒット率など
+    predictor: Predictor | None = request.app.state.predictor
+    if predictor is None or predictor.cache is None:
+        raise HTTPException(status_code=404, detail="Prediction cache is disabled")
+    return JSONResponse(predictor.cache.summary())
+
+
+def main():
+    import argparse
+
+    import uvicorn
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=1, help="ワーカープロセス数（それぞれがプールと索引を持つ）")
+    p.add_argument("--db", help="DBファイル（既定: backend/data/db/nonoichi_waste.db）")
+    p.add_argument("--immutable", action="store_true", help="DBを実行中に書き換えない（スナップショット用）")
+    p.add_argument("--snapshots", help="スナップショットのディレクトリ（CURRENT の版を開き、更新されたら切り替える）")
+    p.add_argument("--open-ended", action="store_true", help="最後の版の期間を過ぎても収集日をルールで先まで計算する")
+    p.add_argument("--model", help="画像分類モデル（モジュール:クラス）。指定すると /predict を有効にする")
+    p.add_argument("--infer-workers", type=int, help="推論プロセス数（既定: --model があれば 1）")
+    args = p.parse_args()
+
+    if args.db:
+        os.environ[ENV_DB] = args.db
+    if args.immutable:
+        os.environ[ENV_IMMUTABLE] = "1"
+    if args.snapshots:
+        os.environ[ENV_SNAPSHOTS] = args.snapshots
+    if args.open_ended:
+        os.environ[ENV_OPEN_ENDED] = "1"
+    if args.model:
+        os.environ[ENV_MODEL] = args.model
+    if args.infer_workers is not None:
+        os.environ[ENV_INFER_WORKERS] = str(args.infer_workers)
+    uvicorn.run("backend.app.api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
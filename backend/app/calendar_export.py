@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterator
+
+from backend.app.db.compact import day_text, minutes_text
+from backend.app.schedule_rules import generate_dates
+from backend.app.virtual_events import get_virtual_schedule
+
+# 地区ごとの収集カレンダーを iCalendar / JSON で出力する
+# collection_days を地区ごとに（idx_days_area_day で）読み、1地区分ずつ組み立てる。
+# iCalendar は、区分の収集日が schedule_groups のルールで表せるときは RRULE 1件にまとめ、
+# ルールと食い違う日（年末年始の休みなど）を EXDATE / RDATE で補う。
+
+PRODID = "-//nonoichi-waste-app//calendar//JA"
+FORMATS = {"ics": "text/calendar; charset=utf-8", "json": "application/json"}
+
+# RRULE の BYDAY 用
+ICAL_WEEKDAYS = {"MON": "MO", "TUE": "TU", "WED": "WE", "THU": "TH", "FRI": "FR", "SAT": "SA", "SUN": "SU"}
+
+
+def source_fingerprint(conn: sqlite3.Connection) -> str:
+    # 収集日の元データ（PDF由来の sources）のハッシュ。再投入で変わるとカレンダーも作り直す
+    row = conn.execute(
+        """
+        SELECT group_concat(source_id || '=' || COALESCE(sha256, '') || '@' || COALESCE(fetched_at, ''), ',')
+        FROM (SELECT * FROM sources WHERE source_type = 'pdf' ORDER BY source_id)
+        """
+    ).fetchone()
+    return row[0] or ""
+
+
+def find_area(conn: sqlite3.Connection, area_name: str) -> tuple[str, str] | None:
+    return conn.execute("SELECT area_id, name FROM areas WHERE name = ?", (area_name,)).fetchone()
+
+
+def iter_area_events(conn: sqlite3.Connection, area_id: str) -> Iterator[tuple[str, str, str]]:
+    # (category_id, collection_date, deadline_time) を日付順に（idx_days_area_day を使う）
+    rows = conn.execute(
+        """
+        SELECT c.category_id, e.day, e.deadline
+        FROM areas a
+        JOIN collection_days e ON e.area_no = a.area_no
+        JOIN categories c ON c.category_no = e.category_no
+        WHERE a.area_id = ?
+        ORDER BY e.day
+        """,
+        (area_id,),
+    )
+    for category_id, d, deadline in rows:
+        yield category_id, day_text(d), minutes_text(deadline)
+
+
+def area_rules(conn: sqlite3.Connection, area_id: str) -> dict[str, list[dict]]:
+    # category_id -> その地区に効いている収集ルール（rule_json）
+    # 重複（同じルールに複数のグループからつながる）は SQL の DISTINCT ではなくここで除く（一時B木を作らない）
+    rules: dict[str, list[dict]] = {}
+    for category_id, rule_json in conn.execute(
+        """
+        SELECT g.category_id, g.rule_json
+        FROM area_group_members m
+        JOIN area_group_schedule_links l ON l.area_group_id = m.area_group_id
+        JOIN schedule_groups g ON g.schedule_group_id = l.schedule_group_id
+        WHERE m.area_id = ?
+        """,
+        (area_id,),
+    ):
+        rule = json.loads(rule_json)
+        if rule not in rules.setdefault(category_id, []):
+            rules[category_id].append(rule)
+    return rules
+
+
+def rrule_for(rule: dict, until: date) -> str | None:
+    # rule_json を RRULE にする（表せない形なら None）
+    rtype = rule.get("type")
+    if rtype == "weekly":
+        days = [ICAL_WEEKDAYS[w] for w in rule["weekdays"]]
+        return f"FREQ=WEEKLY;BYDAY={','.join(days)};UNTIL={until:%Y%m%d}"
+    if rtype in ("monthly_nth_weekday", "monthly_multiple_nth_weekday"):
+        raw = rule["nth"]
+        nths = raw if isinstance(raw, list) else [raw]
+        wd = ICAL_WEEKDAYS[rule["weekday"]]
+        return f"FREQ=MONTHLY;BYDAY={','.join(f'{int(n)}{wd}' for n in nths)};UNTIL={until:%Y%m%d}"
+    return None
+
+
+@dataclass
+class CategoryDates:
+    category_id: str
+    name: str
+    deadlines: set[str]
+    dates: list[str]
+
+
+def _virtual_area_events(conn: sqlite3.Connection, area_id: str) -> Iterator[tuple[str, str, str]]:
+    # collection_events を作っていないDB用: 有効期間全体をルールから計算する
+    # カレンダーは版の期間だけを出す（open_ended の設定があっても終わりのある版で計算する）
+    vs = get_virtual_schedule(conn, open_ended=False)
+    patterns = vs.patterns_by_area.get(area_id, [])
+    starts = [p.start for p in patterns if p.start]
+    ends = [p.end for p in patterns if p.end]
+    if not starts or not ends:
+        return
+    area_name = next(name for name, aid in vs.area_id_by_name.items() if aid == area_id)
+    for category_name, d, deadline in vs.iter_events(area_name, min(starts), max(ends)):
+        yield vs.category_id_by_name[category_name], d, deadline
+
+
+def _collect(conn: sqlite3.Connection, area_id: str) -> list[CategoryDates]:
+    names = dict(conn.execute("SELECT category_id, name FROM categories"))
+    events = iter_area_events(conn, area_id)
+    if not get_virtual_schedule(conn, open_ended=False).materialized:
+        events = _virtual_area_events(conn, area_id)
+    by_cat: dict[str, CategoryDates] = {}
+    for category_id, d, deadline in events:
+        cd = by_cat.get(category_id)
+        if cd is None:
+            cd = by_cat[category_id] = CategoryDates(category_id, names.get(category_id, category_id), set(), [])
+        cd.deadlines.add(deadline)
+        cd.dates.append(d)
+    return sorted(by_cat.values(), key=lambda c: c.category_id)
+
+
+# ================
+# iCalendar
+# ================
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    # 1行75オクテットまで（UTF-8の文字の途中では切らない）
+    out, cur, size = [], "", 0
+    for ch in line:
+        n = len(ch.encode("utf-8"))
+        if size + n > 75:
+            out.append(cur)
+            cur, size = " ", 1
+        cur += ch
+        size += n
+    out.append(cur)
+    return "\r\n".join(out) + "\r\n"
+
+
+def _dates_value(dates: list[str]) -> str:
+    return ",".join(d.replace("-", "") for d in dates)
+
+
+def _vevent(uid: str, dtstamp: str, cd: CategoryDates, start: str, extra: list[str]) -> Iterator[str]:
+    deadline = min(cd.deadlines)
+    yield _fold("BEGIN:VEVENT")
+    yield _fold(f"UID:{uid}")
+    yield _fold(f"DTSTAMP:{dtstamp}")
+    yield _fold(f"DTSTART;VALUE=DATE:{start.replace('-', '')}")
+    yield _fold(f"SUMMARY:{_escape(cd.name)}")
+    yield _fold(f"DESCRIPTION:{_escape(f'{cd.name}の収集日（朝{deadline}までに出す）')}")
+    for line in extra:
+        yield _fold(line)
+    yield _fold("TRANSP:TRANSPARENT")
+    yield _fold("END:VEVENT")
+
+
+def iter_ics(conn: sqlite3.Connection, area_id: str, area_name: str, stamp: str) -> Iterator[str]:
+    """
+    1地区分の iCalendar を少しずつ返す。
+    区分ごとに、ルールで出した日付と実際の収集日の差だけを EXDATE（ルールにあるが収集なし）/
+    RDATE（ルールに無いが収集あり）にする。差が多すぎる・ルールが1つに決まらない区分は1日ずつの VEVENT にする。
+    """
+    dtstamp = f"{stamp.replace('-', '')}T000000Z"
+    rules = area_rules(conn, area_id)
+
+    yield _fold("BEGIN:VCALENDAR")
+    yield _fold("VERSION:2.0")
+    yield _fold(f"PRODID:{PRODID}")
+    yield _fold("CALSCALE:GREGORIAN")
+    yield _fold(f"X-WR-CALNAME:{_escape(f'ごみ収集日（{area_name}）')}")
+
+    for cd in _collect(conn, area_id):
+        uid_base = f"{area_id}-{cd.category_id}"
+        cat_rules = rules.get(cd.category_id, [])
+        first, last = date.fromisoformat(cd.dates[0]), date.fromisoformat(cd.dates[-1])
+        rrule = rrule_for(cat_rules[0], last) if len(cat_rules) == 1 and len(cd.deadlines) == 1 else None
+
+        if rrule:
+            planned = [d.isoformat() for d in generate_dates(cat_rules[0], first, last)]
+            actual = set(cd.dates)
+            exdates = [d for d in planned if d not in actual]
+            rdates = sorted(actual.difference(planned))
+            # 例外が実際の日数の半分を超えるなら、まとめずに1日ずつ出す方が素直
+            if planned and len(exdates) + len(rdates) <= len(cd.dates) // 2:
+                extra = [f"RRULE:{rrule}"]
+                if exdates:
+                    extra.append(f"EXDATE;VALUE=DATE:{_dates_value(exdates)}")
+                if rdates:
+                    extra.append(f"RDATE;VALUE=DATE:{_dates_value(rdates)}")
+                yield from _vevent(f"{uid_base}@nonoichi-waste-app", dtstamp, cd, planned[0], extra)
+                continue
+
+        for d in cd.dates:
+            yield from _vevent(f"{uid_base}-{d.replace('-', '')}@nonoichi-waste-app", dtstamp, cd, d, [])
+
+    yield _fold("END:VCALENDAR")
+
+
+# ================
+# JSON
+# ================
+
+def iter_json(conn: sqlite3.Connection, area_id: str, area_name: str, stamp: str) -> Iterator[str]:
+    # {"area": ..., "updated": ..., "categories": [{"id","name","deadline","dates":[...]}]}（区切りの空白なし）
+    head = {"area": area_name, "area_id": area_id, "updated": stamp}
+    yield json.dumps(head, ensure_ascii=False, separators=(",", ":"))[:-1]
+    yield ',"categories":['
+    for i, cd in enumerate(_collect(conn, area_id)):
+        obj = {"id": cd.category_id, "name": cd.name, "deadline": min(cd.deadlines), "dates": cd.dates}
+        yield ("," if i else "") + json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    yield "]}"
+
+
+def _stamp(conn: sqlite3.Connection) -> str:
+    # DTSTAMP / updated は元データの取得日（出力を決定的にして ETag を安定させる）
+    row = conn.execute("SELECT MAX(fetched_at) FROM sources WHERE source_type = 'pdf'").fetchone()
+    return (row[0] or "1970-01-01")[:10]
+
+
+def render(conn: sqlite3.Connection, area_id: str, area_name: str, fmt: str) -> Iterator[str]:
+    stamp = _stamp(conn)
+    if fmt == "ics":
+        return iter_ics(conn, area_id, area_name, stamp)
+    if fmt == "json":
+        return iter_json(conn, area_id, area_name, stamp)
+    raise ValueError(f"unknown format: {fmt}")
+
+
+# ================
+# 出力のキャッシュ（ETag付き）
+# ================
+
+@dataclass(frozen=True)
+class RenderedCalendar:
+    etag: str
+    media_type: str
+    body: bytes
+
+
+class CalendarCache:
+    """
+    地区×形式ごとに出力済みのバイト列を持つ。
+    ETag は元データのハッシュ（source_fingerprint）から決まるので、
+    If-None-Match の確認はカレンダーを組み立てずにできる。元データが変わったら全部捨てる。
+    """
+
+    def __init__(self):
+        self._fingerprint = None
+        self._items: dict[tuple[str, str], RenderedCalendar] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag_for(fingerprint: str, area_id: str, fmt: str) -> str:
+        return '"' + hashlib.sha256(f"{fingerprint}|{area_id}|{fmt}".encode("utf-8")).hexdigest()[:20] + '"'
+
+    def current_etag(self, conn: sqlite3.Connection, area_id: str, fmt: str) -> str:
+        return self.etag_for(source_fingerprint(conn), area_id, fmt)
+
+    def get(self, conn: sqlite3.Connection, area_id: str, area_name: str, fmt: str) -> RenderedCalendar:
+        fingerprint = source_fingerprint(conn)
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._items.clear()
+                self._fingerprint = fingerprint
+            cached = self._items.get((area_id, fmt))
+        if cached is not None:
+            return cached
+
+        body = "".join(render(conn, area_id, area_name, fmt)).encode("utf-8")
+        rendered = RenderedCalendar(self.etag_for(fingerprint, area_id, fmt), FORMATS[fmt], body)
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                self._items[(area_id, fmt)] = rendered
+        return rendered
+
+    def warm(self, conn: sqlite3.Connection) -> int:
+        # 全地区・全形式を先に作っておく
+        n = 0
+        for area_id, name in conn.execute("SELECT area_id, name FROM areas").fetchall():
+            for fmt in FORMATS:
+                self.get(conn, area_id, name, fmt)
+                n += 1
+        return n
+
+
+def main():
+    import argparse
+    from pathlib import Path
+
+    from backend.app.next_pickup import connect
+
+    p = argparse.ArgumentParser(description="地区ごとの収集カレンダー（iCalendar / JSON）を書き出す")
+    p.add_argument("--area", help="地区名（省略すると全地区）")
+    p.add_argument("--format", choices=sorted(FORMATS), default="ics")
+    p.add_argument("--out", help="出力先ディレクトリ（省略すると標準出力。全地区のときは必須）")
+    args = p.parse_args()
+
+    conn = connect()
+    try:
+        if args.area:
+            area = find_area(conn, args.area)
+            if area is None:
+                raise SystemExit(f"Area not found: {args.area}")
+            areas = [area]
+        else:
+            if not args.out:
+                raise SystemExit("--out is required when exporting all areas")
+            areas = conn.execute("SELECT area_id, name FROM areas ORDER BY area_id").fetchall()
+
+        for area_id, name in areas:
+            chunks = render(conn, area_id, name, args.format)
+            if not args.out:
+                for chunk in chunks:
+                    print(chunk, end="")
+                continue
+            out_dir = Path(args.out)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            path = out_dir / f"{area_id}.{args.format}"
+            with path.open("w", encoding="utf-8", newline="") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        if args.out:
+            print(f"✅ {len(areas)} 地区分を書き出しました: {args.out}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from datetime import date
+
+# 収集日を整数だけで持つ表（collection_days / next_pickup_days）の値の変換
+# - 地区・区分・出典は areas.area_no などの整数キー
+# - 日付は 1970-01-01 からの日数（SQL では date(day + 2440587.5) で YYYY-MM-DD に戻る）
+# - 締切は 0時からの分（07:30 -> 450）
+# 文字の列で見たいときは同じ名前のビュー（collection_events / next_pickups）を引く（schema.sql）
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def day_no(d: date | str) -> int:
+    if isinstance(d, str):
+        d = date.fromisoformat(d)
+    return d.toordinal() - EPOCH_ORDINAL
+
+
+def day_text(n: int) -> str:
+    return date.fromordinal(n + EPOCH_ORDINAL).isoformat()
+
+
+def minutes_no(t: str | None) -> int | None:
+    if t is None:
+        return None
+    hh, mm = t.split(":")
+    return int(hh) * 60 + int(mm)
+
+
+def minutes_text(m: int | None) -> str | None:
+    if m is None:
+        return None
+    return f"{m // 60:02d}:{m % 60:02d}"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 import sqlite3
 from pathlib import Path
 
@@ -9,15 +10,181 @@ DATA_DIR = BACKEND_DIR / "data"
 DB_PATH = DATA_DIR / "db" / "nonoichi_waste.db"
 SCHEMA_PATH = Path(__file__).with_name("schema.sql")
 
+# 後から追加した列（CREATE TABLE IF NOT EXISTS では既存DBに足されないため ALTER で足す）
+ADDED_COLUMNS = {
+    "sources": [("effective_start", "TEXT"), ("effective_end", "TEXT")],
+    "schedule_groups": [("deadline_time", "TEXT")],
+    "items": [("name_key", "TEXT")],
+    "item_aliases": [("alias_key", "TEXT")],
+}
+
+# 整数キー（INTEGER PRIMARY KEY）を足した表。主キーは ALTER で足せないので、schema.sql の定義で作り直す
+KEYED_TABLES = {"sources": "source_no", "categories": "category_no", "areas": "area_no"}
+
+# 文字の列の表から、整数だけの表（+ 同じ名前のビュー）に移した表 -> 移し先
+COMPACTED_TABLES = {"collection_events": "collection_days", "next_pickups": "next_pickup_days"}
+
+# apply_schema で足した表（サーバが読む。これが無いDBは古い形のまま）
+REQUIRED_TABLES = ("schedule_exceptions", "event_notes", *COMPACTED_TABLES.values())
+
+# 古い表の行を整数の表に移す（日付・締切の変換は compact.py と同じ）
+_DAY = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+_MINUTES = "CAST(substr({0}, 1, 2) AS INTEGER) * 60 + CAST(substr({0}, 4, 2) AS INTEGER)"
+COMPACT_COPY_SQL = {
+    "collection_events": [
+        "INSERT OR IGNORE INTO event_notes(note) SELECT DISTINCT note FROM legacy_collection_events WHERE note IS NOT NULL",
+        f"""
+        INSERT OR IGNORE INTO collection_days(area_no, category_no, day, deadline, note_no, source_no)
+        SELECT a.area_no, c.category_no, {_DAY.format("e.collection_date")}, {_MINUTES.format("e.deadline_time")},
+               n.note_no, s.source_no
+        FROM legacy_collection_events e
+        JOIN areas a ON a.area_id = e.area_id
+        JOIN categories c ON c.category_id = e.category_id
+        LEFT JOIN event_notes n ON n.note = e.note
+        LEFT JOIN sources s ON s.source_id = e.source_id
+        """,
+    ],
+    "next_pickups": [
+        f"""
+        INSERT OR IGNORE INTO next_pickup_days(area_no, category_no, day, collection_day, deadline)
+        SELECT a.area_no, c.category_no, {_DAY.format("p.day")}, {_DAY.format("p.collection_date")},
+               {_MINUTES.format("p.deadline_time")}
+        FROM legacy_next_pickups p
+        JOIN areas a ON a.area_id = p.area_id
+        JOIN categories c ON c.category_id = p.category_id
+        """,
+    ],
+}
+
 def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(str(db_path))
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
+def add_missing_columns(conn: sqlite3.Connection) -> None:
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if not existing:
+            continue  # テーブル自体が無ければ schema.sql で作られる
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+def schema_indexes(sql: str) -> dict[str, str]:
+    # schema.sql の CREATE INDEX 文（索引名 -> 文）
+    return {
+        m.group(1): m.group(0)
+        for m in re.finditer(r"CREATE\s+INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+[^;]+", sql)
+    }
+
+def schema_tables(sql: str) -> dict[str, str]:
+    # schema.sql の CREATE TABLE 文（表名 -> 文）。定義は行頭の ")" で終わる
+    return {
+        m.group(1): m.group(0)
+        for m in re.finditer(r"CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(\w+)\s*\(.*?\n\)[^;]*;", sql, re.S)
+    }
+
+def schema_views(sql: str) -> dict[str, str]:
+    # schema.sql の CREATE VIEW 文（ビュー名 -> 文）
+    return {
+        m.group(1): m.group(0)
+        for m in re.finditer(r"CREATE\s+VIEW\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+AS\s+[^;]+", sql)
+    }
+
+def _sql_shape(sql: str) -> str:
+    return " ".join(sql.replace("IF NOT EXISTS", "").split())
+
+def drop_changed_indexes(conn: sqlite3.Connection, sql: str) -> None:
+    # 同じ名前で列が変わった索引は CREATE INDEX IF NOT EXISTS では作り直されないので、先に落とす
+    wanted = schema_indexes(sql)
+    for name, current in conn.execute("SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL").fetchall():
+        if name in wanted and _sql_shape(current) != _sql_shape(wanted[name]):
+            conn.execute(f"DROP INDEX {name}")
+
+def drop_changed_views(conn: sqlite3.Connection, sql: str) -> None:
+    # ビューも同じ。落とすとビューの INSTEAD OF トリガーも消えるが、schema.sql で一緒に作り直される
+    wanted = schema_views(sql)
+    for name, current in conn.execute("SELECT name, sql FROM sqlite_master WHERE type='view'").fetchall():
+        if name in wanted and _sql_shape(current) != _sql_shape(wanted[name]):
+            conn.execute(f"DROP VIEW {name}")
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _object_type(conn: sqlite3.Connection, name: str) -> str | None:
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name=?", (name,)).fetchone()
+    return row[0] if row else None
+
+def missing_schema(conn: sqlite3.Connection) -> list[str]:
+    # apply_schema を当てていないDBに足りない表・列（空なら今の形）
+    missing = [t for t in REQUIRED_TABLES if _object_type(conn, t) != "table"]
+    for table, key in KEYED_TABLES.items():
+        if key not in _columns(conn, table):
+            missing.append(f"{table}.{key}")
+    for table, columns in ADDED_COLUMNS.items():
+        existing = set(_columns(conn, table))
+        missing += [f"{table}.{name}" for name, _ in columns if name not in existing]
+    return missing
+
+def rebuild_keyed_tables(conn: sqlite3.Connection, sql: str) -> list[str]:
+    """
+    整数キーの無い古い表を schema.sql の定義で作り直す（キーは今の行の順に 1, 2, ... になる）。
+    外部キーを切って作り直すので、参照している子の行（地区グループの構成など）はそのまま残る。
+    foreign_keys の切り替えはトランザクションの外でしか効かないので、呼ぶ前にコミットしておくこと。
+    """
+    definitions = schema_tables(sql)
+    stale = [t for t, key in KEYED_TABLES.items() if (cols := _columns(conn, t)) and key not in cols]
+    if not stale:
+        return []
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.execute("BEGIN")
+        for table in stale:
+            old_columns = _columns(conn, table)
+            conn.execute(definitions[table].replace(f"IF NOT EXISTS {table}", f"{table}__new", 1))
+            common = ", ".join(c for c in _columns(conn, f"{table}__new") if c in old_columns)
+            conn.execute(f"INSERT INTO {table}__new({common}) SELECT {common} FROM {table} ORDER BY rowid")
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {table}__new RENAME TO {table}")
+        broken = conn.execute("PRAGMA foreign_key_check").fetchall()
+        if broken:
+            raise sqlite3.IntegrityError(f"foreign key check failed after rebuild: {broken[:5]}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    return stale
+
+def stash_compacted_tables(conn: sqlite3.Connection) -> list[str]:
+    # 古い形の（表のままの）collection_events などを legacy_* に退避する。同じ名前は schema.sql でビューになる
+    stashed = [t for t in COMPACTED_TABLES if _object_type(conn, t) == "table"]
+    for table in stashed:
+        conn.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+    return stashed
+
+def copy_compacted_tables(conn: sqlite3.Connection) -> None:
+    # 退避した表の行を整数の表に移して、退避した表を消す（途中で止まっていても次の呼び出しで続きから移す）
+    for table in COMPACTED_TABLES:
+        if _object_type(conn, f"legacy_{table}") != "table":
+            continue
+        for stmt in COMPACT_COPY_SQL[table]:
+            conn.execute(stmt)
+        conn.execute(f"DROP TABLE legacy_{table}")
+
 def apply_schema(conn: sqlite3.Connection, schema_path: Path= SCHEMA_PATH) -> None:
     sql = schema_path.read_text(encoding="utf-8")
+    # 新しい列への索引が schema.sql にあるので、先に列を足しておく
+    add_missing_columns(conn)
+    conn.commit()
+    rebuild_keyed_tables(conn, sql)
+    stash_compacted_tables(conn)
+    drop_changed_indexes(conn, sql)
+    drop_changed_views(conn, sql)
     conn.executescript(sql)
+    copy_compacted_tables(conn)
     conn.commit()
 
 def main() -> None:
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import tempfile
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+from backend.app.db.init_db import DB_PATH, apply_schema
+
+# 実行時のSQLの EXPLAIN QUERY PLAN を確認する
+# query.py / next_pickup.py / calendar_export.py（と、そこから呼ぶ virtual_events.py）の関数を実際に呼び、
+# set_trace_callback で流れた文を集めて1つずつ EXPLAIN QUERY PLAN にかける（SQLを直してもここは直さなくてよい）。
+# - request: リクエストのたびに流れる文。表の全件走査（SCAN）・一時B木・自動索引はエラー
+# - load:    索引・キャッシュを作るときに1回だけ流れる文（全件読むのが目的なので SCAN は見ない）
+# 既定ではDBを一時ファイルに複製して schema.sql を当ててから見る（schema.sql の索引で足りているかの確認）。
+
+# 行数がデータ量（地区・年・品目）で増えない表。全件走査しても数十行
+SMALL_TABLES = frozenset({"sources", "categories"})
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_KEYWORDS = frozenset({"on", "where", "join", "left", "inner", "cross", "group", "order", "limit", "using", "natural"})
+
+
+@dataclass
+class Finding:
+    level: str      # error | warn
+    detail: str
+
+
+@dataclass
+class AuditedStatement:
+    sql: str                            # 実際に流れた文（値は埋め込み済み）
+    shape: str                          # 値を ? にした形（同じ形の文は1回だけ見る）
+    phase: str                          # request | load
+    callers: list[str] = field(default_factory=list)
+    plan: list[str] = field(default_factory=list)
+    findings: list[Finding] = field(default_factory=list)
+
+
+def statement_shape(sql: str) -> str:
+    # 値を ? にし、IN (?, ?, ?) の長さの違いもまとめる
+    s = _LITERAL_RE.sub("?", sql)
+    s = re.sub(r"\?(?:\s*,\s*\?)+", "?", s)
+    return " ".join(s.split())
+
+
+def table_aliases(sql: str) -> dict[str, str]:
+    # FROM / JOIN の「表 別名」から 別名 -> 表名（EXPLAIN は別名で出るため）
+    out = {}
+    for table, alias in _TABLE_RE.findall(sql):
+        out[table] = table
+        if alias and alias.lower() not in _KEYWORDS:
+            out[alias] = table
+    return out
+
+
+def plan_findings(sql: str, plan: list[str], phase: str) -> list[Finding]:
+    aliases = table_aliases(sql)
+    findings = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and not detail.startswith(("SCAN (", "SCAN CONSTANT ROW")):
+            name = detail.split()[1]
+            table = aliases.get(name, name)
+            if phase == "request" and table not in SMALL_TABLES:
+                findings.append(Finding("error", f"full scan of {table}: {detail}"))
+        elif "AUTOMATIC" in detail:
+            # 索引が無いのでSQLiteがその場で作っている
+            findings.append(Finding("error" if phase == "request" else "warn", f"automatic index: {detail}"))
+        elif detail.startswith("USE TEMP B-TREE"):
+            if phase == "load":
+                findings.append(Finding("warn", detail))
+            elif "LAST TERM OF ORDER BY" in detail or "RIGHT PART OF ORDER BY" in detail:
+                # 先頭の列は索引の順で出ていて、同じ値の中だけ並べ替える（1日分の区分など、数件）
+                findings.append(Finding("warn", f"partial sort: {detail}"))
+            else:
+                findings.append(Finding("error", detail))
+    return findings
+
+
+# ================
+# 実行時の関数を呼ぶ
+# ================
+
+def workload_args(conn: sqlite3.Connection) -> dict:
+    # 呼び出しに使う値をDBから選ぶ（ここで流す文は監査に入れない）
+    area_id, area = conn.execute("SELECT area_id, name FROM areas ORDER BY name LIMIT 1").fetchone()
+    categories = [r[0] for r in conn.execute("SELECT name FROM categories ORDER BY category_id")]
+    item = conn.execute("SELECT name FROM items ORDER BY name_norm LIMIT 1").fetchone()
+    first, last = conn.execute("SELECT MIN(collection_date), MAX(collection_date) FROM collection_events").fetchone()
+    if first is None:
+        # 収集日を展開していないDB: 版の有効期間を使う
+        from backend.app.editions import load_editions
+
+        editions = load_editions(conn).editions
+        first = editions[0].start.isoformat() if editions else date.today().isoformat()
+        last = editions[-1].end.isoformat() if editions and editions[-1].end else first
+    first_day, last_day = date.fromisoformat(first), date.fromisoformat(last)
+    return {
+        "area_id": area_id,
+        "area": area,
+        "categories": categories,
+        "item": item[0] if item else "ペットボトル",
+        "in_range": f"{first_day + timedelta(days=3)}T06:00",
+        # next_pickup_days の表より前（collection_days を引く）・収集日の後（ルールから計算する）
+        "before": f"{first_day - timedelta(days=7)}T06:00",
+        "after": f"{last_day + timedelta(days=7)}T06:00",
+        "start": first,
+        "end": (first_day + timedelta(days=30)).isoformat(),
+    }
+
+
+def run_workload(conn: sqlite3.Connection, a: dict, label: list[str]) -> None:
+    """
+    実行時の関数をひととおり呼ぶ。label[0] に呼んでいる関数名を入れておく（トレースの記録用）。
+    """
+    from backend.app import calendar_export, next_pickup, query
+
+    category = a["categories"][0] if a["categories"] else "一般ごみ"
+    calls = [
+        ("find_item_exact", lambda: query.find_item_exact(conn, a["item"])),
+        ("find_item_alias", lambda: query.find_item_alias(conn, a["item"])),
+        ("find_item_reading", lambda: query.find_item_reading(conn, a["item"])),
+        ("find_items_bulk", lambda: query.find_items_bulk(conn, [a["item"], "存在しない品目"])),
+        ("suggest_items_prefix", lambda: query.suggest_items_prefix(conn, a["item"][:1])),
+        ("suggest_items", lambda: query.suggest_items(conn, a["item"])),
+        ("category_from_item", lambda: next_pickup.category_from_item(conn, a["item"])),
+    ]
+    for when in ("in_range", "before", "after"):
+        calls += [
+            (f"next_pickup[{when}]", lambda when=when: next_pickup.next_pickup(conn, a["area"], category, a[when])),
+            (
+                f"next_pickups_bulk[{when}]",
+                lambda when=when: next_pickup.next_pickups_bulk(conn, a["area"], a["categories"], a[when]),
+            ),
+        ]
+    calls += [
+        ("next_pickup[virtual]", lambda: next_pickup.next_pickup(conn, a["area"], category, a["in_range"], virtual=True)),
+        ("collection_events_between", lambda: next_pickup.collection_events_between(conn, a["area"], a["start"], a["end"])),
+        (
+            "collection_events_between[category]",
+            lambda: next_pickup.collection_events_between(conn, a["area"], a["start"], a["end"], category),
+        ),
+        ("calendar_export.find_area", lambda: calendar_export.find_area(conn, a["area"])),
+        # キャッシュを毎回新しくして、描画（キャッシュが外れたとき）の文も流す
+        ("calendar_export[ics]", lambda: calendar_export.CalendarCache().get(conn, a["area_id"], a["area"], "ics")),
+        ("calendar_export[json]", lambda: calendar_export.CalendarCache().get(conn, a["area_id"], a["area"], "json")),
+    ]
+    for name, call in calls:
+        label[0] = name
+        call()
+
+
+def trace_statements(conn: sqlite3.Connection) -> list[AuditedStatement]:
+    """
+    関数を2回ずつ呼ぶ。1回目だけに出た文はキャッシュを作るときの文（load）、2回目にも出た文はリクエストごとの文。
+    """
+    args = workload_args(conn)
+    label = [""]
+    passes: list[list[tuple[str, str]]] = [[], []]
+    for i in range(2):
+        conn.set_trace_callback(lambda sql, i=i: passes[i].append((label[0], sql)))
+        try:
+            run_workload(conn, args, label)
+        finally:
+            conn.set_trace_callback(None)
+
+    request_shapes = {statement_shape(sql) for _, sql in passes[1]}
+    statements: dict[str, AuditedStatement] = {}
+    for caller, sql in passes[0] + passes[1]:
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            continue
+        shape = statement_shape(sql)
+        st = statements.get(shape)
+        if st is None:
+            phase = "request" if shape in request_shapes else "load"
+            st = statements[shape] = AuditedStatement(sql=sql, shape=shape, phase=phase)
+        if caller not in st.callers:
+            st.callers.append(caller)
+    return list(statements.values())
+
+
+def audit(conn: sqlite3.Connection) -> list[AuditedStatement]:
+    statements = trace_statements(conn)
+    for st in statements:
+        st.plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + st.sql)]
+        st.findings = plan_findings(st.sql, st.plan, st.phase)
+    return statements
+
+
+# ================
+# 監査するDBの用意
+# ================
+
+def prepare_db(src: Path, workdir: Path, mode: str) -> Path:
+    """
+    mode: schema   = 複製して schema.sql を当てる（索引の定義を確認する。既定）
+          snapshot = snapshot.py と同じ手順でスナップショットを作る（サーバが読むもの）
+          as-is    = そのまま読む
+    """
+    if mode == "as-is":
+        return src
+    dest = workdir / f"audit-{mode}.db"
+    if mode == "snapshot":
+        from backend.app.db.snapshot import build_snapshot
+
+        build_snapshot(src, dest, version="audit", fingerprint="audit")
+        return dest
+
+    src_conn = sqlite3.connect(f"file:{quote(str(src.resolve()))}?mode=ro", uri=True)
+    try:
+        src_conn.execute("VACUUM INTO ?", (str(dest),))
+    finally:
+        src_conn.close()
+    conn = sqlite3.connect(str(dest))
+    try:
+        apply_schema(conn)
+    finally:
+        conn.close()
+    return dest
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+    import json
+
+    from backend.app.pool import connect_readonly
+
+    p = argparse.ArgumentParser(description="実行時のSQLの EXPLAIN QUERY PLAN を確認する")
+    p.add_argument("--db", type=Path, default=DB_PATH, help="元にするDB")
+    p.add_argument("--mode", choices=("schema", "snapshot", "as-is"), default="schema",
+                   help="schema: 複製して schema.sql を当てる / snapshot: スナップショットを作る / as-is: そのまま")
+    p.add_argument("--check", action="store_true", help="エラーがあれば終了コード1")
+    p.add_argument("--verbose", "-v", action="store_true", help="問題の無い文の計画も表示する")
+    p.add_argument("--json", help="結果をJSONで保存する")
+    args = p.parse_args(argv)
+
+    if not args.db.exists():
+        raise FileNotFoundError(f"db not found: {args.db}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = prepare_db(args.db, Path(tmp), args.mode)
+        conn = connect_readonly(db)
+        try:
+            statements = audit(conn)
+        finally:
+            conn.close()
+
+    errors = warns = 0
+    for st in sorted(statements, key=lambda s: (s.phase != "request", s.callers[0])):
+        errors += sum(f.level == "error" for f in st.findings)
+        warns += sum(f.level == "warn" for f in st.findings)
+        if not (st.findings or args.verbose):
+            continue
+        print(f"[{st.phase}] {', '.join(st.callers)}")
+        print(f"    {st.shape[:160]}")
+        for detail in st.plan:
+            print(f"      | {detail}")
+        for f in st.findings:
+            print(f"    {'⚠️ ' if f.level == 'error' else ''}{f.level}: {f.detail}")
+
+    n_request = sum(st.phase == "request" for st in statements)
+    print(
+        f"{len(statements)} statements ({n_request} request / {len(statements) - n_request} load) "
+        f"on {args.db.name} [{args.mode}]: {errors} errors, {warns} warnings"
+    )
+
+    if args.json:
+        data = [
+            {
+                "phase": st.phase,
+                "callers": st.callers,
+                "sql": st.shape,
+                "plan": st.plan,
+                "findings": [{"level": f.level, "detail": f.detail} for f in st.findings],
+            }
+            for st in statements
+        ]
+        Path(args.json).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"保存しました: {args.json}")
+
+    if args.check and errors:
+        print("⚠️ 実行時のSQLに全件走査・一時B木があります")
+        raise SystemExit(1)
+    print("✅ 完了")
+
+
+if __name__ == "__main__":
+    main()
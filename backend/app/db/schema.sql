@@ -6,20 +6,36 @@ PRAGMA foreign_keys = ON;
 -- 出典・更新管理
 -- ===========================================================
 CREATE TABLE IF NOT EXISTS sources (
-    source_id   TEXT PRIMARY KEY,
+    source_no   INTEGER PRIMARY KEY, -- 整数キー（collection_days などはこちらで持つ）
+    source_id   TEXT NOT NULL UNIQUE,
     source_type TEXT NOT NULL, -- web|pdf|manual|generated
     title       TEXT NOT NULL,
     url         TEXT,          -- 取得元URL
     file_path   TEXT,          -- 取得元ファイルパス
     fetched_at  TEXT,          -- 取得日時
-    sha256      TEXT           -- ファイルや内容のハッシュ（改ざん検知・同一性確認に便利）
+    sha256      TEXT,          -- ファイルや内容のハッシュ（改ざん検知・同一性確認に便利）
+    effective_start TEXT,      -- 収集日程の有効期間（pdf のみ。YYYY-MM-DD）
+    effective_end   TEXT
 );
 
+-- ===========================================================
+-- シード差分管理: 前回シード時の内容ハッシュ
+-- scope: area_group（構成地区+紐づくルール）| item（raw CSVの1行）
+-- ファイル全体のハッシュは sources.sha256
+-- ===========================================================
+CREATE TABLE IF NOT EXISTS seed_fingerprints (
+    scope  TEXT NOT NULL,
+    key    TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (scope, key)
+) WITHOUT ROWID;
+
 -- ===========================================================
 -- 家庭ごみ区分（締切時間）
 -- ===========================================================
 CREATE TABLE IF NOT EXISTS categories (
-    category_id           TEXT PRIMARY KEY,
+    category_no           INTEGER PRIMARY KEY, -- 整数キー
+    category_id           TEXT NOT NULL UNIQUE,
     name                  TEXT NOT NULL UNIQUE,
     deadline_time         TEXT, -- ex) 07:00 / 07:30
     disposal_instructions TEXT,
@@ -31,7 +47,8 @@ CREATE TABLE IF NOT EXISTS categories (
 -- 地区
 -- ===========================================================
 CREATE TABLE IF NOT EXISTS areas (
-    area_id TEXT PRIMARY KEY,
+    area_no INTEGER PRIMARY KEY, -- 整数キー
+    area_id TEXT NOT NULL UNIQUE,
     name TEXT NOT NULL UNIQUE,
     note TEXT,
     source_id TEXT,
@@ -68,6 +85,7 @@ CREATE TABLE IF NOT EXISTS schedule_groups (
     name TEXT NOT NULL UNIQUE,
     rule_type TEXT NOT NULL, -- weekly | monthly_nth_weekday | monthly_multiple_nth_weekday ...
     rule_json TEXT NOT NULL, -- ルール本体
+    deadline_time TEXT,      -- この版での締切（区分の締切は版ごとに変わりうるので、パターン側に写す）
     note TEXT,
     source_id TEXT,
     updated_at TEXT,
@@ -84,27 +102,131 @@ CREATE TABLE IF NOT EXISTS area_group_schedule_links (
   FOREIGN KEY(area_group_id) REFERENCES area_groups(area_group_id) ON DELETE CASCADE,
   FOREIGN KEY(schedule_group_id) REFERENCES schedule_groups(schedule_group_id) ON DELETE CASCADE
 );
-
--- アプリが最終的に引く「具体的な収集日（カレンダー）」
-CREATE TABLE IF NOT EXISTS collection_events (
-  event_id INTEGER PRIMARY KEY AUTOINCREMENT,
-  area_id  TEXT NOT NULL,
-  category_id TEXT NOT NULL,
-  collection_date TEXT NOT NULL,    -- YYYY-MM-DD
-  deadline_time   TEXT,             -- 例: 07:00/07:30
-  note      TEXT,
+-- ===========================================================
+-- 収集日の例外（年末年始の休み・振替・臨時収集）
+-- category_id / schedule_group_id が NULL なら全区分・全パターンに効く
+-- ===========================================================
+CREATE TABLE IF NOT EXISTS schedule_exceptions (
+  exception_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind TEXT NOT NULL CHECK (kind IN ('skip','substitute','add')),
+  start_date TEXT NOT NULL,          -- YYYY-MM-DD
+  end_date   TEXT NOT NULL,          -- skip の最終日（substitute/add は start_date と同じ）
+  substitute_date TEXT,              -- substitute の振替先
+  category_id TEXT,
+  schedule_group_id TEXT,
+  note TEXT,
   source_id TEXT,
-  UNIQUE(area_id, category_id, collection_date),
-  FOREIGN KEY(area_id) REFERENCES areas(area_id) ON DELETE CASCADE,
   FOREIGN KEY(category_id) REFERENCES categories(category_id) ON DELETE CASCADE,
+  FOREIGN KEY(schedule_group_id) REFERENCES schedule_groups(schedule_group_id) ON DELETE CASCADE,
   FOREIGN KEY(source_id) REFERENCES sources(source_id)
 );
 
+-- 収集日の注記（同じ注記を収集日ごとに持たない）
+CREATE TABLE IF NOT EXISTS event_notes (
+  note_no INTEGER PRIMARY KEY,
+  note    TEXT NOT NULL UNIQUE
+);
+
+-- アプリが最終的に引く「具体的な収集日（カレンダー）」
+-- 整数だけで持つ（compact.py）: 地区・区分・出典は *_no、日付は 1970-01-01 からの日数、締切は 0時からの分
+-- (地区, 区分, 日付) の順に並べて持つ（WITHOUT ROWID）ので、区分ごとの次の収集日は主キーをたどるだけ
+CREATE TABLE IF NOT EXISTS collection_days (
+  area_no     INTEGER NOT NULL,
+  category_no INTEGER NOT NULL,
+  day         INTEGER NOT NULL,       -- 収集日
+  deadline    INTEGER,                -- 締切
+  note_no     INTEGER,                -- その日だけの注記（年末年始などの例外は schedule_exceptions）
+  source_no   INTEGER,
+  PRIMARY KEY (area_no, category_no, day),
+  FOREIGN KEY(area_no) REFERENCES areas(area_no) ON DELETE CASCADE,
+  FOREIGN KEY(category_no) REFERENCES categories(category_no) ON DELETE CASCADE,
+  FOREIGN KEY(note_no) REFERENCES event_notes(note_no),
+  FOREIGN KEY(source_no) REFERENCES sources(source_no)
+) WITHOUT ROWID;
+
+-- next_pickup 用の事前計算表: (地区, 区分, 日付) -> その日以降で最初の収集日
+-- collection_days から seed 時に作る。主キー1回の検索で答えが出る
+CREATE TABLE IF NOT EXISTS next_pickup_days (
+  area_no     INTEGER NOT NULL,
+  category_no INTEGER NOT NULL,
+  day         INTEGER NOT NULL,       -- 問い合わせ日
+  collection_day INTEGER NOT NULL,    -- day 以降で最初の収集日
+  deadline    INTEGER,
+  PRIMARY KEY (area_no, category_no, day)
+) WITHOUT ROWID;
+
+-- 以前の表と同じ形（文字の列）のビュー。書き出し・手での確認・古い形のDBと同じSQLで引くとき用
+-- 実行時の検索は整数の表を直接引く（ビューの日付は式なので索引で絞れない）
+-- event_id は主キー (area_no, category_no, day) を1つの整数に詰めたもの（category_no < 4096, day < 2^20。再シードしても変わらない）
+CREATE VIEW IF NOT EXISTS collection_events AS
+SELECT
+  (d.area_no * 4096 + d.category_no) * 1048576 + d.day AS event_id,
+  a.area_id,
+  c.category_id,
+  date(d.day + 2440587.5) AS collection_date,
+  CASE WHEN d.deadline IS NOT NULL THEN printf('%02d:%02d', d.deadline / 60, d.deadline % 60) END AS deadline_time,
+  n.note,
+  s.source_id
+FROM collection_days d
+JOIN areas a ON a.area_no = d.area_no
+JOIN categories c ON c.category_no = d.category_no
+LEFT JOIN event_notes n ON n.note_no = d.note_no
+LEFT JOIN sources s ON s.source_no = d.source_no;
+
+CREATE VIEW IF NOT EXISTS next_pickups AS
+SELECT
+  a.area_id,
+  c.category_id,
+  date(p.day + 2440587.5) AS day,
+  date(p.collection_day + 2440587.5) AS collection_date,
+  CASE WHEN p.deadline IS NOT NULL THEN printf('%02d:%02d', p.deadline / 60, p.deadline % 60) END AS deadline_time
+FROM next_pickup_days p
+JOIN areas a ON a.area_no = p.area_no
+JOIN categories c ON c.category_no = p.category_no;
+
+-- collection_events への INSERT / UPDATE / DELETE は collection_days に書き換える（手での修正用。シードは直接書く）
+CREATE TRIGGER IF NOT EXISTS collection_events_insert
+INSTEAD OF INSERT ON collection_events
+BEGIN
+  INSERT INTO event_notes(note)
+  SELECT NEW.note WHERE NEW.note IS NOT NULL AND NOT EXISTS (SELECT 1 FROM event_notes WHERE note = NEW.note);
+  INSERT INTO collection_days(area_no, category_no, day, deadline, note_no, source_no)
+  VALUES (
+    (SELECT area_no FROM areas WHERE area_id = NEW.area_id),
+    (SELECT category_no FROM categories WHERE category_id = NEW.category_id),
+    CAST(julianday(NEW.collection_date) - 2440587.5 AS INTEGER),
+    CAST(substr(NEW.deadline_time, 1, 2) AS INTEGER) * 60 + CAST(substr(NEW.deadline_time, 4, 2) AS INTEGER),
+    (SELECT note_no FROM event_notes WHERE note = NEW.note),
+    (SELECT source_no FROM sources WHERE source_id = NEW.source_id)
+  );
+END;
+
+CREATE TRIGGER IF NOT EXISTS collection_events_delete
+INSTEAD OF DELETE ON collection_events
+BEGIN
+  DELETE FROM collection_days
+  WHERE area_no = (SELECT area_no FROM areas WHERE area_id = OLD.area_id)
+    AND category_no = (SELECT category_no FROM categories WHERE category_id = OLD.category_id)
+    AND day = CAST(julianday(OLD.collection_date) - 2440587.5 AS INTEGER);
+END;
+
+CREATE TRIGGER IF NOT EXISTS collection_events_update
+INSTEAD OF UPDATE ON collection_events
+BEGIN
+  DELETE FROM collection_days
+  WHERE area_no = (SELECT area_no FROM areas WHERE area_id = OLD.area_id)
+    AND category_no = (SELECT category_no FROM categories WHERE category_id = OLD.category_id)
+    AND day = CAST(julianday(OLD.collection_date) - 2440587.5 AS INTEGER);
+  INSERT INTO collection_events(area_id, category_id, collection_date, deadline_time, note, source_id)
+  VALUES (NEW.area_id, NEW.category_id, NEW.collection_date, NEW.deadline_time, NEW.note, NEW.source_id);
+END;
+
 -- 分別辞典（collectorのCSVから入れる）
 CREATE TABLE IF NOT EXISTS items (
   item_id   TEXT PRIMARY KEY,
   name      TEXT NOT NULL,
   name_norm TEXT NOT NULL UNIQUE,    -- 完全一致用（正規化キー）
+  name_key  TEXT,                    -- 読みキー（かな・ローマ字の表記ゆれを畳み込んだもの）
   category_id TEXT NOT NULL,
   note      TEXT,
   source_id TEXT,
@@ -121,6 +243,7 @@ CREATE TABLE IF NOT EXISTS item_aliases (
   item_id  TEXT NOT NULL,
   alias    TEXT NOT NULL,
   alias_norm TEXT NOT NULL UNIQUE,
+  alias_key  TEXT,                   -- 読みキー
   FOREIGN KEY(item_id) REFERENCES items(item_id) ON DELETE CASCADE
 );
 
@@ -133,5 +256,12 @@ CREATE TABLE IF NOT EXISTS model_label_maps (
   PRIMARY KEY(model_version, label_index)
 );
 
-CREATE INDEX IF NOT EXISTS idx_events_area_date ON collection_events(area_id, collection_date);
-CREATE INDEX IF NOT EXISTS idx_items_category  ON items(category_id);
\ No newline at end of file
+-- 実行時のSQLに合わせた索引（plan_audit.py で確認する）。SELECT する列まで含めて、表を引かずに答える
+-- 区分ごとの次の収集日（next_pickup_days の範囲外）は collection_days の主キーの順そのもの
+-- 期間内の収集日・カレンダー: 地区の中を日付順に（区分は主キーの列として索引に入る）
+CREATE INDEX IF NOT EXISTS idx_days_area_day ON collection_days(area_no, day, deadline);
+-- 地区 -> 地区グループ（主キーは (area_group_id, area_id) の順なので逆向き）
+CREATE INDEX IF NOT EXISTS idx_members_area ON area_group_members(area_id, area_group_id);
+CREATE INDEX IF NOT EXISTS idx_items_category  ON items(category_id);
+CREATE INDEX IF NOT EXISTS idx_items_name_key  ON items(name_key);
+CREATE INDEX IF NOT EXISTS idx_aliases_alias_key ON item_aliases(alias_key);
\ No newline at end of file
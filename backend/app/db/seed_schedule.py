@@ -1,98 +1,263 @@
 from __future__ import annotations
 
+import csv
 import sqlite3
-from datetime import datetime, date, timedelta
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, date
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 import json
 
-import yaml
 import hashlib
 import re
-import unicodedata
-import pandas as pd
-import calendar
+
+from backend.app.db.compact import day_no, minutes_no
+from backend.app.db.init_db import apply_schema
+from backend.app.kana import reading_key
+from backend.app.textnorm import make_id, normalize_text  # 正規化は textnorm に移した（ここからも import できる）
+from backend.app.schedule_rules import (  # ルール計算は schedule_rules に移した
+    WEEKDAY_MAP,
+    ScheduleException,
+    exception_from_dict,
+    exception_from_year_end,
+    generate_dates,
+    nth_weekday_of_month,
+)
 
 # backend/ を基準にパスを決める
 BACKEND_DIR = Path(__file__).resolve().parents[2]
 DATA_DIR = BACKEND_DIR / "data"
 EXPORT_DIR = DATA_DIR / "export"
 DB_PATH = DATA_DIR / "db" / "nonoichi_waste.db"
-SCHEDULE_PATH = DATA_DIR / "manual" / "schedule_r7.yaml"
+SCHEDULE_DIR = DATA_DIR / "manual"
+SCHEDULE_GLOB = "schedule_r*.yaml"   # 年度ごとの版（schedule_r7.yaml, schedule_r8.yaml, ...）を並べて入れる
 RAW_ITEMS_CSV = DATA_DIR / "raw" / "nonoichi_garbage.csv"
 
-WEEKDAY_MAP = {"MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4, "SAT": 5, "SUN": 6}
-
-def nth_weekday_of_month(year: int, month: int, weekday: int, nth: int) -> date | None:
-    # weekday: 0=Mon..6=Sun
-    count = 0
-    for day in range(1, calendar.monthrange(year, month)[1] + 1):
-        d = date(year, month, day)
-        if d.weekday() == weekday:
-            count += 1
-            if count == nth:
-                return d
-    return None
-
-def generate_dates(rule: dict, start: date, end: date) -> list[date]:
-    rtype = rule["type"]
-    out: list[date] = []
-
-    if rtype == "weekly":
-        weekdays = [WEEKDAY_MAP[w] for w in rule["weekdays"]]
-        d = start
-        while d <= end:
-            if d.weekday() in weekdays:
-                out.append(d)
-            d += timedelta(days=1)
-
-    elif rtype == "monthly_nth_weekday":
-        weekday = WEEKDAY_MAP[rule["weekday"]]
-        nth = int(rule["nth"])
-        y, m = start.year, start.month
-        while (y, m) <= (end.year, end.month):
-            d = nth_weekday_of_month(y, m, weekday, nth)
-            if d and start <= d <= end:
-                out.append(d)
-            m += 1
-            if m == 13:
-                y += 1
-                m = 1
-
-    elif rtype == "monthly_multiple_nth_weekday":
-        weekday = WEEKDAY_MAP[rule["weekday"]]
-        nth_list = [int(x) for x in rule["nth"]]
-        y, m = start.year, start.month
-        while (y, m) <= (end.year, end.month):
-            for nth in nth_list:
-                d = nth_weekday_of_month(y, m, weekday, nth)
-                if d and start <= d <= end:
-                    out.append(d)
-            m += 1
-            if m == 13:
-                y += 1
-                m = 1
-    else:
-        raise ValueError(f"unknown rule type: {rtype}")
-
-    return sorted(set(out))
-
-def connect() -> sqlite3.Connection:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH))
+# 分別辞典（web）由来の items の source
+ITEMS_SOURCE_ID = "src_web_dict"
+ITEMS_SOURCE_URL = "https://gb.hn-kouiki.jp/nonoichi"
+
+# 収集スケジュールの対象外（自己処理・資源回収など）の区分
+SKIP_CATEGORIES = frozenset({
+    "自己処理",
+    "古紙（チラシ・雑誌・本・コピー用紙類）",
+    "紙パック",
+    "未設定",
+    "古着・布類",
+    "古紙（新聞紙）",
+    "古紙（段ボール）",
+    "保留中",
+})
+
+
+def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
-def load_schedule() -> dict:
-    text = SCHEDULE_PATH.read_text(encoding="utf-8")
+
+@contextmanager
+def bulk_load(conn: sqlite3.Connection, defer_indexes: bool = True):
+    """
+    シード全体を1トランザクションで流し込む。
+    - 流し込み中は journal を MEMORY、synchronous を OFF にする（失敗時は ROLLBACK で元に戻る）
+    - defer_indexes=True なら明示的に作った索引（idx_*）をいったん落とし、最後に作り直す
+      （差分だけ入れるときは索引を残した方が速い）
+    """
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+    indexes = []
+    if defer_indexes:
+        indexes = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+        ).fetchall()
+    try:
+        conn.execute("BEGIN")
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX {name}")
+        yield conn
+        for _, sql in indexes:
+            conn.execute(sql)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+
+def load_schedule(path: Path) -> dict:
+    import yaml  # 読むときだけ（検索側の import を軽くするため）
+
+    text = path.read_text(encoding="utf-8")
     return yaml.safe_load(text)
 
-def upsert_source(conn: sqlite3.Connection, schedule: dict) -> str:
+
+@dataclass
+class ScheduleEdition:
+    edition: str      # r7, r8, ...（ファイル名か YAML の edition: から）
+    path: Path
+    schedule: dict    # 地区グループ・収集パターンの id / 名前は、先の版と重なるものだけ版で修飾済み
+    sha256: str       # 修飾後の内容のハッシュ（sources.sha256 に入れ、次回の差分判定に使う）
+
+    @property
+    def source_id(self) -> str:
+        return f"src_pdf_{self.edition}"
+
+    @property
+    def start(self) -> date:
+        return date.fromisoformat(str(self.schedule["effective_start"]))
+
+    @property
+    def end(self) -> date:
+        return date.fromisoformat(str(self.schedule["effective_end"]))
+
+
+def edition_of(path: Path, schedule: dict) -> str:
+    if schedule.get("edition"):
+        return str(schedule["edition"])
+    m = re.fullmatch(r"schedule_(r\d+)\.ya?ml", path.name)
+    if not m:
+        raise ValueError(f"cannot tell schedule edition from file name: {path.name}")
+    return m.group(1)
+
+
+def qualify_schedule(schedule: dict, edition: str, taken: dict[str, set[str]]) -> dict:
+    """
+    地区グループ・収集パターンの id と名前が先の版と重なるときだけ、その id・名前に版を付ける
+    （r8 が r7 と同じ id・名前を使っても別の行になる。先の版の行の id・名前は変えない）。
+    taken は先の版が使った id・名前で、この版の分を足していく。区分と地区は版をまたいで共通なのでそのまま。
+    """
+    def qualify(kind: str, groups: list[dict]) -> tuple[list[dict], dict[str, str]]:
+        ids, names = taken.setdefault(f"{kind}_id", set()), taken.setdefault(f"{kind}_name", set())
+        id_map = {g["id"]: f"{edition}:{g['id']}" if g["id"] in ids else g["id"] for g in groups}
+        out = [
+            {**g, "id": id_map[g["id"]], "name": f"[{edition}] {g['name']}" if g["name"] in names else g["name"]}
+            for g in groups
+        ]
+        ids.update(g["id"] for g in out)
+        names.update(g["name"] for g in out)
+        return out, id_map
+
+    out = dict(schedule)
+    out["area_groups"], area_group_ids = qualify("area_group", schedule["area_groups"])
+    out["schedule_groups"], schedule_ids = qualify("schedule_group", schedule["schedule_groups"])
+    out["area_group_schedule_links"] = [
+        {
+            **link,
+            "area_group_id": area_group_ids.get(link["area_group_id"], link["area_group_id"]),
+            "schedules": [
+                {**x, "schedule_id": schedule_ids.get(x["schedule_id"], x["schedule_id"])} for x in link["schedules"]
+            ],
+        }
+        for link in schedule["area_group_schedule_links"]
+    ]
+    out["exceptions"] = [
+        {**e, "schedule_id": schedule_ids.get(e["schedule_id"], e["schedule_id"])} if e.get("schedule_id") else e
+        for e in schedule.get("exceptions", []) or []
+    ]
+    return out
+
+
+def load_schedule_editions(directory: Path | None = None) -> list[ScheduleEdition]:
+    """
+    schedule_r*.yaml をすべて読み、有効期間の順に並べる。期間が重なる版があればエラー
+    （同じ日の収集日が2つの版から出てしまうため）。
+    """
+    raws = []
+    for path in sorted((directory or SCHEDULE_DIR).glob(SCHEDULE_GLOB)):
+        raw = load_schedule(path)
+        raws.append((path, raw, edition_of(path, raw)))
+    # id・名前が重なったときは、有効期間が先の版がそのままの id・名前を使う
+    raws.sort(key=lambda r: str(r[1]["effective_start"]))
+
+    editions = []
+    taken: dict[str, set[str]] = {}
+    for path, raw, edition in raws:
+        schedule = qualify_schedule(raw, edition, taken)
+        editions.append(ScheduleEdition(edition, path, schedule, content_sha256(schedule)))
+
+    seen = {}
+    for e in editions:
+        if e.end < e.start:
+            raise ValueError(f"effective_end before effective_start: {e.path.name} ({e.start}〜{e.end})")
+        if e.edition in seen:
+            raise ValueError(f"duplicate schedule edition {e.edition}: {seen[e.edition].name}, {e.path.name}")
+        seen[e.edition] = e.path
+    for prev, cur in zip(editions, editions[1:]):
+        if cur.start <= prev.end:
+            raise ValueError(
+                f"schedule editions overlap: {prev.path.name} ({prev.start}〜{prev.end}) / "
+                f"{cur.path.name} ({cur.start}〜{cur.end})"
+            )
+    return editions
+
+
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def content_sha256(obj) -> str:
+    # キー順を揃えたJSONのハッシュ（YAMLの書式・並び順の違いでは変わらない）
+    data = json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def stored_sha256(conn: sqlite3.Connection, source_id: str) -> str | None:
+    row = conn.execute("SELECT sha256 FROM sources WHERE source_id=?", (source_id,)).fetchone()
+    return row[0] if row else None
+
+
+def load_fingerprints(conn: sqlite3.Connection, scope: str) -> dict[str, str]:
+    return {
+        key: sha
+        for key, sha in conn.execute("SELECT key, sha256 FROM seed_fingerprints WHERE scope=?", (scope,))
+    }
+
+
+def save_fingerprints(conn: sqlite3.Connection, scope: str, fingerprints: dict[str, str]) -> None:
+    # scope 内を fingerprints と同じ内容にする（消えたキーは削除、変わったキーだけ更新）
+    old = load_fingerprints(conn, scope)
+    conn.executemany(
+        "DELETE FROM seed_fingerprints WHERE scope=? AND key=?",
+        ((scope, key) for key in old.keys() - fingerprints.keys()),
+    )
+    conn.executemany(
+        """
+        INSERT INTO seed_fingerprints(scope, key, sha256) VALUES (?, ?, ?)
+        ON CONFLICT(scope, key) DO UPDATE SET sha256=excluded.sha256
+        """,
+        ((scope, key, sha) for key, sha in fingerprints.items() if old.get(key) != sha),
+    )
+
+
+def upsert_source(conn: sqlite3.Connection, edition: ScheduleEdition) -> str:
+    schedule = edition.schedule
     pdf = schedule["sources"]["pdf"]
-    source_id = "src_pdf_r7"
+    source_id = edition.source_id
     conn.execute(
         """
-        INSERT OR REPLACE INTO sources(source_id, source_type, title, file_path, fetched_at)
-        VALUES(?, ?, ?, ?, ?)
+        INSERT INTO sources(source_id, source_type, title, file_path, fetched_at, sha256, effective_start, effective_end)
+        VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source_id) DO UPDATE SET
+          source_type=excluded.source_type,
+          title=excluded.title,
+          file_path=excluded.file_path,
+          fetched_at=excluded.fetched_at,
+          sha256=excluded.sha256,
+          effective_start=excluded.effective_start,
+          effective_end=excluded.effective_end
+        WHERE (sources.source_type, sources.title, sources.file_path, sources.fetched_at, sources.sha256,
+               sources.effective_start, sources.effective_end)
+          IS NOT (excluded.source_type, excluded.title, excluded.file_path, excluded.fetched_at, excluded.sha256,
+                  excluded.effective_start, excluded.effective_end)
         """,
         (
             source_id,
@@ -100,180 +265,433 @@ def upsert_source(conn: sqlite3.Connection, schedule: dict) -> str:
             pdf["title"],
             pdf["file_path"],
             pdf.get("fetched_at") or datetime.utcnow().isoformat(timespec="seconds"),
+            edition.sha256,
+            str(schedule["effective_start"]),
+            str(schedule["effective_end"]),
         )
     )
-    conn.commit()
     return source_id
 
 
-def normalize_text(s: str) -> str:
-    s = unicodedata.normalize("NFKC", s or "").strip()
-    s = re.sub(r"\s+", " ", s)
-    return s
+# 以下の upsert_* は「内容が変わった行だけ」更新する（updated_at も変わった行だけ進む）
+# INSERT OR REPLACE は行を消して入れ直すため、ON DELETE CASCADE の子行まで消えてしまう
 
-def make_id(prefix: str, seed: str, n: int = 12) -> str:
-    h = hashlib.sha1(normalize_text(seed).encode("utf-8")).hexdigest()[:n]
-    return f"{prefix}_{h}"
 
-def upsert_categories(conn: sqlite3.Connection, schedule: dict, source_id: str) -> None:
+def upsert_categories(conn: sqlite3.Connection, editions: list[ScheduleEdition]) -> None:
+    # 区分は版をまたいで共通。同じ id は新しい版の名前・締切が勝つ（古い版の収集日の締切は collection_events 側に残る）
     now = datetime.utcnow().isoformat(timespec="seconds")
-    for c in schedule["categories"]:
-        name = c["name"]
-        deadline_time = c.get("deadline_time")
-        category_id = c["id"]
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO categories(category_id, name, deadline_time, disposal_instructions, source_id, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (category_id, name, deadline_time, c.get("disposal_instructions"), source_id, now),
-        )
-    conn.commit()
+    latest = {c["id"]: (c, e.source_id) for e in editions for c in e.schedule["categories"]}
+    conn.executemany(
+        """
+        INSERT INTO categories(category_id, name, deadline_time, disposal_instructions, source_id, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(category_id) DO UPDATE SET
+          name=excluded.name,
+          deadline_time=excluded.deadline_time,
+          disposal_instructions=excluded.disposal_instructions,
+          source_id=excluded.source_id,
+          updated_at=excluded.updated_at
+        WHERE (categories.name, categories.deadline_time, categories.disposal_instructions, categories.source_id)
+          IS NOT (excluded.name, excluded.deadline_time, excluded.disposal_instructions, excluded.source_id)
+        """,
+        (
+            (c["id"], c["name"], c.get("deadline_time"), c.get("disposal_instructions"), source_id, now)
+            for c, source_id in latest.values()
+        ),
+    )
+
 
 def upsert_schedule_groups(conn: sqlite3.Connection, schedule: dict, source_id: str) -> None:
     now = datetime.utcnow().isoformat(timespec="seconds")
-    for g in schedule["schedule_groups"]:
-        sg_id = g["id"]
-        category_id = g["category_id"]
-        name = g["name"]
-        rule = g["rule"]
-        rule_type = rule["type"]
-        rule_json = json.dumps(rule, ensure_ascii=False)
-
-        # YAMLは notes / note どちらでも受けられるようにする
-        note_obj = g.get("notes", g.get("note"))
-        note = json.dumps(note_obj, ensure_ascii=False) if isinstance(note_obj, (dict, list)) else note_obj
-
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO schedule_groups(
-              schedule_group_id, category_id, name, rule_type, rule_json, note, source_id, updated_at
+    deadline_by_cat = {c["id"]: c.get("deadline_time") for c in schedule["categories"]}
+
+    def rows():
+        for g in schedule["schedule_groups"]:
+            rule = g["rule"]
+            # YAMLは notes / note どちらでも受けられるようにする
+            note_obj = g.get("notes", g.get("note"))
+            note = json.dumps(note_obj, ensure_ascii=False) if isinstance(note_obj, (dict, list)) else note_obj
+            yield (
+                g["id"], g["category_id"], g["name"], rule["type"],
+                json.dumps(rule, ensure_ascii=False), deadline_by_cat.get(g["category_id"]), note, source_id, now,
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (sg_id, category_id, name, rule_type, rule_json, note, source_id, now),
+
+    conn.executemany(
+        """
+        INSERT INTO schedule_groups(
+          schedule_group_id, category_id, name, rule_type, rule_json, deadline_time, note, source_id, updated_at
         )
-    conn.commit()
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(schedule_group_id) DO UPDATE SET
+          category_id=excluded.category_id,
+          name=excluded.name,
+          rule_type=excluded.rule_type,
+          rule_json=excluded.rule_json,
+          deadline_time=excluded.deadline_time,
+          note=excluded.note,
+          source_id=excluded.source_id,
+          updated_at=excluded.updated_at
+        WHERE (schedule_groups.category_id, schedule_groups.name, schedule_groups.rule_type,
+               schedule_groups.rule_json, schedule_groups.deadline_time, schedule_groups.note, schedule_groups.source_id)
+          IS NOT (excluded.category_id, excluded.name, excluded.rule_type,
+                  excluded.rule_json, excluded.deadline_time, excluded.note, excluded.source_id)
+        """,
+        rows(),
+    )
 
-def upsert_areas_and_groups(conn: sqlite3.Connection, schedule: dict, source_id: str) -> None:
+    # YAMLから消えたパターンを削除（links は CASCADE で消える）
+    keep = {g["id"] for g in schedule["schedule_groups"]}
+    stale = [
+        (sg_id,)
+        for (sg_id,) in conn.execute("SELECT schedule_group_id FROM schedule_groups WHERE source_id=?", (source_id,))
+        if sg_id not in keep
+    ]
+    conn.executemany("DELETE FROM schedule_groups WHERE schedule_group_id=?", stale)
+
+
+def upsert_areas(conn: sqlite3.Connection, editions: list[ScheduleEdition]) -> None:
+    # 地区も版をまたいで共通。area_groups に出てくる地区名を全版から集める（YAMLのareasが空でもOK）
+    # source_id はその地区が出てくる一番新しい版
     now = datetime.utcnow().isoformat(timespec="seconds")
+    source_by_name = {
+        a: e.source_id
+        for e in editions
+        for g in e.schedule["area_groups"]
+        for a in g.get("areas", []) or []
+    }
+    area_id_by_name = {name: make_id("area", name) for name in sorted(source_by_name)}
+    conn.executemany(
+        """
+        INSERT INTO areas(area_id, name, source_id, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(area_id) DO UPDATE SET
+          name=excluded.name,
+          source_id=excluded.source_id,
+          updated_at=excluded.updated_at
+        WHERE (areas.name, areas.source_id) IS NOT (excluded.name, excluded.source_id)
+        """,
+        ((area_id, name, source_by_name[name], now) for name, area_id in area_id_by_name.items()),
+    )
 
-    # 1) area_groupsに出てくる地区名を集めて areas を作る（YAMLのareasが空でもOK）
-    area_names = set()
-    for g in schedule["area_groups"]:
-        for a in g.get("areas", []) or []:
-            area_names.add(a)
-
-    # areas upsert
-    area_id_by_name = {}
-    for name in sorted(area_names):
-        area_id = make_id("area", name)
-        area_id_by_name[name] = area_id
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO areas(area_id, name, source_id, updated_at)
-            VALUES (?, ?, ?, ?)
-            """,
-            (area_id, name, source_id, now),
-        )
+    # どの版にも出てこなくなった地区を削除（members / events は CASCADE で消える）
+    # YAMLが手元に無い版の地区は触らない
+    keep_areas = set(area_id_by_name.values())
+    edition_sources = {e.source_id for e in editions}
+    conn.executemany(
+        "DELETE FROM areas WHERE area_id=?",
+        [
+            (area_id,)
+            for area_id, source_id in conn.execute("SELECT area_id, source_id FROM areas")
+            if area_id not in keep_areas and source_id in edition_sources
+        ],
+    )
 
-    # 2) area_groups upsert + members
-    for g in schedule["area_groups"]:
-        gid = g["id"]   # YAMLのidをそのまま使う（説明しやすい）
-        gname = g["name"]
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO area_groups(area_group_id, name, source_id, updated_at)
-            VALUES (?, ?, ?, ?)
-            """,
-            (gid, gname, source_id, now),
-        )
-        # membersは入れ直し（再実行できるように）
-        conn.execute("DELETE FROM area_group_members WHERE area_group_id=?", (gid,))
-        for area_name in g.get("areas", []) or []:
-            conn.execute(
-                "INSERT OR IGNORE INTO area_group_members(area_group_id, area_id) VALUES (?, ?)",
-                (gid, area_id_by_name[area_name]),
-            )
 
-    conn.commit()
+def upsert_area_groups(conn: sqlite3.Connection, schedule: dict, source_id: str) -> None:
+    # 1つの版の地区グループと構成地区（地区そのものは upsert_areas で先に入れておく）
+    now = datetime.utcnow().isoformat(timespec="seconds")
+
+    # area_groups upsert + members
+    # YAMLのidをそのまま使う（説明しやすい）
+    conn.executemany(
+        """
+        INSERT INTO area_groups(area_group_id, name, source_id, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(area_group_id) DO UPDATE SET
+          name=excluded.name,
+          source_id=excluded.source_id,
+          updated_at=excluded.updated_at
+        WHERE (area_groups.name, area_groups.source_id) IS NOT (excluded.name, excluded.source_id)
+        """,
+        ((g["id"], g["name"], source_id, now) for g in schedule["area_groups"]),
+    )
+
+    # members は差分だけ入れ替える
+    new_members = {
+        (g["id"], make_id("area", area_name))
+        for g in schedule["area_groups"]
+        for area_name in g.get("areas", []) or []
+    }
+    old_members = set(conn.execute(
+        """
+        SELECT m.area_group_id, m.area_id
+        FROM area_group_members m
+        JOIN area_groups g ON g.area_group_id = m.area_group_id
+        WHERE g.source_id = ?
+        """,
+        (source_id,),
+    ).fetchall())
+    conn.executemany(
+        "DELETE FROM area_group_members WHERE area_group_id=? AND area_id=?",
+        old_members - new_members,
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO area_group_members(area_group_id, area_id) VALUES (?, ?)",
+        new_members - old_members,
+    )
+
+    # YAMLから消えたグループを削除（members / links は CASCADE で消える）
+    keep_groups = {g["id"] for g in schedule["area_groups"]}
+    conn.executemany(
+        "DELETE FROM area_groups WHERE area_group_id=?",
+        [
+            (gid,)
+            for (gid,) in conn.execute("SELECT area_group_id FROM area_groups WHERE source_id=?", (source_id,))
+            if gid not in keep_groups
+        ],
+    )
+
 
 def upsert_area_group_schedule_links(conn: sqlite3.Connection, schedule: dict) -> None:
     # schedule_groups の category_id 整合チェック用
     sg_cat = {g["id"]: g["category_id"] for g in schedule["schedule_groups"]}
 
+    new_links = set()
     for link in schedule["area_group_schedule_links"]:
         agid = link["area_group_id"]
-
-        # 再実行できるようにいったん削除
-        conn.execute("DELETE FROM area_group_schedule_links WHERE area_group_id=?", (agid,))
-
         for s in link["schedules"]:
             sgid = s["schedule_id"]
             # YAMLに書かれた category_id と schedule_groups.category_id が一致するか検証
             if sg_cat.get(sgid) != s["category_id"]:
                 raise ValueError(f"link mismatch: area_group={agid} schedule={sgid} category_id={s['category_id']} != {sg_cat.get(sgid)}")
+            new_links.add((agid, sgid))
+
+    # YAMLに出てくるグループの links を差分で入れ替える
+    group_ids = {link["area_group_id"] for link in schedule["area_group_schedule_links"]}
+    old_links = {
+        row
+        for row in conn.execute("SELECT area_group_id, schedule_group_id FROM area_group_schedule_links")
+        if row[0] in group_ids
+    }
+    conn.executemany(
+        "DELETE FROM area_group_schedule_links WHERE area_group_id=? AND schedule_group_id=?",
+        old_links - new_links,
+    )
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO area_group_schedule_links(area_group_id, schedule_group_id)
+        VALUES (?, ?)
+        """,
+        new_links - old_links,
+    )
 
-            conn.execute(
-                """
-                INSERT OR IGNORE INTO area_group_schedule_links(area_group_id, schedule_group_id)
-                VALUES (?, ?)
-                """,
-                (agid, sgid),
+
+def load_exceptions(schedule: dict) -> list[ScheduleException]:
+    # トップレベルの exceptions: と、各パターンの note.year_end を例外として集める
+    out = [exception_from_dict(e) for e in schedule.get("exceptions", []) or []]
+    for g in schedule["schedule_groups"]:
+        note_obj = g.get("notes", g.get("note"))
+        if isinstance(note_obj, dict) and note_obj.get("year_end"):
+            out.append(exception_from_year_end(note_obj["year_end"], schedule_group_id=g["id"]))
+    return out
+
+
+def upsert_exceptions(conn: sqlite3.Connection, exceptions: list[ScheduleException], source_id: str) -> None:
+    # 再実行できるように、このsource分を入れ直す（数行なので差分は取らない）
+    conn.execute("DELETE FROM schedule_exceptions WHERE source_id=?", (source_id,))
+    conn.executemany(
+        """
+        INSERT INTO schedule_exceptions(
+          kind, start_date, end_date, substitute_date, category_id, schedule_group_id, note, source_id
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                e.kind,
+                e.start.isoformat(),
+                e.end.isoformat(),
+                e.substitute_date.isoformat() if e.substitute_date else None,
+                e.category_id,
+                e.schedule_group_id,
+                e.note,
+                source_id,
             )
-    conn.commit()
+            for e in exceptions
+        ],
+    )
+
 
-def upsert_events_from_links(conn: sqlite3.Connection, schedule: dict, source_id: str) -> None:
+def upsert_events_from_links(conn: sqlite3.Connection, schedule: dict, source_id: str) -> set[str]:
+    """
+    1つの版の収集日（collection_days）を作り直す。内容（ルール・例外・締切・地区構成）が変わった地区グループの地区だけ対象にする。
+    他の版の収集日には触らない。作り直した area_id の集合を返す。
+    """
     start = date.fromisoformat(schedule["effective_start"])
     end = date.fromisoformat(schedule["effective_end"])
 
-    # 既存events（このsource分）を削除してから再生成（ルール変更に強い）
-    conn.execute("DELETE FROM collection_events WHERE source_id=?", (source_id,))
-
     # schedule_group_id -> rule/category
     sg_by_id = {g["id"]: g for g in schedule["schedule_groups"]}
 
-    # category_id -> deadline_time
-    deadline_by_cat = {
-        row[0]: row[1]
-        for row in conn.execute("SELECT category_id, deadline_time FROM categories").fetchall()
-    }
+    # 年末年始などの例外
+    exceptions = load_exceptions(schedule)
+
+    # category_id -> deadline_time（版ごとの締切。categories は新しい版の値なので使わない）
+    deadline_by_cat = {c["id"]: c.get("deadline_time") for c in schedule["categories"]}
 
-    # area_group_id -> area_ids
+    # area_group_id -> area_ids（この版のグループだけ）
     area_ids_by_group = {}
-    for row in conn.execute("SELECT area_group_id, area_id FROM area_group_members").fetchall():
+    for row in conn.execute(
+        """
+        SELECT m.area_group_id, m.area_id
+        FROM area_group_members m
+        JOIN area_groups g ON g.area_group_id = m.area_group_id
+        WHERE g.source_id = ?
+        """,
+        (source_id,),
+    ).fetchall():
         area_ids_by_group.setdefault(row[0], []).append(row[1])
 
     # DB links を使って展開（YAMLから直接でも良いが、DBに入ったものを元にした方が整合チェックしやすい）
-    links = conn.execute("SELECT area_group_id, schedule_group_id FROM area_group_schedule_links").fetchall()
+    links = conn.execute(
+        """
+        SELECT l.area_group_id, l.schedule_group_id
+        FROM area_group_schedule_links l
+        JOIN area_groups g ON g.area_group_id = l.area_group_id
+        WHERE g.source_id = ?
+        """,
+        (source_id,),
+    ).fetchall()
 
-    for area_group_id, schedule_group_id in links:
-        g = sg_by_id[schedule_group_id]
+    # パターンごとの例外と、その内容のハッシュ
+    exceptions_by_sg = {}
+    sg_fingerprints = {}
+    for sg_id, g in sg_by_id.items():
         category_id = g["category_id"]
-        rule = g["rule"]
-        dates = generate_dates(rule, start, end)
+        group_exceptions = [e for e in exceptions if e.applies_to(sg_id, category_id)]
+        sg_fingerprints[sg_id] = content_sha256({
+            "rule": g["rule"],
+            "category_id": category_id,
+            "deadline_time": deadline_by_cat.get(category_id),
+            "range": [start, end],
+            "exceptions": sorted(map(repr, group_exceptions)),
+        })
+        exceptions_by_sg[sg_id] = group_exceptions
+
+    # 地区グループごとのハッシュ（構成地区 + 紐づくパターンのハッシュ）
+    sg_ids_by_group = {}
+    for area_group_id, schedule_group_id in links:
+        sg_ids_by_group.setdefault(area_group_id, []).append(schedule_group_id)
+    group_fingerprints = {
+        gid: content_sha256({
+            "source_id": source_id,
+            "areas": sorted(area_ids_by_group.get(gid, [])),
+            "schedules": sorted(sg_fingerprints[sg] for sg in sg_ids_by_group.get(gid, [])),
+        })
+        for gid in set(area_ids_by_group) | set(sg_ids_by_group)
+    }
 
-        deadline_time = deadline_by_cat.get(category_id)
-        note_obj = g.get("notes", g.get("note"))
-        note = json.dumps(note_obj, ensure_ascii=False) if isinstance(note_obj, (dict, list)) else note_obj
+    # ハッシュは版ごとに別の scope に持つ（他の版のハッシュを消さない）
+    fingerprint_scope = f"area_group:{source_id}"
+    old = load_fingerprints(conn, fingerprint_scope)
+    changed_groups = {gid for gid, fp in group_fingerprints.items() if old.get(gid) != fp}
+    changed_groups |= old.keys() - group_fingerprints.keys()
+
+    # 収集日の表は整数キーで持つ
+    area_no_by_id = dict(conn.execute("SELECT area_id, area_no FROM areas"))
+    category_no_by_id = dict(conn.execute("SELECT category_id, category_no FROM categories"))
+    source_no = conn.execute("SELECT source_no FROM sources WHERE source_id=?", (source_id,)).fetchone()[0]
+
+    # 変わったグループに属する地区 + このsourceのイベントを持つのにどのグループにも属さなくなった地区
+    member_areas = {a for ids in area_ids_by_group.values() for a in ids}
+    affected = {a for gid in changed_groups for a in area_ids_by_group.get(gid, [])}
+    affected |= {
+        area_id
+        for (area_id,) in conn.execute(
+            "SELECT DISTINCT a.area_id FROM collection_days d JOIN areas a ON a.area_no = d.area_no WHERE d.source_no=?",
+            (source_no,),
+        )
+        if area_id not in member_areas
+    }
+
+    conn.executemany(
+        "DELETE FROM collection_days WHERE area_no=? AND source_no=?",
+        ((area_no_by_id[area_id], source_no) for area_id in affected),
+    )
+
+    def rows():
+        for area_group_id, schedule_group_id in links:
+            g = sg_by_id[schedule_group_id]
+            category_id = g["category_id"]
+            area_ids = [a for a in area_ids_by_group.get(area_group_id, []) if a in affected]
+            if not area_ids:
+                continue
+            days = [day_no(d) for d in generate_dates(g["rule"], start, end, exceptions_by_sg[schedule_group_id])]
+            category_no = category_no_by_id[category_id]
+            deadline = minutes_no(deadline_by_cat.get(category_id))
+
+            # パターン共通の注記は schedule_groups.note にあるので、イベントごとには複製しない（note_no は NULL）
+            for area_id in area_ids:
+                area_no = area_no_by_id[area_id]
+                for d in days:
+                    yield (area_no, category_no, d, deadline, source_no)
+
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO collection_days(area_no, category_no, day, deadline, source_no)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        rows(),
+    )
 
-        for area_id in area_ids_by_group.get(area_group_id, []):
-            for d in dates:
-                conn.execute(
-                    """
-                    INSERT OR IGNORE INTO collection_events(
-                      area_id, category_id, collection_date, deadline_time, note, source_id
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (area_id, category_id, d.isoformat(), deadline_time, note, source_id),
-                )
+    save_fingerprints(conn, fingerprint_scope, group_fingerprints)
+    return affected
 
-    conn.commit()
 
+def drop_events(conn: sqlite3.Connection) -> None:
+    # 展開済みの収集日を消す（次に展開するときは全地区作り直す）
+    conn.execute("DELETE FROM collection_days")
+    conn.execute("DELETE FROM next_pickup_days")
+    conn.execute("DELETE FROM event_notes")
+    conn.execute("DELETE FROM seed_fingerprints WHERE scope LIKE 'area_group%'")
 
-def export_csv(conn: sqlite3.Connection) -> None:
-    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+
+def build_next_pickups(conn: sqlite3.Connection, area_ids: set[str] | None = None) -> None:
+    # collection_days から「各日付 -> 次の収集日」の表を作り直す（area_ids 指定時はその地区だけ）
+    area_nos = None
+    if area_ids is None:
+        conn.execute("DELETE FROM next_pickup_days")
+    else:
+        area_no_by_id = dict(conn.execute("SELECT area_id, area_no FROM areas"))
+        area_nos = {area_no_by_id[a] for a in area_ids if a in area_no_by_id}
+        conn.executemany("DELETE FROM next_pickup_days WHERE area_no=?", ((n,) for n in area_nos))
+        conn.execute("DELETE FROM next_pickup_days WHERE area_no NOT IN (SELECT area_no FROM areas)")
+
+    first_day = conn.execute("SELECT MIN(day) FROM collection_days").fetchone()[0]
+    if first_day is None:
+        return
+
+    # 主キーの順（地区, 区分, 日付）に並んでいるので、並べ替えずに読める
+    events_by_key: dict[tuple[int, int], list[tuple[int, int | None]]] = {}
+    for area_no, category_no, day, deadline in conn.execute(
+        "SELECT area_no, category_no, day, deadline FROM collection_days ORDER BY area_no, category_no, day"
+    ):
+        if area_nos is not None and area_no not in area_nos:
+            continue
+        events_by_key.setdefault((area_no, category_no), []).append((day, deadline))
+
+    # 表は全イベントの最初の日付から作る（それより前の日は next_pickup 側で collection_days を引く）
+    def rows():
+        for (area_no, category_no), events in events_by_key.items():
+            d = first_day
+            for collection_day, deadline in events:
+                while d <= collection_day:
+                    yield (area_no, category_no, d, collection_day, deadline)
+                    d += 1
+
+    conn.executemany(
+        """
+        INSERT INTO next_pickup_days(area_no, category_no, day, collection_day, deadline)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        rows(),
+    )
+
+
+def export_csv(conn: sqlite3.Connection, out_dir: Path = EXPORT_DIR) -> None:
+    import pandas as pd  # 書き出すときだけ（import に時間がかかる）
+
+    out_dir.mkdir(parents=True, exist_ok=True)
     tables = [
     "sources",
     "categories",
@@ -282,21 +700,45 @@ def export_csv(conn: sqlite3.Connection) -> None:
     "area_group_members",
     "schedule_groups",
     "area_group_schedule_links",
+    "schedule_exceptions",
     "collection_events",
     "items",
     "item_aliases",
     ]
     for t in tables:
         df = pd.read_sql_query(f"SELECT * FROM {t}", conn)
-        df.to_csv(EXPORT_DIR / f"{t}.csv", index=False, encoding="utf-8-sig")
+        data = df.to_csv(index=False).encode("utf-8-sig")
+        # 中身が変わった表だけ書き直す（変わっていない表のCSVは差分に出さない）
+        path = out_dir / f"{t}.csv"
+        if not path.exists() or path.read_bytes() != data:
+            path.write_bytes(data)
 
-def seed_items_from_raw_csv(conn: sqlite3.Connection, source_id: str) -> None:
-    if not RAW_ITEMS_CSV.exists():
-        print(f"⚠️ raw items csv not found: {RAW_ITEMS_CSV} (skip)")
-        return
 
-    df = pd.read_csv(RAW_ITEMS_CSV)
+def upsert_items_source(conn: sqlite3.Connection, sha256: str | None) -> None:
+    # web辞典由来のsource（1行入れる）。fetched_at を進めると実行中のサーバの索引も読み直される
+    conn.execute(
+        """
+        INSERT INTO sources(source_id, source_type, title, url, fetched_at, sha256)
+        VALUES (?,?,?,?,datetime('now'),?)
+        ON CONFLICT(source_id) DO UPDATE SET
+          fetched_at=excluded.fetched_at,
+          sha256=excluded.sha256
+        """,
+        (ITEMS_SOURCE_ID, "web", "分別辞典", ITEMS_SOURCE_URL, sha256),
+    )
+
 
+def seed_items_from_rows(
+    conn: sqlite3.Connection,
+    rows: Iterable[tuple[str, str, str]],
+    source_id: str,
+    prune: bool | Callable[[], bool] = True,
+) -> int:
+    """
+    (item_name, category, note) の行を1回なめて items に反映する（collector から直接でも、CSVからでも）。
+    前回から内容が変わった行だけ書き、prune=True なら今回無かった行を消す。反映した行数を返す。
+    prune に関数を渡すと、行を読み切ってから呼んで決める（取得しながら流すときは、失敗ページが最後まで分からない）。
+    """
     now = datetime.utcnow().isoformat(timespec="seconds")
 
     # DBに存在するカテゴリ名→category_id
@@ -305,80 +747,212 @@ def seed_items_from_raw_csv(conn: sqlite3.Connection, source_id: str) -> None:
         for row in conn.execute("SELECT name, category_id FROM categories").fetchall()
     }
 
-    inserted = 0
-    updated = 0
-
-    for _, row in df.iterrows():
-        item_name = str(row["item_name"])
-        category_name = str(row["category"])
-        if category_name == "自己処理" or category_name == "古紙（チラシ・雑誌・本・コピー用紙類）" or category_name == "紙パック" or category_name == "未設定" or category_name == "古着・布類" or category_name == "古紙（新聞紙）" or category_name == "古紙（段ボール）" or category_name == "保留中":
+    # name_norm -> (item_id, name, name_key, category_id, note, sha256)。同じ name_norm は後の行が勝つ（UPSERTと同じ）
+    prepared: dict[str, tuple] = {}
+    unknown = set()
+    for name, category, note in rows:
+        if category in SKIP_CATEGORIES:
             continue
-
-        note = "" if pd.isna(row.get("note")) else str(row.get("note"))
-
-        # collector側のカテゴリ名がschedule側に存在しない可能性があるので、
-        # 無ければ categories に追加して整合を保つ
-        if category_name not in cat_id_by_name:
-            raise ValueError(f"Unknown category in items CSV: {category_name}")
-
-        item_id = make_id("item", item_name + "|" + category_name)
-        name_norm = normalize_text(item_name)
-        category_id = cat_id_by_name[category_name]
-
-        # UPSERT（同じname_normが来たら更新）
-        cur = conn.execute(
-            """
-            INSERT INTO items(item_id, name, name_norm, category_id, note, source_id, source_url, fetched_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(name_norm) DO UPDATE SET
-              category_id=excluded.category_id,
-              note=excluded.note,
-              updated_at=excluded.updated_at
-            """,
-            (
-                item_id,
-                item_name,
-                name_norm,
-                category_id,
-                note,
-                source_id,
-                "https://gb.hn-kouiki.jp/nonoichi",
-                now,
-                now,
-            ),
+        category_id = cat_id_by_name.get(category)
+        if category_id is None:
+            unknown.add(category)
+            continue
+        note = note or ""
+        name_key = reading_key(name)
+        prepared[normalize_text(name)] = (
+            make_id("item", f"{name}|{category}"),
+            name,
+            name_key,
+            category_id,
+            note,
+            content_sha256((name, name_key, category_id, note)),
         )
-        # sqlite3のrowcountは信用しにくいので概算（今回は確認だけできればOK）
-        inserted += 1
-
-    conn.commit()
-    print(f"✅ seeded items from raw csv: {inserted} rows")
-
-def main() -> None:
-    if not SCHEDULE_PATH.exists():
-        raise FileNotFoundError(f"schedule not found: {SCHEDULE_PATH}")
-
-    schedule = load_schedule()
-    conn = connect()
-
-    source_id = upsert_source(conn, schedule)
-    upsert_categories(conn, schedule, source_id)
-    upsert_areas_and_groups(conn, schedule, source_id)
-    upsert_schedule_groups(conn, schedule, source_id)
-    upsert_area_group_schedule_links(conn, schedule)
-    upsert_events_from_links(conn, schedule, source_id)
-    # web辞典由来のsource（1行入れる）
-    conn.execute(
-        "INSERT OR REPLACE INTO sources(source_id, source_type, title, url, fetched_at) VALUES (?,?,?,?,datetime('now'))",
-        ("src_web_dict", "web", "分別辞典", "https://gb.hn-kouiki.jp/nonoichi",),
+
+    # collector側のカテゴリ名がschedule側に存在しない可能性があるので、ここで止める
+    if unknown:
+        raise ValueError(f"Unknown category in items: {sorted(unknown)}")
+
+    # 前回のハッシュと比べて、変わった行だけ反映
+    old = load_fingerprints(conn, "item")
+    changed = [(name_norm, v) for name_norm, v in prepared.items() if old.get(name_norm) != v[-1]]
+    if callable(prune):
+        prune = prune()
+    # 消す行は items 側から決める（--full ではハッシュを先に消しているので、ハッシュからは分からない）
+    removed = set()
+    if prune:
+        stored = {row[0] for row in conn.execute("SELECT name_norm FROM items WHERE source_id=?", (source_id,))}
+        removed = stored - prepared.keys()
+
+    # UPSERT（同じname_normが来たら更新）
+    conn.executemany(
+        """
+        INSERT INTO items(item_id, name, name_norm, name_key, category_id, note, source_id, source_url, fetched_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(name_norm) DO UPDATE SET
+          name_key=excluded.name_key,
+          category_id=excluded.category_id,
+          note=excluded.note,
+          updated_at=excluded.updated_at
+        WHERE (items.name_key, items.category_id, items.note)
+          IS NOT (excluded.name_key, excluded.category_id, excluded.note)
+        """,
+        (
+            (item_id, name, name_norm, name_key, category_id, note, source_id, ITEMS_SOURCE_URL, now, now)
+            for name_norm, (item_id, name, name_key, category_id, note, _) in changed
+        ),
+    )
+    conn.executemany(
+        "DELETE FROM items WHERE name_norm=? AND source_id=?",
+        ((name_norm, source_id) for name_norm in removed),
+    )
+
+    fingerprints = {name_norm: v[-1] for name_norm, v in prepared.items()}
+    if not prune:
+        # 一部だけ取れたとき: 今回無かった行のハッシュは残す
+        fingerprints = {**old, **fingerprints}
+    save_fingerprints(conn, "item", fingerprints)
+    print(f"✅ seeded items: {len(prepared)} rows ({len(changed)} changed, {len(removed)} removed)")
+    return len(changed) + len(removed)
+
+
+def iter_raw_csv_rows(path: Path = RAW_ITEMS_CSV) -> Iterator[tuple[str, str, str]]:
+    # collector の出力CSV（item_name,category,note,page）を1行ずつ読む
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            yield row["item_name"], row["category"], row["note"]
+
+
+def seed_items_from_raw_csv(conn: sqlite3.Connection, source_id: str, path: Path = RAW_ITEMS_CSV) -> int:
+    """
+    raw CSV の行のうち、前回から内容が変わった行だけ items に反映する。反映（追加・更新・削除）した行数を返す。
+    """
+    if not path.exists():
+        print(f"⚠️ raw items csv not found: {path} (skip)")
+        return 0
+    return seed_items_from_rows(conn, iter_raw_csv_rows(path), source_id)
+
+
+def refresh_alias_keys(conn: sqlite3.Connection) -> None:
+    # 別名の読みキーを埋め直す（別名は手入力で増えるので毎回計算）
+    rows = conn.execute("SELECT alias_id, alias, alias_key FROM item_aliases").fetchall()
+    conn.executemany(
+        "UPDATE item_aliases SET alias_key=? WHERE alias_id=?",
+        [(key, alias_id) for alias_id, alias, old_key in rows if (key := reading_key(alias)) != old_key],
     )
-    conn.commit()
 
-    seed_items_from_raw_csv(conn, "src_web_dict")
-    export_csv(conn)
 
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--full", action="store_true", help="前回との差分を見ずに全件入れ直す")
+    p.add_argument("--no-events", action="store_true",
+                   help="collection_events を作らない（収集日はルールからその場で計算する）")
+    p.add_argument("--snapshot", action="store_true",
+                   help="シード後にサーバ用のスナップショットを作って公開する（snapshot.py）")
+    p.add_argument("--snapshot-keys", action="store_true", help="スナップショットに品目索引のキーファイルも付ける")
+    # 合成データ（bench/synth_data.py）などを別のDBに入れるとき用
+    p.add_argument("--db", type=Path, default=DB_PATH, help="シード先のDB")
+    p.add_argument("--schedule-dir", type=Path, default=SCHEDULE_DIR, help=f"{SCHEDULE_GLOB} を置いたディレクトリ")
+    p.add_argument("--items-csv", type=Path, default=RAW_ITEMS_CSV, help="品目の raw CSV（item_name,category,note,page）")
+    p.add_argument("--export-dir", type=Path, default=EXPORT_DIR, help="CSVの書き出し先")
+    p.add_argument("--no-export", action="store_true", help="CSVを書き出さない")
+    args = p.parse_args(argv)
+    items_csv = args.items_csv
+
+    editions = load_schedule_editions(args.schedule_dir)
+    if not editions:
+        raise FileNotFoundError(f"schedule not found: {args.schedule_dir / SCHEDULE_GLOB}")
+
+    conn = connect(args.db)
+    apply_schema(conn)
+
+    # 初回（ハッシュがまだ無い）は全件。索引を後で作る方が速い
+    full = args.full or conn.execute("SELECT COUNT(*) FROM seed_fingerprints").fetchone()[0] == 0
+
+    items_sha = file_sha256(items_csv) if items_csv.exists() else None
+    changed = False
+
+    with bulk_load(conn, defer_indexes=full):
+        if full:
+            conn.execute("DELETE FROM seed_fingerprints")
+        # 版で分ける前の形式のハッシュは使わない
+        save_fingerprints(conn, "area_group", {})
+
+        # 収集日の展開は任意。展開しない場合は既存の展開分を消しておく（ルールから計算する側に任せる）
+        has_events = conn.execute("SELECT 1 FROM collection_days LIMIT 1").fetchone() is not None
+        if args.no_events and has_events:
+            drop_events(conn)
+            changed = True
+
+        # 前回から変わった版（と、収集日をまだ展開していない版）だけ入れ直す。他の版の行には触らない
+        def needs_events(e: ScheduleEdition) -> bool:
+            if args.no_events:
+                return False
+            return conn.execute(
+                """
+                SELECT 1 FROM collection_days
+                WHERE source_no = (SELECT source_no FROM sources WHERE source_id=?)
+                LIMIT 1
+                """,
+                (e.source_id,),
+            ).fetchone() is None
+
+        due = [
+            e for e in editions
+            if full or stored_sha256(conn, e.source_id) != e.sha256 or needs_events(e)
+        ]
+        if due:
+            for e in due:
+                upsert_source(conn, e)
+            # 区分・地区は全版で共通なので、全版を見て入れる（変わっていない行は書かない）
+            upsert_categories(conn, editions)
+            upsert_areas(conn, editions)
+
+            affected: set[str] = set()
+            for e in due:
+                upsert_area_groups(conn, e.schedule, e.source_id)
+                upsert_schedule_groups(conn, e.schedule, e.source_id)
+                upsert_area_group_schedule_links(conn, e.schedule)
+                upsert_exceptions(conn, load_exceptions(e.schedule), e.source_id)
+                if args.no_events:
+                    print(f"✅ schedule {e.edition}: rules only (collection_events not materialized)")
+                else:
+                    regenerated = upsert_events_from_links(conn, e.schedule, e.source_id)
+                    affected |= regenerated
+                    print(f"✅ schedule {e.edition}: {len(regenerated)} areas regenerated")
+            if not args.no_events:
+                # next_pickups は版をまたいで引くので、作り直した地区は全期間分を作る
+                build_next_pickups(conn, None if full else affected)
+            changed = True
+        for e in editions:
+            if e not in due:
+                print(f"✅ schedule unchanged: {e.path.name} (skip)")
+
+        # CSVは任意（collector --ingest で直接入れた場合は無いこともある）。
+        # CSVが前回読んだときから変わったときだけ反映する
+        if items_sha is None:
+            print(f"⚠️ raw items csv not found: {items_csv} (skip)")
+        elif full or load_fingerprints(conn, "file").get(items_csv.name) != items_sha:
+            upsert_items_source(conn, items_sha)
+            seed_items_from_raw_csv(conn, ITEMS_SOURCE_ID, items_csv)
+            save_fingerprints(conn, "file", {items_csv.name: items_sha})
+            changed = True
+        else:
+            print(f"✅ items unchanged: {items_csv.name} (skip)")
+        refresh_alias_keys(conn)
+
+    if changed and not args.no_export:
+        export_csv(conn, args.export_dir)
 
     conn.close()
-    print(f"✅ seeded sources from {SCHEDULE_PATH.name} as {source_id}")
+    for e in editions:
+        print(f"✅ seeded sources from {e.path.name} as {e.source_id} ({e.start}〜{e.end})")
+
+    if args.snapshot or args.snapshot_keys:
+        from backend.app.db.snapshot import compile_snapshot
+
+        compile_snapshot(args.db, args.db.parent / "snapshots", keys=args.snapshot_keys)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+from backend.app.db.init_db import DATA_DIR, DB_PATH, SCHEMA_PATH, schema_indexes
+
+# シード後のDBを、サーバが読むだけのスナップショットに「コンパイル」する
+# - VACUUM INTO で複製し、実行時に使わない表（シードの差分管理など）と索引を落とす
+# - 実行時のSQLに合わせた覆い索引を張り、ANALYZE してから VACUUM で詰める
+# - 読み取り専用（0444）にして版ごとのファイル名で置き、CURRENT（中身はファイル名）を os.replace で差し替える
+# サーバ（api.py の NONOICHI_SNAPSHOTS）は CURRENT を見て、新しい版を裏で開いてから切り替える。
+# 書き込み中のファイルを読むことが無いので、シードとリクエストでロックを取り合わない。
+
+SNAPSHOT_DIR = DATA_DIR / "db" / "snapshots"
+POINTER_NAME = "CURRENT"
+SNAPSHOT_PREFIX = "nonoichi_waste-"
+
+# サーバが読む表（seed_fingerprints などシード専用の表は入れない）。ビュー（collection_events など）はそのまま残る
+RUNTIME_TABLES = (
+    "sources",
+    "categories",
+    "areas",
+    "area_groups",
+    "area_group_members",
+    "schedule_groups",
+    "area_group_schedule_links",
+    "schedule_exceptions",
+    "event_notes",
+    "collection_days",
+    "next_pickup_days",
+    "items",
+    "item_aliases",
+    "model_label_maps",
+)
+
+# スナップショットで張る索引（定義は schema.sql。実行時のSQLが使うものだけ）
+# 品目は起動時にメモリへ全部読むので、items / item_aliases の索引は張らない
+SNAPSHOT_INDEXES = ("idx_days_area_day", "idx_members_area")
+
+
+def snapshot_fingerprint(conn: sqlite3.Connection) -> str:
+    """
+    スナップショットの中身を決めるもののハッシュ。
+    収集日・品目は sources（sha256 / fetched_at）から決まるので、それと手入力の表（別名・ラベル対応）を見る。
+    """
+    h = hashlib.sha256()
+    for sql in (
+        "SELECT source_id, sha256, fetched_at FROM sources ORDER BY source_id",
+        "SELECT item_id, alias_norm FROM item_aliases ORDER BY alias_norm",
+        "SELECT model_version, label_index, target_type, target_id FROM model_label_maps ORDER BY 1, 2",
+    ):
+        for row in conn.execute(sql):
+            h.update(repr(row).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _info(conn: sqlite3.Connection) -> dict[str, str]:
+    # スナップショットでないDB（snapshot_info が無い）は空
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='snapshot_info'").fetchone() is None:
+        return {}
+    return dict(conn.execute("SELECT key, value FROM snapshot_info"))
+
+
+def snapshot_info(path: Path) -> dict[str, str]:
+    conn = sqlite3.connect(f"file:{quote(str(path.resolve()))}?mode=ro&immutable=1", uri=True)
+    try:
+        return _info(conn)
+    finally:
+        conn.close()
+
+
+def current_snapshot(directory: Path = SNAPSHOT_DIR) -> Path | None:
+    # CURRENT が指しているスナップショット（まだ無ければ None）
+    try:
+        name = (directory / POINTER_NAME).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return directory / name if name else None
+
+
+def publish(path: Path, directory: Path = SNAPSHOT_DIR) -> None:
+    # CURRENT を書き換える（tmp に書いて os.replace するので、読む側は古いか新しいかのどちらかしか見ない）
+    tmp = directory / f".{POINTER_NAME}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(path.name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, directory / POINTER_NAME)
+
+
+def build_snapshot(src: Path, dest: Path, version: str, fingerprint: str) -> None:
+    """
+    src を dest に読み取り専用のスナップショットとして書き出す（dest は途中のファイル。公開は呼び出し側）。
+    """
+    src_conn = sqlite3.connect(f"file:{quote(str(src.resolve()))}?mode=ro", uri=True)
+    try:
+        src_conn.execute("VACUUM INTO ?", (str(dest),))
+    finally:
+        src_conn.close()
+
+    conn = sqlite3.connect(str(dest))
+    try:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        tables = [
+            name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )
+        ]
+        indexes = [
+            name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+            )
+        ]
+        for name in indexes:
+            conn.execute(f"DROP INDEX {name}")
+        for name in tables:
+            if name not in RUNTIME_TABLES:
+                conn.execute(f"DROP TABLE {name}")
+        index_sql = schema_indexes(SCHEMA_PATH.read_text(encoding="utf-8"))
+        for name in SNAPSHOT_INDEXES:
+            conn.execute(index_sql[name])
+
+        conn.execute("CREATE TABLE snapshot_info (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+        conn.executemany(
+            "INSERT INTO snapshot_info(key, value) VALUES (?, ?)",
+            [
+                ("version", version),
+                ("fingerprint", fingerprint),
+                ("built_at", datetime.utcnow().isoformat(timespec="seconds")),
+                ("source_db", src.name),
+            ],
+        )
+        conn.commit()
+
+        # 索引の統計（プランナが使う）を取ってから、落とした表の分を詰める
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("VACUUM")
+        ok = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if ok != "ok":
+            raise sqlite3.DatabaseError(f"snapshot check failed: {ok}")
+    finally:
+        conn.close()
+    os.chmod(dest, 0o444)
+
+
+def prune_snapshots(directory: Path = SNAPSHOT_DIR, keep: int = 3) -> list[Path]:
+    """
+    新しい順に keep 個（と CURRENT が指すもの）を残して消す。
+    サーバが開いたままの古い版を消しても、開いている間はOSが中身を残すので読み続けられる。
+    """
+    current = current_snapshot(directory)
+    snapshots = sorted(directory.glob(f"{SNAPSHOT_PREFIX}*.db"), reverse=True)
+    removed = []
+    for path in snapshots[keep:]:
+        if current is not None and path.name == current.name:
+            continue
+        for p in (path, path.with_suffix(".keys")):
+            if p.exists():
+                p.unlink()
+        removed.append(path)
+    return removed
+
+
+def compile_snapshot(
+    src: Path = DB_PATH,
+    directory: Path = SNAPSHOT_DIR,
+    keys: bool = False,
+    keep: int = 3,
+    force: bool = False,
+) -> Path:
+    """
+    src からスナップショットを作って公開し、そのパスを返す。
+    中身（snapshot_fingerprint）が今の版と同じなら作らずに今の版を返す（force=True なら作り直す）。
+    keys=True なら品目索引のキーファイル（mmap 用）も横に置く。
+    """
+    from backend.app.keyfile import keyfile_fingerprint, keyfile_for, write_keyfile
+
+    directory.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(f"file:{quote(str(src.resolve()))}?mode=ro", uri=True)
+    try:
+        fingerprint = snapshot_fingerprint(conn)
+    finally:
+        conn.close()
+
+    current = current_snapshot(directory)
+    if not force and current is not None and current.exists():
+        if snapshot_info(current).get("fingerprint") == fingerprint and (
+            not keys or keyfile_fingerprint(current.with_suffix(".keys")) == fingerprint
+        ):
+            print(f"✅ snapshot unchanged: {current.name} (skip)")
+            return current
+
+    version = f"{datetime.utcnow():%Y%m%dT%H%M%SZ}-{fingerprint[:8]}"
+    path = directory / f"{SNAPSHOT_PREFIX}{version}.db"
+    tmp = directory / f".{path.name}.tmp"
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        build_snapshot(src, tmp, version, fingerprint)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            os.chmod(tmp, 0o644)
+            tmp.unlink()
+
+    if keys:
+        from backend.app.pool import connect_readonly
+        from backend.app.query import ItemIndex
+
+        snap = connect_readonly(path, immutable=True)
+        try:
+            write_keyfile(ItemIndex.load(snap), keyfile_for(path), fingerprint)
+        finally:
+            snap.close()
+
+    # ファイルが揃ってから CURRENT を差し替える
+    publish(path, directory)
+    removed = prune_snapshots(directory, keep)
+    print(f"✅ snapshot: {path.name} ({path.stat().st_size} bytes, {len(removed)} old removed)")
+    return path
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--src", type=Path, default=DB_PATH, help="シード済みのDB")
+    p.add_argument("--dir", type=Path, default=SNAPSHOT_DIR, help="スナップショットを置くディレクトリ")
+    p.add_argument("--keys", action="store_true", help="品目索引のキーファイル（mmap 用）も作る")
+    p.add_argument("--keep", type=int, default=3, help="残す版の数")
+    p.add_argument("--force", action="store_true", help="中身が同じでも作り直す")
+    args = p.parse_args(argv)
+
+    if not args.src.exists():
+        raise FileNotFoundError(f"db not found: {args.src}")
+    compile_snapshot(args.src, args.dir, keys=args.keys, keep=max(1, args.keep), force=args.force)
+
+
+if __name__ == "__main__":
+    main()
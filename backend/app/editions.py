@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import bisect
+import sqlite3
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Iterator
+
+# 収集日程の版（年度ごとのPDF = sources の1行。r7, r8, ...）と、その有効期間
+# 日付 → 版 は開始日の並びを二分探索して引く（版どうしの期間は重ならない。seed_schedule で確認している）
+
+
+@dataclass(frozen=True)
+class Edition:
+    source_id: str
+    start: date
+    end: date | None    # None は終わり無し（open_ended）
+
+
+class EditionIndex:
+    def __init__(self, editions: Iterable[Edition] = ()):
+        self.editions = sorted(editions, key=lambda e: e.start)
+        self._starts = [e.start for e in self.editions]
+
+    def __len__(self) -> int:
+        return len(self.editions)
+
+    def _first(self, day: date) -> int:
+        # day を含む版、無ければ day より後に始まる最初の版の位置
+        i = bisect.bisect_right(self._starts, day) - 1
+        if i < 0:
+            return 0
+        end = self.editions[i].end
+        return i if end is None or day <= end else i + 1
+
+    def at(self, day: date) -> Edition | None:
+        # day に有効な版（どの版の期間にも入らなければ None）
+        i = self._first(day)
+        if i < len(self.editions) and self.editions[i].start <= day:
+            return self.editions[i]
+        return None
+
+    def from_day(self, day: date) -> Iterator[Edition]:
+        # day に有効な版（無ければ次に始まる版）から順に。年度をまたいで次の収集日を探す用
+        yield from self.editions[self._first(day):]
+
+    def between(self, start: date, end: date) -> Iterator[tuple[Edition, date, date]]:
+        # start〜end と重なる版と、重なっている期間
+        for e in self.from_day(start):
+            if e.start > end:
+                break
+            yield e, max(start, e.start), end if e.end is None else min(end, e.end)
+
+
+def load_editions(conn: sqlite3.Connection, open_ended: bool = False) -> EditionIndex:
+    """
+    sources の有効期間から版の索引を作る。期間が空の source は、展開済みの収集日の範囲で代用する。
+    期間の分からない source（品目の辞典など）は入れない。
+    open_ended=True なら最後の版の終わりを無くす（次の版を入れるまでルールを先まで延ばす）。
+    """
+    rows = conn.execute("SELECT source_id, source_type, effective_start, effective_end FROM sources").fetchall()
+
+    editions = []
+    for source_id, source_type, start, end in rows:
+        # 収集日を持つのは収集日程（pdf）の source だけ。他（品目の辞典など）で collection_events を全件なめない
+        if source_type != "pdf":
+            continue
+        if start is None or end is None:
+            start, end = conn.execute(
+                "SELECT MIN(collection_date), MAX(collection_date) FROM collection_events WHERE source_id = ?",
+                (source_id,),
+            ).fetchone()
+        if start is None or end is None:
+            continue
+        editions.append(Edition(source_id, date.fromisoformat(start), date.fromisoformat(end)))
+
+    index = EditionIndex(editions)
+    if open_ended and index.editions:
+        last = index.editions[-1]
+        index.editions[-1] = Edition(last.source_id, last.start, None)
+    return index
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import heapq
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Iterable
+
+# 文字n-gramの転置索引によるあいまい検索
+# 1) クエリの2-gram/3-gramを含むキーだけを候補にする（全件走査しない）
+# 2) Dice係数で絞り込み
+# 3) 上位候補だけ編集距離（上限付き・部分一致を考慮）で並べ替える
+
+
+def ngrams(s: str, sizes: tuple[int, ...] = (2, 3)) -> set[str]:
+    out: set[str] = set()
+    for n in sizes:
+        for i in range(len(s) - n + 1):
+            out.add(s[i:i + n])
+    return out
+
+
+def _query_grams(s: str) -> set[str]:
+    # 1文字クエリは1-gramで引く
+    return ngrams(s) if len(s) >= 2 else ngrams(s, (1,))
+
+
+def bounded_substring_distance(query: str, key: str, bound: int) -> int:
+    """
+    key のどこか一部分と query との編集距離（前後の余分な文字は無料）。
+    bound を超えるときは bound + 1 を返す。
+    Myersのビット並列法: 表の1列（query の長さ分）を整数のビットで持ち、key の1文字ごとに数回の演算で進める。
+    """
+    m = len(query)
+    if m == 0:
+        return 0
+    peq: dict[str, int] = {}
+    for i, c in enumerate(query):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    full = (1 << m) - 1
+    top = 1 << (m - 1)
+    pv, mv = full, 0  # 縦方向の差分が +1 / -1 の行
+    score = best = m
+    for c in key:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & top:
+            score += 1
+        elif mh & top:
+            score -= 1
+        if score < best:
+            best = score
+        # 1行目は常に0（key のどこから始めてもよい）なので下から1を入れない
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return best if best <= bound else bound + 1
+
+
+@dataclass
+class NgramIndex:
+    keys: list[str] = field(default_factory=list)
+    postings: dict[str, list[int]] = field(default_factory=dict)  # gram -> keysの添字
+    gram_counts: list[int] = field(default_factory=list)          # 各キーの2/3-gram数（Dice用）
+
+    @classmethod
+    def build(cls, keys: Iterable[str]) -> NgramIndex:
+        uniq = sorted(set(k for k in keys if k))
+        postings: dict[str, list[int]] = defaultdict(list)
+        gram_counts = []
+        for idx, key in enumerate(uniq):
+            grams = ngrams(key)
+            gram_counts.append(len(grams))
+            for g in grams | ngrams(key, (1,)):
+                postings[g].append(idx)
+        return cls(keys=uniq, postings=dict(postings), gram_counts=gram_counts)
+
+    def search(self, query: str, k: int = 10, shortlist: int | None = None) -> list[tuple[str, float]]:
+        """
+        query に近いキーを (key, score) のリストで返す（score降順、最大k件）。
+        query は正規化済みであること。
+        編集距離で測り直すのは Dice係数の上位 shortlist 件（既定は k の2倍）だけ。
+        """
+        if not query:
+            return []
+
+        qgrams = _query_grams(query)
+        # キーごとの共通gram数（Counter で数えるとPythonのループより速い）
+        common = Counter(chain.from_iterable(self.postings.get(g, ()) for g in qgrams))
+        if not common:
+            return []
+
+        # Dice係数で候補を絞る（1文字クエリは含まれていれば同点）
+        qn = len(qgrams)
+        if len(query) >= 2:
+            dice = {idx: 2 * c / (qn + self.gram_counts[idx]) for idx, c in common.items()}
+        else:
+            dice = {idx: 1.0 / (1 + len(self.keys[idx])) for idx in common}
+        # 同点はキーの順で切る（setの順に左右されないように）
+        cand = heapq.nlargest(max(shortlist or 2 * k, k), dice.items(), key=lambda kv: (kv[1], -kv[0]))
+
+        # 上位候補だけ編集距離（部分一致なら0）で再評価。余計な文字が少ないほど良い
+        # 1回の編集で崩れる2-gram/3-gramは合わせて5個までなので、足りないgramの数から距離の下限が分かる。
+        # スコアの上限が高い順に測り、上限が上位k件に届かなくなったらそこで打ち切る
+        bound = max(1, len(query) // 3)
+        plans = []
+        for idx, d in cand:
+            key = self.keys[idx]
+            fit = 0.5 + 0.5 * min(1.0, len(query) / len(key))
+            if query in key:
+                least = 0
+            elif len(query) >= 2:
+                least = max(1, -(-(qn - common[idx]) // 5))
+            else:
+                least = 1
+            best = max(d, (1 - least / len(query)) * fit) if least <= bound else d
+            plans.append((best, key, d, fit, least))
+        plans.sort(key=lambda p: -p[0])
+
+        top: list[float] = []  # これまでの上位k件のスコア（最小ヒープ）
+        scored = []
+        for best, key, d, fit, least in plans:
+            if len(top) == k and best < top[0]:
+                break
+            if least == 0:
+                dist = 0
+            elif least > bound:
+                dist = bound + 1
+            else:
+                dist = bounded_substring_distance(query, key, bound)
+            sim = (1 - dist / len(query)) * fit if dist <= bound else 0.0
+            score = max(d, sim)
+            scored.append((key, score))
+            if len(top) < k:
+                heapq.heappush(top, score)
+            elif score > top[0]:
+                heapq.heapreplace(top, score)
+
+        scored.sort(key=lambda kv: (-kv[1], len(kv[0]), kv[0]))
+        return scored[:k]
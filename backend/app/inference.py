@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import io
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+from backend.app.phash_cache import PHashCache, dhash
+
+# スタブモデル（"モジュール:クラス"）。--bench とテストだけで使い、サーバーの既定にはしない
+STUB_MODEL = "backend.app.inference:StubModel"
+
+# マイクロバッチ: 最大件数と、最初の1件が来てから待つ時間
+DEFAULT_MAX_BATCH = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+# ================
+# モデル
+# ================
+
+class StubModel:
+    """
+    学習済みモデルの代わりの小さな決定的モデル（テスト・負荷試験用）。
+    8x8 に平均プーリングした画素を固定の乱数行列で射影し、一番大きいラベルを返す。
+    同じ画像なら必ず同じラベル・スコアになる。
+    """
+    version = "stub-v1"
+    input_size = (224, 224)
+    num_labels = 16
+
+    def __init__(self):
+        rnd = np.random.default_rng(0)
+        self.weights = rnd.standard_normal((8 * 8 * 3, self.num_labels)).astype(np.float32)
+
+    def predict_batch(self, images: np.ndarray) -> list[tuple[int, float]]:
+        # images: (N, H, W, 3) float32 0..1
+        n, h, w, _ = images.shape
+        pooled = images.reshape(n, 8, h // 8, 8, w // 8, 3).mean(axis=(2, 4)).reshape(n, -1)
+        logits = (pooled - 0.5) @ self.weights
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        labels = probs.argmax(axis=1)
+        return [(int(i), float(probs[k, i])) for k, i in enumerate(labels)]
+
+
+def load_model(spec: str):
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+def decode_image(data: bytes, size: tuple[int, int]) -> np.ndarray:
+    """
+    画像のバイト列をモデル入力（H, W, 3 の float32 0..1）にする。
+    JPEG は draft() で縮小しながら読むので、大きな写真でも速い。
+    """
+    with Image.open(io.BytesIO(data)) as im:
+        im.draft("RGB", size)
+        im = im.convert("RGB").resize(size, Image.BILINEAR)
+        return np.asarray(im, dtype=np.float32) / 255.0
+
+
+# ================
+# ワーカープロセス側
+# ================
+
+# プロセスごとに1回だけ読み込むモデル
+_MODEL = None
+
+
+def _init_worker(spec: str) -> None:
+    global _MODEL
+    _MODEL = load_model(spec)
+
+
+def _model_info() -> tuple[str, int]:
+    return _MODEL.version, os.getpid()
+
+
+def _run_batch(blobs: list[bytes]) -> list[tuple[int, float] | None]:
+    # 画像のデコード・縮小もワーカー側で行う（イベントループを止めない）。壊れた画像は None
+    size = _MODEL.input_size
+    arrays, ok = [], []
+    for k, data in enumerate(blobs):
+        try:
+            arrays.append(decode_image(data, size))
+            ok.append(k)
+        except Exception:
+            pass
+    out: list[tuple[int, float] | None] = [None] * len(blobs)
+    if arrays:
+        for k, pred in zip(ok, _MODEL.predict_batch(np.stack(arrays))):
+            out[k] = pred
+    return out
+
+
+# ================
+# ラベル → DBの区分・品目
+# ================
+
+@dataclass(frozen=True)
+class LabelTarget:
+    target_type: str        # 'category' / 'item'
+    target_id: str
+    category: str           # 区分名（item のときはその品目の区分）
+    item: str | None = None
+
+
+@dataclass
+class LabelMap:
+    # model_label_maps のメモリ上のコピー（label_index -> LabelTarget）
+    model_version: str
+    targets: dict[int, LabelTarget] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, model_version: str) -> LabelMap:
+        targets = {}
+        for label_index, target_type, target_id, category, item in conn.execute(
+            """
+            SELECT m.label_index, m.target_type, m.target_id, c.name, i.name
+            FROM model_label_maps m
+            LEFT JOIN items i ON m.target_type = 'item' AND i.item_id = m.target_id
+            JOIN categories c ON c.category_id = CASE
+                WHEN m.target_type = 'item' THEN i.category_id ELSE m.target_id END
+            WHERE m.model_version = ?
+            """,
+            (model_version,),
+        ):
+            targets[label_index] = LabelTarget(target_type, target_id, category, item)
+        return cls(model_version, targets)
+
+    def resolve(self, label_index: int) -> LabelTarget | None:
+        return self.targets.get(label_index)
+
+
+@dataclass
+class Prediction:
+    model_version: str
+    label_index: int
+    score: float
+    target: LabelTarget | None
+    cached: bool = False    # 知覚ハッシュのキャッシュから返したか
+
+
+# ================
+# マイクロバッチ付きの推論器
+# ================
+
+class Predictor:
+    """
+    CPUのプロセスプールで推論する。
+    同時に来たリクエストを max_wait_ms だけ待ってまとめ（最大 max_batch 件）、1回の推論にする。
+    バッチはワーカー数の2倍まで同時に流すので、コア数に応じてスループットが伸びる。
+    cache があれば、同じ（似た）画像は推論せずにキャッシュの結果を返す。
+    """
+
+    def __init__(
+        self,
+        model_spec: str,
+        workers: int = 1,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        cache: PHashCache | None = None,
+    ):
+        self.model_spec = model_spec
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.model_version = ""
+        self.label_map = LabelMap("")
+        self.batches = 0
+        self.images = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: asyncio.Semaphore | None = None
+
+    async def start(self, conn: sqlite3.Connection | None = None) -> None:
+        loop = asyncio.get_running_loop()
+        # fork だとサーバーのスレッドやロックを引き継ぐので spawn で起動する
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_spec,),
+        )
+        # 全ワーカーを起動してモデルを読み込ませておく（最初のリクエストを待たせない）
+        infos = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, _model_info) for _ in range(self.workers)
+        ])
+        self.model_version = infos[0][0]
+        if conn is not None:
+            self.label_map = self.read_label_map(conn)
+
+        self._queue = asyncio.Queue()
+        self._inflight = asyncio.Semaphore(self.workers * 2)
+        self._task = asyncio.create_task(self._batch_loop())
+
+    def read_label_map(self, conn: sqlite3.Connection) -> LabelMap:
+        # DB（スナップショット）を切り替えたら、新しいDBから読んだものを label_map に入れ直す
+        return LabelMap.load(conn, self.model_version)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self._executor is not None:
+            # 推論中のバッチの終わりをイベントループの上で待たない（ワーカーは終わり次第抜ける）
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def predict(self, data: bytes) -> Prediction:
+        loop = asyncio.get_running_loop()
+        h = None
+        if self.cache is not None:
+            # ハッシュ計算は小さく縮小するだけなのでスレッドで行う
+            try:
+                h = await loop.run_in_executor(None, dhash, data)
+            except Exception:
+                raise ValueError("invalid image")
+            hit = self.cache.get(self.model_version, h)
+            if hit is not None:
+                # ラベル → 区分の対応はDBの版で変わるので、今の label_map で引き直す
+                return replace(hit, cached=True, target=self.label_map.resolve(hit.label_index))
+
+        fut = loop.create_future()
+        await self._queue.put((data, fut))
+        label_index, score = await fut
+        pred = Prediction(self.model_version, label_index, score, self.label_map.resolve(label_index))
+        if h is not None:
+            self.cache.put(self.model_version, h, pred)
+        return pred
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._inflight.acquire()
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch: list[tuple[bytes, asyncio.Future]]) -> None:
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _run_batch, [data for data, _ in batch]
+            )
+            self.batches += 1
+            self.images += len(batch)
+            for (_, fut), result in zip(batch, results):
+                if fut.done():
+                    continue
+                if result is None:
+                    fut.set_exception(ValueError("invalid image"))
+                else:
+                    fut.set_result(result)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            self._inflight.release()
+
+
+# ================
+# 補助: スタブモデルのラベル登録・スループット計測
+# ================
+
+def register_stub_labels(conn: sqlite3.Connection, model_version: str = StubModel.version) -> int:
+    # スタブモデルのラベル i を、区分（category_id 順）に順番に割り当てる
+    category_ids = [r[0] for r in conn.execute("SELECT category_id FROM categories ORDER BY category_id")]
+    if not category_ids:
+        return 0
+    rows = [
+        (model_version, i, "category", category_ids[i % len(category_ids)])
+        for i in range(StubModel.num_labels)
+    ]
+    conn.executemany(
+        """
+        INSERT INTO model_label_maps(model_version, label_index, target_type, target_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(model_version, label_index) DO UPDATE SET
+          target_type=excluded.target_type,
+          target_id=excluded.target_id
+        """,
+        rows,
+    )
+    conn.commit()
+    return len(rows)
+
+
+def synthetic_jpegs(n: int, size: tuple[int, int] = (640, 480), seed: int = 0) -> list[bytes]:
+    # 負荷試験用の画像（色の違うJPEG）
+    rnd = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        base = rnd.integers(0, 256, size=3)
+        noise = rnd.integers(-40, 40, size=(size[1], size[0], 3))
+        arr = np.clip(base + noise, 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(arr).save(buf, format="JPEG", quality=85)
+        out.append(buf.getvalue())
+    return out
+
+
+async def _measure(workers: int, blobs: list[bytes], concurrency: int, model_spec: str) -> tuple[float, float]:
+    import time
+
+    predictor = Predictor(model_spec, workers=workers)
+    await predictor.start()
+    try:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(data: bytes):
+            async with sem:
+                await predictor.predict(data)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[one(b) for b in blobs])
+        elapsed = time.perf_counter() - t0
+        return len(blobs) / elapsed, predictor.images / max(1, predictor.batches)
+    finally:
+        await predictor.close()
+
+
+def main():
+    import argparse
+
+    from backend.app.next_pickup import connect
+
+    p = argparse.ArgumentParser(description="画像分類（推論）の補助コマンド")
+    p.add_argument("--register-stub", action="store_true", help="スタブモデルのラベルを model_label_maps に登録する")
+    p.add_argument("--bench", action="store_true", help="ワーカー数ごとのスループットを計測する")
+    p.add_argument("--model", default=STUB_MODEL, help="--bench で使うモデル（モジュール:クラス）")
+    p.add_argument("--images", type=int, default=400, help="--bench で流す画像数")
+    p.add_argument("--concurrency", type=int, default=64, help="--bench の同時リクエスト数")
+    args = p.parse_args()
+
+    if args.register_stub:
+        conn = connect()
+        try:
+            n = register_stub_labels(conn)
+        finally:
+            conn.close()
+        print(f"✅ model_label_maps に {n} 件登録しました ({StubModel.version})")
+
+    if args.bench:
+        blobs = synthetic_jpegs(args.images)
+        cores = os.cpu_count() or 1
+        counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+        base = None
+        for workers in counts:
+            rate, per_batch = asyncio.run(_measure(workers, blobs, args.concurrency, args.model))
+            base = base or rate
+            print(f"workers={workers:2d}: {rate:7.1f} images/s (x{rate / base:.2f}, 平均 {per_batch:.1f} 枚/バッチ)")
+
+
+if __name__ == "__main__":
+    main()
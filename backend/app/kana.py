@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+
+# 読みキー（reading key）の生成
+# 「ぺっとぼとる」「ペットボトル」「petto botoru」を同じキーに畳み込み、
+# 完全一致（索引1回の検索）で拾える入力を増やす。
+
+# 小書き文字 -> 通常の文字
+_SMALL_KANA = str.maketrans("ァィゥェォッャュョヮヵヶ", "アイウエオツヤユヨワカケ")
+
+# キーに含めない記号（長音・中黒・空白・ハイフン）
+_DROP_RE = re.compile(r"[ー～〜・\s-]+")
+
+# ローマ字（ヘボン式・訓令式の主なもの）-> カタカナ。長いつづりから順に当てる
+_ROMAJI = {
+    "kya": "キャ", "kyu": "キュ", "kyo": "キョ", "sha": "シャ", "shu": "シュ", "sho": "ショ",
+    "sya": "シャ", "syu": "シュ", "syo": "ショ", "cha": "チャ", "chu": "チュ", "cho": "チョ",
+    "tya": "チャ", "tyu": "チュ", "tyo": "チョ", "nya": "ニャ", "nyu": "ニュ", "nyo": "ニョ",
+    "hya": "ヒャ", "hyu": "ヒュ", "hyo": "ヒョ", "mya": "ミャ", "myu": "ミュ", "myo": "ミョ",
+    "rya": "リャ", "ryu": "リュ", "ryo": "リョ", "gya": "ギャ", "gyu": "ギュ", "gyo": "ギョ",
+    "bya": "ビャ", "byu": "ビュ", "byo": "ビョ", "pya": "ピャ", "pyu": "ピュ", "pyo": "ピョ",
+    "jya": "ジャ", "jyu": "ジュ", "jyo": "ジョ", "shi": "シ", "chi": "チ", "tsu": "ツ",
+    "ja": "ジャ", "ju": "ジュ", "jo": "ジョ", "je": "ジェ", "fa": "ファ", "fi": "フィ",
+    "fe": "フェ", "fo": "フォ", "ti": "ティ", "di": "ディ", "she": "シェ", "che": "チェ",
+    "ka": "カ", "ki": "キ", "ku": "ク", "ke": "ケ", "ko": "コ",
+    "sa": "サ", "si": "シ", "su": "ス", "se": "セ", "so": "ソ",
+    "ta": "タ", "tu": "ツ", "te": "テ", "to": "ト",
+    "na": "ナ", "ni": "ニ", "nu": "ヌ", "ne": "ネ", "no": "ノ",
+    "ha": "ハ", "hi": "ヒ", "hu": "フ", "fu": "フ", "he": "ヘ", "ho": "ホ",
+    "ma": "マ", "mi": "ミ", "mu": "ム", "me": "メ", "mo": "モ",
+    "ya": "ヤ", "yu": "ユ", "yo": "ヨ",
+    "ra": "ラ", "ri": "リ", "ru": "ル", "re": "レ", "ro": "ロ",
+    "wa": "ワ", "wo": "ヲ",
+    "ga": "ガ", "gi": "ギ", "gu": "グ", "ge": "ゲ", "go": "ゴ",
+    "za": "ザ", "zi": "ジ", "ji": "ジ", "zu": "ズ", "ze": "ゼ", "zo": "ゾ",
+    "da": "ダ", "de": "デ", "do": "ド", "du": "ヅ",
+    "ba": "バ", "bi": "ビ", "bu": "ブ", "be": "ベ", "bo": "ボ",
+    "pa": "パ", "pi": "ピ", "pu": "プ", "pe": "ペ", "po": "ポ",
+    "va": "ヴァ", "vi": "ヴィ", "vu": "ヴ", "ve": "ヴェ", "vo": "ヴォ",
+    "a": "ア", "i": "イ", "u": "ウ", "e": "エ", "o": "オ",
+}
+_ROMAJI_MAX = max(len(k) for k in _ROMAJI)
+# カタカナ1文字 -> 母音（長音の畳み込み用）
+_VOWEL_OF = {kana: roma[-1] for roma, kana in _ROMAJI.items() if len(kana) == 1}
+_VOWEL_KANA = {"ア": "a", "イ": "i", "ウ": "u", "エ": "e", "オ": "o"}
+_ASCII_WORD_RE = re.compile(r"[a-z]+")
+
+
+def romaji_to_katakana(word: str) -> str | None:
+    """
+    ローマ字1語をカタカナにする。変換できない綴りが残る場合は None（"pet" などの略語はそのまま扱う）。
+    """
+    out = []
+    i = 0
+    while i < len(word):
+        c = word[i]
+        nxt = word[i + 1] if i + 1 < len(word) else ""
+        # 促音: 同じ子音の連続（tt, kk, pp ...）
+        if c == nxt and c not in "aiueon":
+            out.append("ッ")
+            i += 1
+            continue
+        # 撥音: n の後が母音/y でない（末尾含む）、または nn
+        # nn の後に母音/y が続くときは2つ目の n が次の音の頭（konnichiwa -> コンニチワ）
+        if c == "n" and (nxt == "" or nxt not in "aiueoy"):
+            out.append("ン")
+            after = word[i + 2] if i + 2 < len(word) else ""
+            i += 2 if nxt == "n" and (after == "" or after not in "aiueoy") else 1
+            continue
+        for size in range(_ROMAJI_MAX, 0, -1):
+            kana = _ROMAJI.get(word[i:i + size])
+            if kana:
+                out.append(kana)
+                i += size
+                break
+        else:
+            return None
+    return "".join(out)
+
+
+def to_katakana(s: str) -> str:
+    # ひらがな（ぁ..ゖ）をカタカナへ
+    return "".join(chr(ord(c) + 0x60) if "ぁ" <= c <= "ゖ" else c for c in s)
+
+
+def fold_long_vowels(s: str) -> str:
+    # 直前の音と同じ母音のア行を落とす（カアペット -> カペット、コオヒイ -> コヒ）
+    # 長音記号を消すのと合わせて、ローマ字の kaa / koohii と カー / コーヒー を同じキーにする
+    out = []
+    prev = ""
+    for c in s:
+        if _VOWEL_KANA.get(c) == prev != "":
+            continue
+        out.append(c)
+        prev = _VOWEL_OF.get(c, "")
+    return "".join(out)
+
+
+def reading_key(s: str, romaji: bool = True) -> str:
+    """
+    表記ゆれを畳み込んだ検索キー。
+    NFKC -> 小文字化 ->（ローマ字 -> カタカナ）-> ひらがな -> カタカナ -> 小書き文字を通常の文字へ
+    -> 長音・中黒・空白・ハイフンを除去 -> 同じ母音の連続を1つに
+    """
+    s = unicodedata.normalize("NFKC", s or "").strip().lower()
+    if romaji:
+        s = _ASCII_WORD_RE.sub(lambda m: romaji_to_katakana(m.group(0)) or m.group(0), s)
+    s = to_katakana(s).translate(_SMALL_KANA)
+    return fold_long_vowels(_DROP_RE.sub("", s))
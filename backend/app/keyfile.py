@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from bisect import insort
+from pathlib import Path
+
+from backend.app.fuzzy import NgramIndex
+from backend.app.kana import reading_key
+from backend.app.query import ItemHit, ItemIndex, fuzzy_keys
+from backend.app.textnorm import normalize_text
+
+# 品目索引を mmap で読めるバイナリにしたもの（スナップショットの横に <名前>.keys で置く）
+# 起動時に items を読んで dict を組み立てる代わりに、ファイルを割り当てて二分探索する。
+# 複数のワーカープロセスがOSのページキャッシュを共有できる。
+#
+# レイアウト（すべてリトルエンディアン uint32）
+#   magic(8) + 元DBの snapshot_fingerprint（sha256 の16進 64文字） + 表4つ分の (件数, offsets位置, targets位置, blob位置)
+#   表0: 品目レコード  blob = "名前\x1f区分\x1f注記"（targets なし）
+#   表1: name_norm / 表2: alias_norm / 表3: 読みキー  blob = キー（UTF-8のバイト順に昇順）、targets = レコード番号
+#   表3 は同じキーが複数行になりうる（別の品目が同じ読みキーのとき。キー・レコード番号の順）
+#   offsets は件数+1 個（i 番目は blob[offsets[i]:offsets[i+1]]）
+# 読む側（query._load_index）は fingerprint がDBのものと一致するときだけ使う（古い .keys を信じない）
+
+MAGIC = b"NWKEYS3\0"
+FINGERPRINT_SIZE = 64
+_U32 = struct.Struct("<I")
+_TABLE = struct.Struct("<4I")
+_SEP = "\x1f"
+TABLES_POS = len(MAGIC) + FINGERPRINT_SIZE
+HEADER_SIZE = TABLES_POS + _TABLE.size * 4
+
+
+def keyfile_for(db_path: str | Path) -> Path:
+    return Path(db_path).with_suffix(".keys")
+
+
+def keyfile_fingerprint(path: str | Path) -> str | None:
+    # ヘッダの fingerprint（古い形式・壊れたファイルは None）
+    try:
+        with open(path, "rb") as f:
+            head = f.read(TABLES_POS)
+    except OSError:
+        return None
+    if len(head) < TABLES_POS or head[:len(MAGIC)] != MAGIC:
+        return None
+    return head[len(MAGIC):].decode("ascii", "replace")
+
+
+def write_keyfile(index: ItemIndex, path: str | Path, fingerprint: str) -> Path:
+    """
+    ItemIndex をキーファイルに書く（tmp に書いてから置き換える）。
+    fingerprint は元DBの snapshot_fingerprint（読むときにDBと照らし合わせる）。
+    """
+    path = Path(path)
+    fp = fingerprint.encode("ascii")
+    if len(fp) != FINGERPRINT_SIZE:
+        raise ValueError(f"fingerprint must be {FINGERPRINT_SIZE} hex chars: {fingerprint!r}")
+    record_no: dict[int, int] = {}
+    records: list[bytes] = []
+    for hit in [*index.by_name.values(), *index.by_alias.values(), *(h for hits in index.by_key.values() for h in hits)]:
+        if id(hit) not in record_no:
+            record_no[id(hit)] = len(records)
+            records.append(_SEP.join((hit.name, hit.category, hit.note)).encode("utf-8"))
+
+    def key_table(mapping: dict[str, list[ItemHit]]) -> tuple[list[bytes], list[int]]:
+        pairs = sorted((k.encode("utf-8"), record_no[id(hit)]) for k, hits in mapping.items() for hit in hits)
+        return [k for k, _ in pairs], [n for _, n in pairs]
+
+    tables = [(records, None)] + [
+        key_table(m)
+        for m in (
+            {k: [hit] for k, hit in index.by_name.items()},
+            {k: [hit] for k, hit in index.by_alias.items()},
+            index.by_key,
+        )
+    ]
+
+    body = bytearray()
+    headers = []
+    for blobs, targets in tables:
+        offsets_pos = HEADER_SIZE + len(body)
+        pos = 0
+        for b in [b"", *blobs]:
+            pos += len(b)
+            body += _U32.pack(pos)
+        targets_pos = 0
+        if targets is not None:
+            targets_pos = HEADER_SIZE + len(body)
+            for n in targets:
+                body += _U32.pack(n)
+        blob_pos = HEADER_SIZE + len(body)
+        for b in blobs:
+            body += b
+        headers.append(_TABLE.pack(len(blobs), offsets_pos, targets_pos, blob_pos))
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + fp + b"".join(headers) + body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+class _KeyTable:
+    def __init__(self, buf: mmap.mmap, count: int, offsets_pos: int, targets_pos: int, blob_pos: int):
+        self.buf = buf
+        self.count = count
+        self.offsets_pos = offsets_pos
+        self.targets_pos = targets_pos
+        self.blob_pos = blob_pos
+
+    def item(self, i: int) -> bytes:
+        start = _U32.unpack_from(self.buf, self.offsets_pos + 4 * i)[0]
+        end = _U32.unpack_from(self.buf, self.offsets_pos + 4 * (i + 1))[0]
+        return self.buf[self.blob_pos + start:self.blob_pos + end]
+
+    def target(self, i: int) -> int:
+        return _U32.unpack_from(self.buf, self.targets_pos + 4 * i)[0]
+
+    def lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.item(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key: bytes) -> int | None:
+        i = self.lower_bound(key)
+        return self.target(i) if i < self.count and self.item(i) == key else None
+
+    def find_all(self, key: bytes) -> list[int]:
+        out = []
+        for i in range(self.lower_bound(key), self.count):
+            if self.item(i) != key:
+                break
+            out.append(self.target(i))
+        return out
+
+
+class MappedItemIndex:
+    """
+    キーファイルを mmap した品目索引。ItemIndex と同じメソッドで引ける。
+    同じ品目には同じ ItemHit を返す（呼び出し側が id() で重複を除くため）。
+    """
+
+    def __init__(self, path: str | Path, token: tuple = ()):
+        self.path = Path(path)
+        self.token = token
+        with open(self.path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buf) < HEADER_SIZE or self._buf[:len(MAGIC)] != MAGIC:
+            self._buf.close()
+            raise ValueError(f"not a key file: {self.path}")
+        self.fingerprint = self._buf[len(MAGIC):TABLES_POS].decode("ascii", "replace")
+        self._records, self._names, self._aliases, self._readings = (
+            _KeyTable(self._buf, *_TABLE.unpack_from(self._buf, TABLES_POS + _TABLE.size * i))
+            for i in range(4)
+        )
+        self._hits: dict[int, ItemHit] = {}
+        self.fuzzy: NgramIndex | None = None
+        self.fuzzy_reading: NgramIndex | None = None
+
+    def _hit(self, record: int | None) -> ItemHit | None:
+        if record is None:
+            return None
+        hit = self._hits.get(record)
+        if hit is None:
+            name, category, note = self._records.item(record).decode("utf-8").split(_SEP)
+            hit = self._hits[record] = ItemHit(name, category, note)
+        return hit
+
+    def exact(self, query: str) -> ItemHit | None:
+        return self._hit(self._names.find(normalize_text(query).encode("utf-8")))
+
+    def alias(self, query: str) -> ItemHit | None:
+        return self._hit(self._aliases.find(normalize_text(query).encode("utf-8")))
+
+    def reading(self, query: str) -> ItemHit | None:
+        # ItemIndex.reading と同じく、読みキーが1品目だけを指すときに限る
+        records = self._readings.find_all(reading_key(query).encode("utf-8"))
+        return self._hit(records[0]) if len(records) == 1 else None
+
+    def lookup(self, query: str) -> ItemHit | None:
+        # 完全一致 -> 別名 -> 読みキー の順
+        return self.exact(query) or self.alias(query) or self.reading(query)
+
+    def prefix(self, query: str, k: int = 10) -> list[ItemHit]:
+        # 短い名前を優先（同じ長さならキー順）。上位 k 件だけ持ちながら前方一致の範囲をなめる
+        qb = normalize_text(query).encode("utf-8")
+        best: list[tuple[int, str, int]] = []
+        t = self._names
+        for i in range(t.lower_bound(qb), t.count):
+            key = t.item(i)
+            if not key.startswith(qb):
+                break
+            s = key.decode("utf-8")
+            entry = (len(s), s, t.target(i))
+            if len(best) < k:
+                insort(best, entry)
+            elif entry < best[-1]:
+                insort(best, entry)
+                best.pop()
+        return [self._hit(n) for _, _, n in best]
+
+    def _keys(self, table: _KeyTable) -> list[str]:
+        return [table.item(i).decode("utf-8") for i in range(table.count)]
+
+    def warm(self) -> MappedItemIndex:
+        # あいまい検索用の索引を先に作っておく（サーバ起動時など）
+        if self.fuzzy is None:
+            self.fuzzy = NgramIndex.build([*self._keys(self._names), *self._keys(self._aliases)])
+            self.fuzzy_reading = NgramIndex.build(self._keys(self._readings))
+        return self
+
+    def suggest(self, query: str, k: int = 10) -> list[ItemHit]:
+        self.warm()
+        out: list[ItemHit] = []
+        seen: set[int] = set()
+        for key, reading in fuzzy_keys(self.fuzzy, self.fuzzy_reading, query, k * 2):
+            kb = key.encode("utf-8")
+            if reading:
+                records = self._readings.find_all(kb)
+            else:
+                record = self._names.find(kb)
+                if record is None:
+                    record = self._aliases.find(kb)
+                records = [] if record is None else [record]
+            for record in records:
+                if record in seen:
+                    continue
+                seen.add(record)
+                out.append(self._hit(record))
+                if len(out) == k:
+                    return out
+        return out
+
+    def close(self) -> None:
+        self._buf.close()
+
+
+def main():
+    import argparse
+
+    from backend.app.db.snapshot import snapshot_fingerprint
+    from backend.app.pool import connect_readonly
+
+    p = argparse.ArgumentParser()
+    p.add_argument("db", help="元のDB（スナップショット）")
+    p.add_argument("--out", help="出力先（既定: DBと同じ名前の .keys）")
+    args = p.parse_args()
+
+    conn = connect_readonly(args.db)
+    try:
+        index = ItemIndex.load(conn)
+        fingerprint = snapshot_fingerprint(conn)
+    finally:
+        conn.close()
+    out = write_keyfile(index, args.out or keyfile_for(args.db), fingerprint)
+
+    # 書いたファイルで全キーが同じ結果になるか確認する
+    mapped = MappedItemIndex(out)
+    bad = [
+        q for q in [*index.by_name, *index.by_alias, *index.by_key]
+        if mapped.lookup(q) != index.lookup(q)
+    ]
+    mapped.close()
+    if bad:
+        print(f"⚠️ key file mismatch: {len(bad)} keys (e.g. {bad[:3]})")
+        raise SystemExit(1)
+    print(f"✅ wrote {out} ({out.stat().st_size} bytes, {len(index.by_name)} items)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import os
 import sqlite3
 from dataclasses import dataclass
 from datetime import date, datetime, time
 from pathlib import Path
 
-from backend.app.query import normalize_text  # 既存の正規化を流用
+from backend.app.db.compact import day_no, day_text, minutes_text
+from backend.app.query import get_item_index, normalize_text  # 既存の正規化を流用
+from backend.app.virtual_events import ENV_OPEN_ENDED, get_virtual_schedule
 
 DB_PATH = Path(__file__).resolve().parents[1] / "data" / "db" / "nonoichi_waste.db"
 
@@ -20,7 +23,6 @@ class NextPickup:
     can_put_out: bool
 
 
-
 def connect() -> sqlite3.Connection:
     conn = sqlite3.connect(str(DB_PATH))
     conn.execute("PRAGMA foreign_keys = ON;")
@@ -28,18 +30,60 @@ def connect() -> sqlite3.Connection:
 
 
 def category_from_item(conn: sqlite3.Connection, item_name: str) -> str | None:
-    qn = normalize_text(item_name)
-    row = conn.execute(
-        """
-        SELECT c.name
-        FROM items i
-        JOIN categories c ON c.category_id = i.category_id
-        WHERE i.name_norm = ?
-        LIMIT 1
-        """,
-        (qn,),
-    ).fetchone()
-    return row[0] if row else None
+    # 品目はメモリ上の索引（query.ItemIndex）から引く
+    hit = get_item_index(conn).lookup(item_name)
+    return hit.category if hit else None
+
+
+def _parse_now(now: str | None) -> datetime:
+    # now: "YYYY-MM-DDTHH:MM" 例: 2025-04-03T06:50
+    if now is None:
+        return datetime.now()
+    return datetime.fromisoformat(now)
+
+
+def _make_pickup(
+    now_dt: datetime,
+    area: str,
+    category: str,
+    collection_date: str,
+    deadline_time: str,
+) -> NextPickup:
+    is_today = (collection_date == now_dt.date().isoformat())
+
+    # 07:00 / 07:30 を time に変換
+    hh, mm = map(int, deadline_time.split(":"))
+    deadline_t = time(hh, mm)
+
+    can_put_out = True
+    if is_today:
+        can_put_out = (now_dt.time() <= deadline_t)
+
+    return NextPickup(area, category, collection_date, deadline_time, is_today, can_put_out)
+
+
+def _use_virtual(conn: sqlite3.Connection, virtual: bool | None) -> bool:
+    # virtual=None は自動: 収集日を展開していないDB（seed_schedule --no-events）ならルールから計算する
+    # open_ended（NONOICHI_OPEN_ENDED=1）なら、展開済みの範囲を過ぎた日もルールから計算する
+    if virtual is None:
+        vs = get_virtual_schedule(conn)
+        return not vs.materialized or vs.open_ended
+    return virtual
+
+
+def _virtual_pickup(
+    conn: sqlite3.Connection,
+    now_dt: datetime,
+    area_name: str,
+    category_name: str,
+) -> NextPickup | None:
+    # collection_events を使わず、ルールから次の収集日を計算する
+    vs = get_virtual_schedule(conn)
+    found = vs.next_event(area_name, category_name, now_dt.date())
+    if found is None:
+        return None
+    d, deadline = found
+    return _make_pickup(now_dt, area_name, category_name, d.isoformat(), deadline)
 
 
 def next_pickup(
@@ -47,46 +91,161 @@ def next_pickup(
     area_name: str,
     category_name: str,
     now: str | None = None,
+    virtual: bool | None = None,
 ) -> NextPickup | None:
-    # now: "YYYY-MM-DDTHH:MM" 例: 2025-04-03T06:50
-    if now is None:
-        now_dt = datetime.now()
-    else:
-        now_dt = datetime.fromisoformat(now)
+    """
+    virtual=True ならルールから計算、False なら展開済みの表だけを見る。None（既定）は展開済みの表があればそれを使う。
+    """
+    now_dt = _parse_now(now)
 
-    today = now_dt.date().isoformat()
+    if virtual:
+        return _virtual_pickup(conn, now_dt, area_name, category_name)
 
+    # 事前計算表（next_pickup_days）を主キーで1回引く
     row = conn.execute(
         """
-        SELECT a.name, c.name, e.collection_date, e.deadline_time
-        FROM collection_events e
-        JOIN areas a ON a.area_id = e.area_id
-        JOIN categories c ON c.category_id = e.category_id
+        SELECT a.name, c.name, p.collection_day, p.deadline
+        FROM areas a
+        JOIN categories c ON c.name = ?
+        JOIN next_pickup_days p
+          ON p.area_no = a.area_no AND p.category_no = c.category_no AND p.day = ?
         WHERE a.name = ?
-          AND c.name = ?
-          AND e.collection_date >= ?
-        ORDER BY e.collection_date ASC
-        LIMIT 1
         """,
-        (area_name, category_name, today),
+        (category_name, day_no(now_dt.date()), area_name),
     ).fetchone()
 
+    # 表の範囲外の日付は collection_days から探す
+    if row is None:
+        row = conn.execute(
+            """
+            SELECT a.name, c.name, e.day, e.deadline
+            FROM areas a
+            JOIN categories c ON c.name = ?
+            JOIN collection_days e ON e.area_no = a.area_no AND e.category_no = c.category_no
+            WHERE a.name = ?
+              AND e.day >= ?
+            ORDER BY e.day ASC
+            LIMIT 1
+            """,
+            (category_name, area_name, day_no(now_dt.date())),
+        ).fetchone()
+
     if not row:
+        if _use_virtual(conn, virtual):
+            return _virtual_pickup(conn, now_dt, area_name, category_name)
         return None
 
-    area, category, collection_date, deadline_time = row
+    return _make_pickup(now_dt, *_decode(row))
 
-    is_today = (collection_date == today)
 
-    # 07:00 / 07:30 を time に変換
-    hh, mm = map(int, deadline_time.split(":"))
-    deadline_t = time(hh, mm)
+def _decode(row: tuple) -> tuple:
+    # (地区名, 区分名, 収集日, 締切) の収集日・締切は整数（collection_days など）なので文字に戻す
+    area, category, d, deadline = row
+    return area, category, day_text(d), minutes_text(deadline)
 
-    can_put_out = True
-    if is_today:
-        can_put_out = (now_dt.time() <= deadline_t)
 
-    return NextPickup(area, category, collection_date, deadline_time, is_today, can_put_out)
+def next_pickups_bulk(
+    conn: sqlite3.Connection,
+    area_name: str,
+    category_names: list[str],
+    now: str | None = None,
+    virtual: bool | None = None,
+) -> list[NextPickup | None]:
+    """
+    1つの地区について、複数の区分の次の収集日をまとめて引く。結果は category_names と同じ順。
+    区分の数によらず、next_pickup_days を1回（範囲外の区分があれば collection_days をもう1回）引くだけ。
+    """
+    now_dt = _parse_now(now)
+    today_no = day_no(now_dt.date())
+
+    if virtual:
+        # ルールから計算（メモリ上のパターンを引くだけ）
+        return [_virtual_pickup(conn, now_dt, area_name, c) if c else None for c in category_names]
+
+    wanted = list(dict.fromkeys(c for c in category_names if c))
+    found: dict[str, tuple] = {}
+    if not wanted:
+        return [None] * len(category_names)
+    marks = ",".join("?" * len(wanted))
+
+    for row in conn.execute(
+        f"""
+        SELECT a.name, c.name, p.collection_day, p.deadline
+        FROM areas a
+        JOIN categories c ON c.name IN ({marks})
+        JOIN next_pickup_days p
+          ON p.area_no = a.area_no AND p.category_no = c.category_no AND p.day = ?
+        WHERE a.name = ?
+        """,
+        (*wanted, today_no, area_name),
+    ):
+        found[row[1]] = row
+
+    # 表に無かった区分だけ、区分ごとの最初の収集日を collection_days から1回で探す
+    # 区分ごとの最初の収集日は (地区, 区分, 日付) の主キーを1回たどるだけで出る（GROUP BY の並べ替えをしない）
+    missing = [c for c in wanted if c not in found]
+    if missing:
+        marks = ",".join("?" * len(missing))
+        rows = conn.execute(
+            f"""
+            SELECT a.name, c.name, e.day, e.deadline
+            FROM areas a
+            JOIN categories c ON c.name IN ({marks})
+            JOIN collection_days e
+              ON e.area_no = a.area_no
+             AND e.category_no = c.category_no
+             AND e.day = (
+               SELECT MIN(x.day)
+               FROM collection_days x
+               WHERE x.area_no = a.area_no
+                 AND x.category_no = c.category_no
+                 AND x.day >= ?
+             )
+            WHERE a.name = ?
+            """,
+            (*missing, today_no, area_name),
+        ).fetchall()
+        for row in rows:
+            found[row[1]] = row
+
+    pickups = {name: _make_pickup(now_dt, *_decode(row)) for name, row in found.items()}
+    # 表で見つからなかった区分はルールから計算する（展開していないDB・open_ended で範囲を過ぎた日）
+    missing = [c for c in wanted if c not in found]
+    if missing and _use_virtual(conn, virtual):
+        for c in missing:
+            pickups[c] = _virtual_pickup(conn, now_dt, area_name, c)
+    return [pickups.get(c) if c else None for c in category_names]
+
+
+def collection_events_between(
+    conn: sqlite3.Connection,
+    area_name: str,
+    start: str,
+    end: str,
+    category_name: str | None = None,
+    virtual: bool | None = None,
+) -> list[tuple[str, str, str]]:
+    """
+    start〜end（YYYY-MM-DD）の (区分名, 収集日, 締切) を日付順に返す（カレンダー表示用）。
+    """
+    if _use_virtual(conn, virtual):
+        vs = get_virtual_schedule(conn)
+        return list(vs.iter_events(area_name, date.fromisoformat(start), date.fromisoformat(end), category_name))
+
+    rows = conn.execute(
+        """
+        SELECT c.name, e.day, e.deadline
+        FROM areas a
+        JOIN collection_days e ON e.area_no = a.area_no
+        JOIN categories c ON c.category_no = e.category_no
+        WHERE a.name = ?
+          AND e.day BETWEEN ? AND ?
+          AND (? IS NULL OR c.name = ?)
+        ORDER BY e.day, c.name
+        """,
+        (area_name, day_no(start), day_no(end), category_name, category_name),
+    ).fetchall()
+    return [(category, day_text(d), minutes_text(deadline)) for category, d, deadline in rows]
 
 
 def main():
@@ -97,11 +256,15 @@ def main():
     p.add_argument("--item", help="品目名（例: アイロン）")
     p.add_argument("--category", help="区分名（例: 一般ごみ）")
     p.add_argument("--now", help="YYYY-MM-DDTHH:MM（テスト用。例: 2025-04-03T06:50）")
+    p.add_argument("--virtual", action="store_true", help="collection_events を使わずルールから計算する")
+    p.add_argument("--open-ended", action="store_true", help="最後の版の期間を過ぎてもルールで先まで計算する")
 
     args = p.parse_args()
 
     if not args.item and not args.category:
         raise SystemExit("Either --item or --category is required")
+    if args.open_ended:
+        os.environ[ENV_OPEN_ENDED] = "1"
 
     conn = connect()
     try:
@@ -111,7 +274,7 @@ def main():
             if not category:
                 raise SystemExit(f"Item not found: {args.item}")
 
-        result = next_pickup(conn, args.area, category, now=args.now)
+        result = next_pickup(conn, args.area, category, now=args.now, virtual=args.virtual or None)
         if not result:
             print("No upcoming pickup found.")
             return
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import io
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from PIL import Image
+
+# 64bit の dHash を 5 分割する。距離 4 以内なら、鳩の巣原理でどれか1つの断片は完全に一致する
+HASH_BITS = 64
+DEFAULT_MAX_DISTANCE = 4
+DEFAULT_CAPACITY = 4096
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def dhash(data: bytes, size: int = 8) -> int:
+    """
+    画像の差分ハッシュ（dHash, 64bit）。
+    グレースケールの 9x8 に縮小し、横に隣り合う画素の明暗を1bitずつ並べる。
+    撮り直し・再圧縮・多少の明るさの違いでは数bitしか変わらない。
+    """
+    with Image.open(io.BytesIO(data)) as im:
+        im.draft("L", (size * 4, size * 4))
+        px = im.convert("L").resize((size + 1, size), Image.BILINEAR).tobytes()
+    h = 0
+    for y in range(size):
+        row = px[y * (size + 1):(y + 1) * (size + 1)]
+        for x in range(size):
+            h = (h << 1) | (row[x] < row[x + 1])
+    return h
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _chunks(h: int, parts: int) -> list[tuple[int, int]]:
+    # (断片番号, 断片の値) のリスト
+    width = -(-HASH_BITS // parts)
+    return [(i, (h >> (i * width)) & ((1 << width) - 1)) for i in range(parts)]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+
+
+@dataclass
+class _Namespace:
+    # 1つの model_version 分のキャッシュ（LRU順の本体と、断片ごとの索引）
+    entries: OrderedDict[int, _Entry] = field(default_factory=OrderedDict)
+    buckets: list[dict[int, set[int]]] = field(default_factory=list)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0           # 完全一致
+    near_hits: int = 0      # ハミング距離が max_distance 以内
+    misses: int = 0
+    evictions: int = 0      # 容量超過で追い出した数
+    expired: int = 0        # TTL切れで捨てた数
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.near_hits + self.misses
+        return (self.hits + self.near_hits) / total if total else 0.0
+
+
+class PHashCache:
+    """
+    知覚ハッシュ（dHash）をキーにした推論結果のキャッシュ。
+    - model_version ごとに別の名前空間（モデルを入れ替えたら古い結果は使わない）
+    - ハミング距離 max_distance 以内の近い画像も当たりにする（断片ごとの索引で候補を絞る）
+    - 容量を超えたら最も使われていないものから消す（LRU）、ttl 秒を過ぎたものは使わない
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+    ):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.parts = max_distance + 1
+        self.stats = CacheStats()
+        self._spaces: dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def _space(self, model_version: str) -> _Namespace:
+        space = self._spaces.get(model_version)
+        if space is None:
+            space = _Namespace(buckets=[{} for _ in range(self.parts)])
+            self._spaces[model_version] = space
+        return space
+
+    def _remove(self, space: _Namespace, h: int) -> None:
+        del space.entries[h]
+        for i, c in _chunks(h, self.parts):
+            bucket = space.buckets[i].get(c)
+            if bucket is not None:
+                bucket.discard(h)
+                if not bucket:
+                    del space.buckets[i][c]
+
+    def get(self, model_version: str, h: int) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            space = self._space(model_version)
+
+            best, best_d = None, self.max_distance + 1
+            if h in space.entries:
+                best, best_d = h, 0
+            else:
+                for i, c in _chunks(h, self.parts):
+                    for cand in space.buckets[i].get(c, ()):
+                        d = hamming(h, cand)
+                        if d < best_d:
+                            best, best_d = cand, d
+
+            if best is None:
+                self.stats.misses += 1
+                return None
+            entry = space.entries[best]
+            if entry.expires_at <= now:
+                self._remove(space, best)
+                self.stats.expired += 1
+                self.stats.misses += 1
+                return None
+
+            space.entries.move_to_end(best)
+            if best_d == 0:
+                self.stats.hits += 1
+            else:
+                self.stats.near_hits += 1
+            return entry.value
+
+    def put(self, model_version: str, h: int, value: Any) -> None:
+        with self._lock:
+            space = self._space(model_version)
+            if h in space.entries:
+                self._remove(space, h)
+            space.entries[h] = _Entry(value, time.monotonic() + self.ttl)
+            for i, c in _chunks(h, self.parts):
+                space.buckets[i].setdefault(c, set()).add(h)
+            while len(space.entries) > self.capacity:
+                self._remove(space, next(iter(space.entries)))
+                self.stats.evictions += 1
+
+    def clear(self, model_version: str | None = None) -> None:
+        with self._lock:
+            if model_version is None:
+                self._spaces.clear()
+            else:
+                self._spaces.pop(model_version, None)
+
+    def summary(self) -> dict:
+        with self._lock:
+            sizes = {v: len(s.entries) for v, s in self._spaces.items()}
+        s = self.stats
+        return {
+            "hits": s.hits,
+            "near_hits": s.near_hits,
+            "misses": s.misses,
+            "hit_rate": round(s.hit_rate, 4),
+            "evictions": s.evictions,
+            "expired": s.expired,
+            "entries": sizes,
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl,
+            "max_distance": self.max_distance,
+        }
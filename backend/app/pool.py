@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import quote
+
+
+def connect_readonly(
+    path: str | Path,
+    immutable: bool = False,
+    cached_statements: int = 256,
+) -> sqlite3.Connection:
+    """
+    読み取り専用でDBを開く（mode=ro）。
+    immutable=True はファイルが実行中に書き換わらない前提で、ロックと変更確認を省く（スナップショット向け）。
+    """
+    uri = f"file:{quote(str(Path(path).resolve()))}?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    conn = sqlite3.connect(
+        uri,
+        uri=True,
+        check_same_thread=False,  # プールから別スレッドに貸し出す
+        cached_statements=cached_statements,  # 同じSQLの準備済み文を使い回す
+    )
+    conn.execute("PRAGMA query_only = ON;")
+    return conn
+
+
+class ReadOnlyPool:
+    """
+    読み取り専用の sqlite3.Connection を size 本だけ開いて使い回すプール。
+    1本の接続を同時に使うのは1スレッドだけ（acquire/release で貸し借りする）。
+    close() 後に返ってきた接続はその場で閉じる（スナップショットを差し替えるとき、処理中のリクエストを待たずに済む）。
+    """
+
+    def __init__(self, path: str | Path, size: int | None = None, immutable: bool = False):
+        self.path = Path(path)
+        self.size = size or min(32, (os.cpu_count() or 1) * 2)
+        self.immutable = immutable
+        self._idle: queue.LifoQueue[sqlite3.Connection | None] = queue.LifoQueue()
+        self._all: list[sqlite3.Connection] = []
+        self.closed = False
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            conn = connect_readonly(self.path, immutable=immutable)
+            self._all.append(conn)
+            self._idle.put(conn)
+
+    def acquire(self, timeout: float | None = None) -> sqlite3.Connection:
+        conn = self._idle.get(timeout=timeout)
+        if conn is None:
+            # close() 済み（差し替え直前にこのプールを取ったリクエスト）: 使い捨ての接続を開く。release で閉じる
+            self._idle.put(None)
+            return connect_readonly(self.path, immutable=self.immutable)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if not self.closed:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        # 空いている接続だけ今閉じる。貸し出し中のものは release() で閉じる
+        with self._lock:
+            self.closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                conn.close()
+        self._all.clear()
+        # 待っている・これから来る acquire() を起こす目印
+        self._idle.put(None)
@@ -1,17 +1,19 @@
 from __future__ import annotations
 
+import os
 import sqlite3
-from dataclasses import dataclass
+from bisect import bisect_left
+from dataclasses import dataclass, field
 from pathlib import Path
 
-from backend.app.db.seed_schedule import normalize_text  # 既存の正規化を流用
+from backend.app.textnorm import normalize_text
+from backend.app.fuzzy import NgramIndex
+from backend.app.kana import reading_key, to_katakana
 
 BACKEND_DIR = Path(__file__).resolve().parents[1]  # backend/app
 DB_PATH = BACKEND_DIR / "data" / "db" / "nonoichi_waste.db"
 
 
-
-
 @dataclass
 class ItemHit:
     name: str
@@ -19,6 +21,187 @@ class ItemHit:
     note: str
 
 
+@dataclass
+class ItemIndex:
+    """
+    items / item_aliases / categories を一度だけ読み込んだメモリ上の索引。
+    完全一致・別名は dict で O(1)、前方一致はソート済みキー配列の二分探索で O(log n)。
+    """
+    by_name: dict[str, ItemHit] = field(default_factory=dict)   # name_norm -> hit
+    by_alias: dict[str, ItemHit] = field(default_factory=dict)  # alias_norm -> hit
+    by_key: dict[str, list[ItemHit]] = field(default_factory=dict)  # 読みキー(name_key/alias_key) -> そのキーの品目（1件以上）
+    keys: list[str] = field(default_factory=list)               # name_norm の昇順
+    token: tuple = ()                                           # 作成時のDBの状態（再構築判定用）
+    fuzzy: NgramIndex | None = None                             # あいまい検索用（初回のsuggestで作る）
+    fuzzy_reading: NgramIndex | None = None                     # 読みキーのあいまい検索用
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, token: tuple = ()) -> ItemIndex:
+        by_name: dict[str, ItemHit] = {}
+        for name_norm, name, category, note in conn.execute(
+            """
+            SELECT i.name_norm, i.name, c.name, COALESCE(i.note,'')
+            FROM items i
+            JOIN categories c ON c.category_id = i.category_id
+            """
+        ):
+            by_name[name_norm] = ItemHit(name, category, note)
+
+        # 別名は items と同じ ItemHit を共有する
+        hit_by_item_id = {}
+        for item_id, name_norm in conn.execute("SELECT item_id, name_norm FROM items"):
+            hit_by_item_id[item_id] = by_name[name_norm]
+        by_alias = {
+            alias_norm: hit_by_item_id[item_id]
+            for item_id, alias_norm in conn.execute("SELECT item_id, alias_norm FROM item_aliases")
+            if item_id in hit_by_item_id
+        }
+
+        # 読みキー: シード時に計算済みの列を使う（手で足した行など、空ならここで計算）
+        # 長音を畳むので別の品目が同じキーになることがある（ビール / ビル）。キーごとに全部持っておく
+        by_key: dict[str, list[ItemHit]] = {}
+
+        def add_key(key: str, hit: ItemHit) -> None:
+            hits = by_key.setdefault(key, [])
+            if all(h is not hit for h in hits):
+                hits.append(hit)
+
+        for name_norm, key in conn.execute("SELECT name_norm, name_key FROM items ORDER BY name_norm"):
+            add_key(key or reading_key(name_norm), by_name[name_norm])
+        for alias_norm, key in conn.execute("SELECT alias_norm, alias_key FROM item_aliases ORDER BY alias_norm"):
+            if alias_norm in by_alias:
+                add_key(key or reading_key(alias_norm), by_alias[alias_norm])
+
+        return cls(by_name=by_name, by_alias=by_alias, by_key=by_key, keys=sorted(by_name), token=token)
+
+    def exact(self, query: str) -> ItemHit | None:
+        return self.by_name.get(normalize_text(query))
+
+    def alias(self, query: str) -> ItemHit | None:
+        return self.by_alias.get(normalize_text(query))
+
+    def reading(self, query: str) -> ItemHit | None:
+        # 読みキーが1品目だけを指すときに限る（複数あれば決めずに None。候補は suggest で出す）
+        hits = self.by_key.get(reading_key(query), [])
+        return hits[0] if len(hits) == 1 else None
+
+    def lookup(self, query: str) -> ItemHit | None:
+        # 完全一致 -> 別名 -> 読みキー の順
+        return self.exact(query) or self.alias(query) or self.reading(query)
+
+    def prefix(self, query: str, k: int = 10) -> list[ItemHit]:
+        qn = normalize_text(query)
+        matched = []
+        for i in range(bisect_left(self.keys, qn), len(self.keys)):
+            key = self.keys[i]
+            if not key.startswith(qn):
+                break
+            matched.append(key)
+        # SQL版と同じく短い名前を優先（同じ長さならキー順）
+        matched.sort(key=lambda s: (len(s), s))
+        return [self.by_name[key] for key in matched[:k]]
+
+    def warm(self) -> ItemIndex:
+        # あいまい検索用の索引を先に作っておく（サーバ起動時など）
+        if self.fuzzy is None:
+            self.fuzzy = NgramIndex.build([*self.by_name, *self.by_alias])
+            self.fuzzy_reading = NgramIndex.build(self.by_key)
+        return self
+
+    def suggest(self, query: str, k: int = 10) -> list[ItemHit]:
+        # 品目名・別名・読みキーをn-gram索引で引き、同じ品目は1件にまとめる
+        self.warm()
+        out: list[ItemHit] = []
+        seen: set[int] = set()
+        for key, reading in fuzzy_keys(self.fuzzy, self.fuzzy_reading, query, k * 2):
+            hits = self.by_key[key] if reading else [self.by_name.get(key) or self.by_alias[key]]
+            for hit in hits:
+                if id(hit) in seen:
+                    continue
+                seen.add(id(hit))
+                out.append(hit)
+                if len(out) == k:
+                    return out
+        return out
+
+
+def fuzzy_keys(fuzzy: NgramIndex, fuzzy_reading: NgramIndex, query: str, k: int) -> list[tuple[str, bool]]:
+    """
+    あいまい検索で当たったキーを (キー, 読みキーか) のスコア順で返す。
+    品目名・別名を正規化した文字列で引き、ひらがな・ローマ字を含むときは読みキーでも引いて混ぜる（てれび -> テレビ）。
+    """
+    qn = normalize_text(query)
+    found = [(score, key, False) for key, score in fuzzy.search(qn, k=k, shortlist=k)]
+    if to_katakana(qn) != qn or any("a" <= c <= "z" for c in qn.lower()):
+        found += [(score, key, True) for key, score in fuzzy_reading.search(reading_key(query), k=k, shortlist=k)]
+        found.sort(key=lambda t: -t[0])
+    return [(key, reading) for _score, key, reading in found]
+
+
+# DBファイルパス -> ItemIndex（キーファイルがあれば MappedItemIndex）（プロセス内で使い回す）
+_INDEX_CACHE: dict[str, ItemIndex] = {}
+
+
+def db_file(conn: sqlite3.Connection) -> str:
+    for _, name, file in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return file or ""
+    return ""
+
+
+def sources_signature(conn: sqlite3.Connection) -> str:
+    row = conn.execute(
+        "SELECT group_concat(source_id || '=' || COALESCE(fetched_at,''), ',') FROM sources"
+    ).fetchone()
+    return row[0] or ""
+
+
+def get_item_index(conn: sqlite3.Connection) -> ItemIndex:
+    """
+    conn のDBに対応する ItemIndex を返す。
+    DBファイルが更新された（mtime/サイズが変わった）ときは sources.fetched_at と合わせて確認し、作り直す。
+    ファイルを持たないDB（:memory:）は毎回 sources.fetched_at だけで判定する。
+    """
+    path = db_file(conn)
+    cached = _INDEX_CACHE.get(path)
+
+    if path:
+        st = os.stat(path)
+        stat_token = (st.st_mtime_ns, st.st_size)
+        if cached is not None and cached.token[:2] == stat_token:
+            return cached
+    else:
+        stat_token = (None, None)
+
+    token = stat_token + (sources_signature(conn),)
+    if cached is not None and cached.token == token:
+        return cached
+
+    index = _load_index(conn, path, token)
+    _INDEX_CACHE[path] = index
+    return index
+
+
+def _load_index(conn: sqlite3.Connection, path: str, token: tuple) -> ItemIndex:
+    # スナップショットの横にキーファイル（snapshot --keys）があれば、それを mmap して使う
+    # DBを作り直した後に残った古い .keys を使わないよう、ヘッダの fingerprint がDBと一致するときだけ
+    if path:
+        from backend.app.db.snapshot import snapshot_fingerprint
+        from backend.app.keyfile import MappedItemIndex, keyfile_fingerprint, keyfile_for
+
+        keys = keyfile_for(path)
+        fingerprint = keyfile_fingerprint(keys)
+        if fingerprint is not None and fingerprint == snapshot_fingerprint(conn):
+            return MappedItemIndex(keys, token=token)
+    return ItemIndex.load(conn, token=token)
+
+
+def forget_item_index(path: str) -> None:
+    # 使わなくなったDB（差し替え前のスナップショット）の索引を捨てる
+    # mmap は処理中のリクエストが使い終わってから（参照が無くなったときに）閉じられる
+    _INDEX_CACHE.pop(path, None)
+
+
 def connect() -> sqlite3.Connection:
     conn = sqlite3.connect(str(DB_PATH))
     conn.execute("PRAGMA foreign_keys = ON;")
@@ -26,56 +209,35 @@ def connect() -> sqlite3.Connection:
 
 
 def find_item_exact(conn: sqlite3.Connection, query: str) -> ItemHit | None:
-    qn = normalize_text(query)
-    row = conn.execute(
-        """
-        SELECT i.name, c.name, COALESCE(i.note,'')
-        FROM items i
-        JOIN categories c ON c.category_id = i.category_id
-        WHERE i.name_norm = ?
-        LIMIT 1
-        """,
-        (qn,),
-    ).fetchone()
-    if not row:
-        return None
-    return ItemHit(*row)
+    return get_item_index(conn).exact(query)
 
 
 def find_item_alias(conn: sqlite3.Connection, query: str) -> ItemHit | None:
-    qn = normalize_text(query)
-    row = conn.execute(
-        """
-        SELECT i.name, c.name, COALESCE(i.note,'')
-        FROM item_aliases a
-        JOIN items i ON i.item_id = a.item_id
-        JOIN categories c ON c.category_id = i.category_id
-        WHERE a.alias_norm = ?
-        LIMIT 1
-        """,
-        (qn,),
-    ).fetchone()
-    if not row:
-        return None
-    return ItemHit(*row)
+    return get_item_index(conn).alias(query)
+
+
+def find_item_reading(conn: sqlite3.Connection, query: str) -> ItemHit | None:
+    # ひらがな/カタカナ/ローマ字の表記ゆれを吸収した一致
+    return get_item_index(conn).reading(query)
+
+
+def find_items_bulk(conn: sqlite3.Connection, names: list[str]) -> list[ItemHit | None]:
+    """
+    複数の品目名をまとめて引く（完全一致 → 別名 → 読み）。結果は names と同じ順。
+    索引の確認は1回だけで、あとはメモリ上の dict を引くだけ。
+    """
+    index = get_item_index(conn)
+    return [index.lookup(name) for name in names]
 
 
 def suggest_items_prefix(conn: sqlite3.Connection, query: str, k: int = 10) -> list[ItemHit]:
-    # SQLiteだけで軽い候補提示（前方一致）
-    # 本格あいまい検索は後でRapidFuzz等でやる
-    qn = normalize_text(query)
-    rows = conn.execute(
-        """
-        SELECT i.name, c.name, COALESCE(i.note,'')
-        FROM items i
-        JOIN categories c ON c.category_id = i.category_id
-        WHERE i.name_norm LIKE ?
-        ORDER BY LENGTH(i.name_norm) ASC
-        LIMIT ?
-        """,
-        (qn + "%", k),
-    ).fetchall()
-    return [ItemHit(*r) for r in rows]
+    # メモリ上の索引で軽い候補提示（前方一致）
+    return get_item_index(conn).prefix(query, k=k)
+
+
+def suggest_items(conn: sqlite3.Connection, query: str, k: int = 10) -> list[ItemHit]:
+    # n-gram索引によるあいまい検索（部分一致・軽い誤字に対応）
+    return get_item_index(conn).suggest(query, k=k)
 
 
 def main():
@@ -88,13 +250,13 @@ def main():
 
     conn = connect()
     try:
-        hit = find_item_exact(conn, args.text) or find_item_alias(conn, args.text)
+        hit = get_item_index(conn).lookup(args.text)
         if hit:
             print("HIT:", hit)
             return
 
         print("NO HIT. Suggestions:")
-        for s in suggest_items_prefix(conn, args.text, k=args.k):
+        for s in suggest_items(conn, args.text, k=args.k):
             print(" -", s)
     finally:
         conn.close()
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import calendar
+import heapq
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Iterator
+
+# 収集ルール（schedule_groups.rule_json）から収集日を計算する
+# 日を1日ずつ走査せず、曜日・第n曜日を算術で求める
+#   weekly:                       {"type": "weekly", "weekdays": ["MON", "THU"]}
+#   monthly_nth_weekday:          {"type": "monthly_nth_weekday", "nth": 1, "weekday": "WED"}
+#   monthly_multiple_nth_weekday: {"type": "monthly_multiple_nth_weekday", "nth": [1, 3], "weekday": "WED"}
+# nth は 1..5（第n）または -1..-5（最終週から数える）
+# 年末年始などの例外（ScheduleException）はルールで出した日付に後から当てる
+
+WEEKDAY_MAP = {"MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4, "SAT": 5, "SUN": 6}
+
+
+def nth_weekday_of_month(year: int, month: int, weekday: int, nth: int) -> date | None:
+    # weekday: 0=Mon..6=Sun / 1日の曜日からのずれで求める
+    days_in_month = calendar.monthrange(year, month)[1]
+    if nth > 0:
+        first = (weekday - date(year, month, 1).weekday()) % 7 + 1
+        day = first + 7 * (nth - 1)
+    else:
+        last = days_in_month - (date(year, month, days_in_month).weekday() - weekday) % 7
+        day = last + 7 * (nth + 1)
+    if 1 <= day <= days_in_month:
+        return date(year, month, day)
+    return None
+
+
+@dataclass(frozen=True)
+class ScheduleException:
+    """
+    収集日の例外。
+      skip:       start〜end の収集を休む
+      substitute: start の収集を substitute_date に振り替える（start に収集の無いパターンには効かない）
+      add:        start に臨時の収集を足す
+    category_id / schedule_group_id を指定するとその区分・パターンだけに効く（省略時は全部）。
+    """
+    kind: str
+    start: date
+    end: date
+    substitute_date: date | None = None
+    category_id: str | None = None
+    schedule_group_id: str | None = None
+    note: str | None = None
+
+    def applies_to(self, schedule_group_id: str | None, category_id: str | None) -> bool:
+        if self.schedule_group_id is not None and self.schedule_group_id != schedule_group_id:
+            return False
+        if self.category_id is not None and self.category_id != category_id:
+            return False
+        return True
+
+
+def exception_from_dict(obj: dict, schedule_group_id: str | None = None) -> ScheduleException:
+    # YAMLの exceptions: の1件から作る
+    kind = obj["type"]
+    if kind == "skip":
+        start = date.fromisoformat(str(obj["start"]))
+        end = date.fromisoformat(str(obj.get("end", obj["start"])))
+        substitute = None
+    elif kind == "substitute":
+        start = end = date.fromisoformat(str(obj["date"]))
+        substitute = date.fromisoformat(str(obj["to"]))
+    elif kind == "add":
+        start = end = date.fromisoformat(str(obj["date"]))
+        substitute = None
+    else:
+        raise ValueError(f"unknown exception type: {kind}")
+    return ScheduleException(
+        kind=kind,
+        start=start,
+        end=end,
+        substitute_date=substitute,
+        category_id=obj.get("category_id"),
+        schedule_group_id=obj.get("schedule_id", schedule_group_id),
+        note=obj.get("note"),
+    )
+
+
+def exception_from_year_end(year_end: dict, schedule_group_id: str | None = None) -> ScheduleException:
+    # note.year_end（last_collection / restart）-> その間を休む skip
+    last = date.fromisoformat(str(year_end["last_collection"]))
+    restart = date.fromisoformat(str(year_end["restart"]))
+    return ScheduleException(
+        kind="skip",
+        start=last + timedelta(days=1),
+        end=restart - timedelta(days=1),
+        schedule_group_id=schedule_group_id,
+        note="year_end",
+    )
+
+
+def _nth_list(rule: dict) -> list[int]:
+    raw = rule["nth"]
+    nth_list = [int(x) for x in (raw if isinstance(raw, list) else [raw])]
+    for nth in nth_list:
+        if nth == 0 or not -5 <= nth <= 5:
+            raise ValueError(f"invalid nth: {nth}")
+    return nth_list
+
+
+def iter_dates(
+    rule: dict,
+    start: date,
+    end: date | None = None,
+    exceptions: Iterable[ScheduleException] = (),
+) -> Iterator[date]:
+    """
+    start 以降（end まで、end=None なら無限に）の収集日を昇順に1件ずつ返す。
+    exceptions は対象のパターンに当てはまるものだけを渡すこと。
+    """
+    exceptions = list(exceptions)
+    if not exceptions:
+        return _iter_rule_dates(rule, start, end)
+    return _apply_exceptions(rule, _iter_rule_dates(rule, start, end), exceptions, start, end)
+
+
+def _is_rule_date(rule: dict, d: date) -> bool:
+    return next(_iter_rule_dates(rule, d, d), None) == d
+
+
+def _apply_exceptions(
+    rule: dict,
+    dates: Iterator[date],
+    exceptions: list[ScheduleException],
+    start: date,
+    end: date | None,
+) -> Iterator[date]:
+    skips = [(e.start, e.end) for e in exceptions if e.kind == "skip"]
+    # 振替はルール上その日に収集があるパターンだけ（範囲の指定が無くても収集の無いパターンには足さない）
+    substitutes = [e for e in exceptions if e.kind == "substitute" and _is_rule_date(rule, e.start)]
+    moved = {e.start for e in substitutes}
+    extra = sorted(
+        {e.substitute_date for e in substitutes}
+        | {e.start for e in exceptions if e.kind == "add"}
+    )
+    extra = [d for d in extra if d >= start and (end is None or d <= end)]
+
+    kept = (
+        d for d in dates
+        if d not in moved and not any(s <= d <= e for s, e in skips)
+    )
+    last = None
+    for d in heapq.merge(kept, extra):
+        if d != last:
+            yield d
+        last = d
+
+
+def _iter_rule_dates(rule: dict, start: date, end: date | None) -> Iterator[date]:
+    rtype = rule["type"]
+
+    if rtype == "weekly":
+        weekdays = sorted({WEEKDAY_MAP[w] for w in rule["weekdays"]})
+        if not weekdays:
+            return
+        week = start - timedelta(days=start.weekday())  # その週の月曜
+        while True:
+            for wd in weekdays:
+                d = week + timedelta(days=wd)
+                if d < start:
+                    continue
+                if end is not None and d > end:
+                    return
+                yield d
+            week += timedelta(days=7)
+
+    elif rtype in ("monthly_nth_weekday", "monthly_multiple_nth_weekday"):
+        weekday = WEEKDAY_MAP[rule["weekday"]]
+        nth_list = _nth_list(rule)
+        y, m = start.year, start.month
+        while end is None or (y, m) <= (end.year, end.month):
+            found = [nth_weekday_of_month(y, m, weekday, nth) for nth in nth_list]
+            for d in sorted({d for d in found if d}):
+                if d < start:
+                    continue
+                if end is not None and d > end:
+                    return
+                yield d
+            m += 1
+            if m == 13:
+                y += 1
+                m = 1
+    else:
+        raise ValueError(f"unknown rule type: {rtype}")
+
+
+def generate_dates(
+    rule: dict,
+    start: date,
+    end: date,
+    exceptions: Iterable[ScheduleException] = (),
+) -> list[date]:
+    return list(iter_dates(rule, start, end, exceptions))
+
+
+def next_occurrence(
+    rule: dict,
+    after: date,
+    inclusive: bool = False,
+    exceptions: Iterable[ScheduleException] = (),
+) -> date | None:
+    """
+    after より後（inclusive=True なら after 当日を含む）で最初の収集日。
+    """
+    start = after if inclusive else after + timedelta(days=1)
+    return next(iter_dates(rule, start, exceptions=exceptions), None)
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import unicodedata
+
+# 品目名・地区名の正規化とIDの作り方（シードと検索の両方で使う）
+# 検索側（query / next_pickup / api）が seed_schedule を import しなくて済むように、標準ライブラリだけで書く
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(s: str) -> str:
+    s = unicodedata.normalize("NFKC", s or "").strip()
+    s = _SPACES.sub(" ", s)
+    return s
+
+
+def make_id(prefix: str, seed: str, n: int = 12) -> str:
+    h = hashlib.sha1(normalize_text(seed).encode("utf-8")).hexdigest()[:n]
+    return f"{prefix}_{h}"
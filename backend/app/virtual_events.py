@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterator
+
+from backend.app.editions import EditionIndex, load_editions
+from backend.app.query import db_file, sources_signature
+from backend.app.schedule_rules import ScheduleException, iter_dates, next_occurrence
+
+# collection_events を使わず、schedule_groups のルールから収集日をその場で計算する
+# 地区 → パターン（ルール・例外・有効期間）の対応は一度だけ読み込み、DBが変わるまで使い回す
+# 版（年度）が複数あるときは、日付から版を引いてその版のパターンだけで計算する
+
+# NONOICHI_OPEN_ENDED=1: 最後の版の終わりを過ぎてもルールで先まで計算する（年度替わりで新しい版を入れるまでのつなぎ）
+ENV_OPEN_ENDED = "NONOICHI_OPEN_ENDED"
+
+
+@dataclass(frozen=True)
+class Pattern:
+    schedule_group_id: str
+    category_id: str
+    source_id: str              # どの版のパターンか
+    deadline_time: str | None   # この版での締切（None → 区分の締切）
+    rule: dict = field(hash=False, compare=False)
+    exceptions: tuple[ScheduleException, ...]
+    start: date | None          # 有効期間（版の期間。None は制限なし）
+    end: date | None
+
+
+@dataclass
+class VirtualSchedule:
+    area_id_by_name: dict[str, str] = field(default_factory=dict)
+    category_id_by_name: dict[str, str] = field(default_factory=dict)
+    category_name_by_id: dict[str, str] = field(default_factory=dict)
+    deadline_by_category: dict[str, str] = field(default_factory=dict)
+    patterns_by_area: dict[str, list[Pattern]] = field(default_factory=dict)
+    editions: EditionIndex = field(default_factory=EditionIndex)
+    materialized: bool = False   # collection_events が作られているか
+    open_ended: bool = False     # 最後の版を期限なしで延ばしているか
+    token: tuple = ()
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, token: tuple = (), open_ended: bool = False) -> VirtualSchedule:
+        """
+        open_ended=True なら有効期間の終わりを無視してルールを先まで延ばす（年度替わりで再投入しない場合）。
+        """
+        vs = cls(open_ended=open_ended, token=token)
+        vs.area_id_by_name = dict(conn.execute("SELECT name, area_id FROM areas"))
+        for category_id, name, deadline in conn.execute("SELECT category_id, name, deadline_time FROM categories"):
+            vs.category_id_by_name[name] = category_id
+            vs.category_name_by_id[category_id] = name
+            vs.deadline_by_category[category_id] = deadline
+        vs.materialized = conn.execute("SELECT 1 FROM collection_events LIMIT 1").fetchone() is not None
+
+        vs.editions = load_editions(conn, open_ended=open_ended)
+        edition_by_source = {e.source_id: e for e in vs.editions.editions}
+        # 例外はその版のパターンにだけ効かせる（source_id が無い行は全版に）
+        exceptions_by_source: dict[str | None, list[ScheduleException]] = {}
+        for kind, start, end, sub, category_id, sg_id, note, source_id in conn.execute(
+            """
+            SELECT kind, start_date, end_date, substitute_date, category_id, schedule_group_id, note, source_id
+            FROM schedule_exceptions
+            """
+        ):
+            exceptions_by_source.setdefault(source_id, []).append(ScheduleException(
+                kind=kind,
+                start=date.fromisoformat(start),
+                end=date.fromisoformat(end),
+                substitute_date=date.fromisoformat(sub) if sub else None,
+                category_id=category_id,
+                schedule_group_id=sg_id,
+                note=note,
+            ))
+
+        patterns: dict[str, Pattern] = {}
+        rows = conn.execute(
+            "SELECT schedule_group_id, category_id, rule_json, source_id, deadline_time FROM schedule_groups"
+        ).fetchall()
+        for sg_id, category_id, rule_json, source_id, deadline in rows:
+            edition = edition_by_source.get(source_id)
+            if edition is None:
+                continue
+            exceptions = exceptions_by_source.get(source_id, []) + exceptions_by_source.get(None, [])
+            patterns[sg_id] = Pattern(
+                sg_id,
+                category_id,
+                source_id,
+                deadline,
+                json.loads(rule_json),
+                tuple(e for e in exceptions if e.applies_to(sg_id, category_id)),
+                edition.start,
+                edition.end,
+            )
+
+        for area_id, sg_id in conn.execute(
+            """
+            SELECT DISTINCT m.area_id, l.schedule_group_id
+            FROM area_group_members m
+            JOIN area_group_schedule_links l ON l.area_group_id = m.area_group_id
+            ORDER BY m.area_id, l.schedule_group_id
+            """
+        ):
+            if sg_id in patterns:
+                vs.patterns_by_area.setdefault(area_id, []).append(patterns[sg_id])
+        return vs
+
+    def _patterns(self, area_name: str, category_name: str | None = None) -> list[Pattern]:
+        area_id = self.area_id_by_name.get(area_name)
+        if area_id is None:
+            return []
+        patterns = self.patterns_by_area.get(area_id, [])
+        if category_name is None:
+            return patterns
+        category_id = self.category_id_by_name.get(category_name)
+        return [p for p in patterns if p.category_id == category_id]
+
+    def next_event(self, area_name: str, category_name: str, day: date) -> tuple[date, str | None] | None:
+        # day 当日を含め、次の (収集日, 締切)（パターンが複数あれば一番早いもの）
+        # day の版で見つからなければ次の版へ進む（3/31 → 4/1 の年度替わりもそのまま続く）
+        patterns = self._patterns(area_name, category_name)
+        for edition in self.editions.from_day(day):
+            best = None
+            after = max(day, edition.start)
+            for p in patterns:
+                if p.source_id != edition.source_id:
+                    continue
+                d = next_occurrence(p.rule, after, inclusive=True, exceptions=p.exceptions)
+                if d is None or (edition.end is not None and d > edition.end):
+                    continue
+                if best is None or d < best[0]:
+                    best = (d, p.deadline_time or self.deadline_by_category.get(p.category_id))
+            if best is not None:
+                return best
+        return None
+
+    def iter_events(
+        self,
+        area_name: str,
+        start: date,
+        end: date,
+        category_name: str | None = None,
+    ) -> Iterator[tuple[str, str, str]]:
+        """
+        start〜end の (category名, 収集日, 締切) を日付順に返す（collection_events の代わり）。
+        """
+        patterns = self._patterns(area_name, category_name)
+        streams = [
+            self._iter_pattern(p, s, e)
+            for edition, s, e in self.editions.between(start, end)
+            for p in patterns
+            if p.source_id == edition.source_id
+        ]
+        last = None
+        for d, name, deadline in heapq.merge(*streams):
+            if (d, name) != last:
+                yield name, d, deadline
+            last = (d, name)
+
+    def _iter_pattern(self, p: Pattern, start: date, end: date) -> Iterator[tuple[str, str, str]]:
+        name = self.category_name_by_id.get(p.category_id, p.category_id)
+        deadline = p.deadline_time or self.deadline_by_category.get(p.category_id)
+        for d in iter_dates(p.rule, start, end, exceptions=p.exceptions):
+            yield d.isoformat(), name, deadline
+
+
+# (DBファイルパス, open_ended) -> VirtualSchedule（プロセス内で使い回す）
+_SCHEDULE_CACHE: dict[tuple[str, bool], VirtualSchedule] = {}
+
+
+def open_ended_default() -> bool:
+    return os.environ.get(ENV_OPEN_ENDED) == "1"
+
+
+def get_virtual_schedule(conn: sqlite3.Connection, open_ended: bool | None = None) -> VirtualSchedule:
+    """
+    conn のDBに対応する VirtualSchedule を返す。DBファイルや sources が変わったら作り直す。
+    open_ended=None は NONOICHI_OPEN_ENDED に従う。
+    """
+    if open_ended is None:
+        open_ended = open_ended_default()
+    path = db_file(conn)
+    if path:
+        st = os.stat(path)
+        token = (st.st_mtime_ns, st.st_size, sources_signature(conn))
+    else:
+        token = (None, None, sources_signature(conn))
+    cached = _SCHEDULE_CACHE.get((path, open_ended))
+    if cached is not None and cached.token == token:
+        return cached
+    vs = VirtualSchedule.load(conn, token=token, open_ended=open_ended)
+    _SCHEDULE_CACHE[(path, open_ended)] = vs
+    return vs
+
+
+def forget_virtual_schedule(path: str) -> None:
+    # 使わなくなったDB（差し替え前のスナップショット）の分を捨てる
+    for key in [k for k in _SCHEDULE_CACHE if k[0] == path]:
+        del _SCHEDULE_CACHE[key]
@@ -0,0 +1,147 @@
+# /backend/bench/importtime.py
+# 検索まわりのモジュールの import 時間を測る（CLI・ワーカーのコールドスタート用）
+# 実行 → python -m backend.bench.importtime
+#        （モジュールごとに新しい python -X importtime で import し、基準を超えたら終了コード1）
+
+from __future__ import annotations
+
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+ROOT_DIR = BACKEND_DIR.parent
+
+# モジュール -> import 時間の上限（ms）。検索の中心は標準ライブラリだけで数十msに収まる
+TARGETS = {
+    "backend.app.query": 150.0,
+    "backend.app.next_pickup": 150.0,
+    "backend.app.calendar_export": 150.0,
+    "backend.app.api": 1000.0,   # fastapi の分が大きい
+}
+
+# 検索側で読み込んではいけない重い依存（シード・書き出し・画像推論のときだけ使う）
+HEAVY_MODULES = ("pandas", "yaml", "numpy", "PIL", "bs4", "lxml")
+
+
+@dataclass
+class ImportResult:
+    module: str
+    runs_ms: list[float] = field(default_factory=list)
+    heavy: list[str] = field(default_factory=list)                   # 読み込まれた重い依存
+    top: list[tuple[str, float]] = field(default_factory=list)       # 時間のかかった依存（最速の回）
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.runs_ms)
+
+    @property
+    def best_ms(self) -> float:
+        return min(self.runs_ms)
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, str, float]]:
+    """
+    -X importtime の出力を (深さ, モジュール名, 累積ms) のリストにする。
+    行の形式: "import time:  self [us] | cumulative | imported package"（深さは名前の前の空白）
+    """
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        out.append((depth, name.strip(), int(cumulative) / 1000))
+    return out
+
+
+def measure(module: str, repeat: int = 5) -> ImportResult:
+    result = ImportResult(module)
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT_DIR,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        rows = parse_importtime(proc.stderr)
+        # 子は親より先に出力される。対象の行から前の深さ0の行までが、対象が読み込んだもの
+        end = max(i for i, (depth, name, _) in enumerate(rows) if name == module and depth == 0)
+        start = end
+        while start > 0 and rows[start - 1][0] > 0:
+            start -= 1
+        total = rows[end][2]
+        result.runs_ms.append(total)
+        if best is None or total < best[0]:
+            best = (total, rows[start:end])
+
+    _, children = best
+    # 重い依存はトップレベルのパッケージ名で見る
+    loaded = {name.split(".")[0] for _, name, _ in children}
+    result.heavy = [m for m in HEAVY_MODULES if m in loaded]
+    # 対象モジュールの直下で時間のかかったもの
+    direct = [(name, ms) for depth, name, ms in children if depth == 1]
+    result.top = sorted(direct, key=lambda x: -x[1])[:5]
+    return result
+
+
+def main():
+    import argparse
+    import json
+
+    p = argparse.ArgumentParser(description="検索まわりの import 時間の計測")
+    p.add_argument("modules", nargs="*", help=f"測るモジュール（既定: {', '.join(TARGETS)}）")
+    p.add_argument("--repeat", type=int, default=5, help="モジュールごとの回数（中央値で判定）")
+    p.add_argument("--max-ms", type=float, help="上限（ms）を全モジュール共通で上書きする")
+    p.add_argument("--json", help="結果をJSONで保存する")
+    args = p.parse_args()
+
+    modules = args.modules or list(TARGETS)
+    failed = []
+    results = []
+    for module in modules:
+        r = measure(module, repeat=max(1, args.repeat))
+        limit = args.max_ms if args.max_ms is not None else TARGETS.get(module, 150.0)
+        results.append((r, limit))
+
+        print(f"{module}: median {r.median_ms:.1f} ms / best {r.best_ms:.1f} ms (limit {limit:.0f} ms)")
+        for name, ms in r.top:
+            print(f"    {ms:8.1f} ms  {name}")
+        if r.median_ms > limit:
+            failed.append(f"{module}: {r.median_ms:.1f} ms > {limit:.0f} ms")
+        # api は画像推論を有効にしたときだけ numpy / Pillow を読む。どのモジュールも重い依存は読まない
+        if r.heavy:
+            failed.append(f"{module}: imports {', '.join(r.heavy)}")
+
+    if args.json:
+        data = [
+            {
+                "module": r.module,
+                "median_ms": round(r.median_ms, 2),
+                "best_ms": round(r.best_ms, 2),
+                "runs_ms": [round(x, 2) for x in r.runs_ms],
+                "limit_ms": limit,
+                "heavy": r.heavy,
+                "top": [{"module": name, "ms": round(ms, 2)} for name, ms in r.top],
+            }
+            for r, limit in results
+        ]
+        Path(args.json).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"保存しました: {args.json}")
+
+    if failed:
+        for f in failed:
+            print(f"⚠️ {f}")
+        sys.exit(1)
+    print("✅ 完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# /backend/bench/loadtest.py
+# APIサーバーの負荷試験スクリプト
+# 実行 → python -m backend.bench.loadtest --spawn
+#        （--spawn でサーバーも起動する。起動済みのサーバーには --url で当てる）
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+ROOT_DIR = BACKEND_DIR.parent
+DB_PATH = BACKEND_DIR / "data" / "db" / "nonoichi_waste.db"
+
+
+# ================
+# 送るリクエスト
+# ================
+
+def build_paths(db_path: Path, n: int = 2000, seed: int = 0) -> list[str]:
+    """
+    DBの中身から実際に近いリクエストの組み合わせを作る。
+    品目の完全一致・見つからない品目・候補提示・次の収集日を混ぜる。
+    """
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        names = [r[0] for r in conn.execute("SELECT name FROM items")]
+        areas = [r[0] for r in conn.execute("SELECT name FROM areas")]
+        categories = [r[0] for r in conn.execute("SELECT name FROM categories")]
+        # 収集日のある期間の中で「今」を選ぶ（期間外だと次の収集日が見つからない）
+        first, last = conn.execute("SELECT MIN(collection_date), MAX(collection_date) FROM collection_events").fetchone()
+    finally:
+        conn.close()
+
+    def q(s: str) -> str:
+        return quote(s, safe="")
+
+    first_day = date.fromisoformat(first) if first else date.today()
+    span = (date.fromisoformat(last) - first_day).days if last else 0
+
+    def now() -> str:
+        d = first_day + timedelta(days=rnd.randint(0, max(0, span - 14)))
+        return f"{d.isoformat()}T{rnd.randint(5, 9):02d}:{rnd.choice((0, 30)):02d}"
+
+    paths = []
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.35:
+            paths.append(f"/items/lookup?name={q(rnd.choice(names))}")
+        elif r < 0.45:
+            paths.append(f"/items/lookup?name={q(rnd.choice(names) + 'ー存在しない')}")
+        elif r < 0.70:
+            name = rnd.choice(names)
+            paths.append(f"/items/suggest?q={q(name[: rnd.randint(1, 3)])}")
+        elif r < 0.85:
+            paths.append(f"/next_pickup?area={q(rnd.choice(areas))}&category={q(rnd.choice(categories))}&now={now()}")
+        else:
+            paths.append(f"/next_pickup?area={q(rnd.choice(areas))}&item={q(rnd.choice(names))}&now={now()}")
+    return paths
+
+
+# ================
+# HTTP/1.1 keep-alive クライアント（依存なし。計測側が遅くならないよう最小限）
+# ================
+
+async def _worker(host: str, port: int, paths: list[str], deadline: float, latencies: list[float], status: dict):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            t0 = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("ascii"))
+            await writer.drain()
+
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            code = int(lines[0].split()[1])
+            length = 0
+            for line in lines[1:]:
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            await reader.readexactly(length)
+
+            latencies.append(time.perf_counter() - t0)
+            status[code] = status.get(code, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(url: str, paths: list[str], connections: int, duration: float) -> dict:
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    latencies: list[float] = []
+    status: dict[int, int] = {}
+    deadline = time.perf_counter() + duration
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        # 接続ごとに開始位置をずらす
+        _worker(host, port, paths[i * 7 % len(paths):] + paths[: i * 7 % len(paths)], deadline, latencies, status)
+        for i in range(connections)
+    ])
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(pct(0.50), 2),
+        "p99_ms": round(pct(0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "status": dict(sorted(status.items())),
+    }
+
+
+async def wait_ready(url: str, timeout: float = 30.0) -> None:
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+            writer.write(f"GET /health HTTP/1.1\r\nHost: {parts.hostname}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            if b" 200 " in await reader.readline():
+                writer.close()
+                return
+            writer.close()
+        except OSError:
+            pass
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"server did not start: {url}")
+        await asyncio.sleep(0.2)
+
+
+# ================
+# メイン処理
+# ================
+
+def main():
+    import argparse
+    import json
+
+    p = argparse.ArgumentParser(description="APIサーバーの負荷試験")
+    p.add_argument("--url", default="http://127.0.0.1:8000", help="対象サーバー")
+    p.add_argument("--spawn", action="store_true", help="サーバーをこのスクリプトから起動する")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="--spawn 時のワーカー数")
+    p.add_argument("--db", default=str(DB_PATH), help="リクエストを作るDB（--spawn 時はサーバーもこのDBを使う）")
+    p.add_argument("--connections", type=int, default=64, help="同時接続数")
+    p.add_argument("--duration", type=float, default=10.0, help="計測秒数")
+    p.add_argument("--warmup", type=float, default=2.0, help="計測前の慣らし秒数")
+    p.add_argument("--min-rps", type=float, help="これを下回ったら終了コード1（回帰チェック用）")
+    p.add_argument("--json", help="結果をJSONで保存する")
+    args = p.parse_args()
+
+    paths = build_paths(Path(args.db))
+
+    server = None
+    if args.spawn:
+        port = urlsplit(args.url).port or 8000
+        server = subprocess.Popen(
+            [sys.executable, "-m", "backend.app.api", "--port", str(port),
+             "--workers", str(args.workers), "--db", args.db],
+            cwd=ROOT_DIR,
+            # 検索系だけを測るので、推論用のプロセスプールは起動しない
+            env={**os.environ, "NONOICHI_INFER_WORKERS": "0"},
+        )
+    try:
+        asyncio.run(wait_ready(args.url))
+        if args.warmup > 0:
+            asyncio.run(run_load(args.url, paths, args.connections, args.warmup))
+        result = asyncio.run(run_load(args.url, paths, args.connections, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    result.update(connections=args.connections, workers=args.workers if args.spawn else None)
+    print(f"requests: {result['requests']} in {result['seconds']}s -> {result['rps']} req/s")
+    print(f"latency : p50 {result['p50_ms']} ms / p99 {result['p99_ms']} ms / mean {result['mean_ms']} ms")
+    print(f"status  : {result['status']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"保存しました: {args.json}")
+
+    errors = sum(n for code, n in result["status"].items() if code >= 500)
+    if errors:
+        print(f"⚠️ サーバーエラー: {errors} 件")
+        sys.exit(1)
+    if args.min_rps is not None and result["rps"] < args.min_rps:
+        print(f"⚠️ スループットが基準未満です: {result['rps']} < {args.min_rps} req/s")
+        sys.exit(1)
+    print("✅ 完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,525 @@
+# /backend/bench/query_bench.py
+# 品目検索・候補提示・次の収集日の関数を直接呼んで測る（HTTP を通さない。loadtest.py の内側の分）
+# 実行 → python -m backend.bench.query_bench
+#        （同梱DBと、それを水増しした 10倍/100倍 のDBで測る。--json で保存し、--compare で前の結果と比べる）
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+ROOT_DIR = BACKEND_DIR.parent
+DB_PATH = BACKEND_DIR / "data" / "db" / "nonoichi_waste.db"
+WORK_DIR = BACKEND_DIR / "data" / "bench"
+
+# 水増しした品目の名前に付ける語（前方一致の候補が実際の辞典のように増えるよう、元の名前の後ろに付ける）
+VARIANT_WORDS = ("ケース", "カバー", "のふた", "（大）", "（小）", "セット", "用部品", "袋", "キャップ", "の箱")
+
+# 測る関数（next_pickup 以外は品目の索引を引く）
+OPS = (
+    "find_item_exact",
+    "find_item_alias",
+    "category_from_item",
+    "suggest_items_prefix",
+    "suggest_items",
+    "next_pickup",
+    "next_pickup_virtual",
+)
+
+
+# ================
+# 水増ししたDB
+# ================
+
+def scale_shape(scale: int) -> tuple[int, int]:
+    # 倍率 -> (市の数, 年数)。品目は scale 倍、地区は市の数だけ、収集日は年数だけ複製する
+    return max(1, round(math.sqrt(scale))), 1 + round(math.log10(max(1, scale)))
+
+
+def build_scaled_db(src: Path, dest: Path, scale: int, cities: int, years: int) -> Path:
+    """
+    src（シード済みのDB）を複製して水増しする。中身は決まった規則で作るので、同じ引数なら同じDBになる。
+    - 品目: 名前に語を足した品目を scale 倍まで足す（読みキーも計算する）
+    - 市: 地区・地区グループ・収集日を「第N市」として cities 個分に増やす
+    - 年: 収集日を 364 日（52週）ずつずらして years 年分に延ばし、next_pickup_days を作り直す
+    """
+    from backend.app.db.init_db import apply_schema
+    from backend.app.db.seed_schedule import build_next_pickups
+    from backend.app.kana import reading_key
+    from backend.app.textnorm import normalize_text
+
+    tmp = dest.with_name(dest.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+    src_conn = sqlite3.connect(f"file:{quote(str(src.resolve()))}?mode=ro", uri=True)
+    try:
+        src_conn.execute("VACUUM INTO ?", (str(tmp),))
+    finally:
+        src_conn.close()
+
+    conn = sqlite3.connect(str(tmp))
+    try:
+        apply_schema(conn)
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+
+        # 品目
+        items = conn.execute(
+            "SELECT item_id, name, category_id, note, source_id FROM items ORDER BY item_id"
+        ).fetchall()
+        taken = {r[0] for r in conn.execute("SELECT name_norm FROM items")}
+        rows = []
+        for k in range(1, scale):
+            word = VARIANT_WORDS[(k - 1) % len(VARIANT_WORDS)]
+            round_no = (k - 1) // len(VARIANT_WORDS)
+            suffix = word + (str(round_no + 1) if round_no else "")
+            for item_id, name, category_id, note, source_id in items:
+                new_name = name + suffix
+                name_norm = normalize_text(new_name)
+                if name_norm in taken:
+                    continue
+                taken.add(name_norm)
+                rows.append((f"{item_id}-x{k}", new_name, name_norm, reading_key(name_norm), category_id, note, source_id))
+        conn.executemany(
+            "INSERT INTO items(item_id, name, name_norm, name_key, category_id, note, source_id) VALUES (?,?,?,?,?,?,?)",
+            rows,
+        )
+
+        # 年（市を増やす前にずらしておけば、市の複製にも全年分が入る）
+        # 収集日は整数の表（collection_days）に直接書く。日付は日数なので足すだけでずれる
+        base_events = conn.execute(
+            "SELECT area_no, category_no, day, deadline, note_no, source_no FROM collection_days"
+        ).fetchall()
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO collection_days(area_no, category_no, day, deadline, note_no, source_no)
+            VALUES (?,?,?,?,?,?)
+            """,
+            (
+                (area_no, category_no, day + 364 * y, deadline, note_no, source_no)
+                for y in range(1, years)
+                for area_no, category_no, day, deadline, note_no, source_no in base_events
+            ),
+        )
+
+        # 市
+        for c in range(2, cities + 1):
+            prefix = f"第{c}市・"
+            conn.execute(
+                "INSERT INTO areas(area_id, name, note, source_id, updated_at) "
+                "SELECT ? || area_id, ? || name, note, source_id, updated_at FROM areas WHERE area_id NOT GLOB 'c[0-9]*:*'",
+                (f"c{c}:", prefix),
+            )
+            conn.execute(
+                "INSERT INTO area_groups(area_group_id, name, note, source_id, updated_at) "
+                "SELECT ? || area_group_id, ? || name, note, source_id, updated_at FROM area_groups "
+                "WHERE area_group_id NOT GLOB 'c[0-9]*:*'",
+                (f"c{c}:", prefix),
+            )
+            conn.execute(
+                "INSERT INTO area_group_members(area_group_id, area_id) "
+                "SELECT ? || area_group_id, ? || area_id FROM area_group_members WHERE area_id NOT GLOB 'c[0-9]*:*'",
+                (f"c{c}:", f"c{c}:"),
+            )
+            conn.execute(
+                "INSERT INTO area_group_schedule_links(area_group_id, schedule_group_id) "
+                "SELECT ? || area_group_id, schedule_group_id FROM area_group_schedule_links "
+                "WHERE area_group_id NOT GLOB 'c[0-9]*:*'",
+                (f"c{c}:",),
+            )
+            conn.execute(
+                "INSERT INTO collection_days(area_no, category_no, day, deadline, note_no, source_no) "
+                "SELECT n.area_no, d.category_no, d.day, d.deadline, d.note_no, d.source_no "
+                "FROM collection_days d "
+                "JOIN areas o ON o.area_no = d.area_no "
+                "JOIN areas n ON n.area_id = ? || o.area_id "
+                "WHERE o.area_id NOT GLOB 'c[0-9]*:*'",
+                (f"c{c}:",),
+            )
+        build_next_pickups(conn)
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, dest)
+    return dest
+
+
+def scaled_db_path(work_dir: Path, scale: int, cities: int, years: int) -> Path:
+    return work_dir / f"scaled-x{scale}-c{cities}-y{years}.db"
+
+
+def is_stale(db: Path, src: Path) -> bool:
+    # 元のDBより古いか、収集日が整数の表になる前に作ったもの
+    if not db.exists() or db.stat().st_mtime < src.stat().st_mtime:
+        return True
+    conn = sqlite3.connect(f"file:{quote(str(db.resolve()))}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE name='collection_days'").fetchone() is None
+    finally:
+        conn.close()
+
+
+# ================
+# 問い合わせの組み合わせ
+# ================
+
+def _swap_kana(s: str) -> str:
+    # カタカナ <-> ひらがな を入れ替えた表記ゆれ（読みキーで吸収される）
+    if any("ァ" <= c <= "ヶ" for c in s):
+        return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in s)
+    return "".join(chr(ord(c) + 0x60) if "ぁ" <= c <= "ゖ" else c for c in s)
+
+
+def build_queries(conn: sqlite3.Connection, n: int = 5000, seed: int = 0) -> dict[str, list[tuple]]:
+    """
+    関数ごとの引数のリスト。DBの中身から実際に近い組み合わせを作る。
+    品目: 完全一致 50% / 見つからない 15% / かなの表記ゆれ 20% / 別名（無ければ前後の空白）15%
+    候補: 前方一致は名前の先頭1〜3文字、あいまい検索は名前の一部や1文字違い
+    次の収集日: 収集日のある期間の中の「今」（1割は期間の後）
+    """
+    rnd = random.Random(seed)
+    names = [r[0] for r in conn.execute("SELECT name FROM items ORDER BY name_norm")]
+    aliases = [r[0] for r in conn.execute("SELECT alias_norm FROM item_aliases ORDER BY alias_norm")]
+    areas = [r[0] for r in conn.execute("SELECT name FROM areas ORDER BY name")]
+    categories = [r[0] for r in conn.execute("SELECT name FROM categories ORDER BY category_id")]
+    first, last = conn.execute("SELECT MIN(collection_date), MAX(collection_date) FROM collection_events").fetchone()
+
+    def item() -> str:
+        r = rnd.random()
+        name = rnd.choice(names)
+        if r < 0.50:
+            return name
+        if r < 0.60:
+            return name + "ー存在しない"
+        if r < 0.65:
+            return "".join(chr(rnd.randint(ord("ァ"), ord("ヶ"))) for _ in range(rnd.randint(2, 6)))
+        if r < 0.85:
+            swapped = _swap_kana(name)
+            return swapped if swapped != name else f" {name} "
+        return rnd.choice(aliases) if aliases else f" {name} "
+
+    def prefix() -> str:
+        if rnd.random() < 0.1:
+            return "ゔ" + chr(rnd.randint(ord("ぁ"), ord("ゖ")))
+        return rnd.choice(names)[: rnd.randint(1, 3)]
+
+    def fuzzy() -> str:
+        name = rnd.choice(names)
+        if rnd.random() < 0.2 and len(name) > 2:
+            i = rnd.randrange(len(name))
+            return name[:i] + "ア" + name[i + 1:]
+        start = rnd.randrange(max(1, len(name) - 1))
+        return name[start:start + rnd.randint(2, 4)]
+
+    first_day = date.fromisoformat(first) if first else date.today()
+    span = (date.fromisoformat(last) - first_day).days if last else 0
+
+    def now() -> str:
+        if rnd.random() < 0.1:
+            d = first_day + timedelta(days=span + rnd.randint(1, 30))
+        else:
+            d = first_day + timedelta(days=rnd.randint(0, max(0, span - 14)))
+        return f"{d.isoformat()}T{rnd.randint(5, 9):02d}:{rnd.choice((0, 30)):02d}"
+
+    lookups = [(item(),) for _ in range(n)]
+    pickups = [(rnd.choice(areas), rnd.choice(categories), now()) for _ in range(n)] if areas else []
+    return {
+        "find_item_exact": lookups,
+        "find_item_alias": lookups,
+        "category_from_item": lookups,
+        "suggest_items_prefix": [(prefix(),) for _ in range(n)],
+        "suggest_items": [(fuzzy(),) for _ in range(n)],
+        "next_pickup": pickups,
+        "next_pickup_virtual": pickups,
+    }
+
+
+# ================
+# 計測（DBごとに別プロセスで測る。メモリと索引のキャッシュを持ち越さないため）
+# ================
+
+def _stats(latencies_ns: list[int], hits: int) -> dict:
+    latencies_ns = sorted(latencies_ns)
+
+    def pct(p: float) -> float:
+        return latencies_ns[min(len(latencies_ns) - 1, int(len(latencies_ns) * p))] / 1000
+
+    total_s = sum(latencies_ns) / 1e9
+    return {
+        "n": len(latencies_ns),
+        "p50_us": round(pct(0.50), 2),
+        "p99_us": round(pct(0.99), 2),
+        "mean_us": round(statistics.fmean(latencies_ns) / 1000, 2),
+        "ops_per_sec": round(len(latencies_ns) / total_s, 1) if total_s else 0.0,
+        "hit_rate": round(hits / len(latencies_ns), 3),
+    }
+
+
+def run_db(db: Path, n: int = 5000, seed: int = 0, ops: tuple[str, ...] = OPS) -> dict:
+    """
+    db に対して各関数を n 回ずつ呼んだ結果。索引の読み込み（初回の1回）は別に測る。
+    """
+    import resource
+    import tracemalloc
+
+    from backend.app.next_pickup import category_from_item, next_pickup
+    from backend.app.pool import connect_readonly
+    from backend.app.query import (
+        db_file,
+        find_item_alias,
+        find_item_exact,
+        forget_item_index,
+        get_item_index,
+        suggest_items,
+        suggest_items_prefix,
+    )
+    from backend.app.virtual_events import forget_virtual_schedule, get_virtual_schedule
+
+    calls = {
+        "find_item_exact": find_item_exact,
+        "find_item_alias": find_item_alias,
+        "category_from_item": category_from_item,
+        "suggest_items_prefix": suggest_items_prefix,
+        "suggest_items": suggest_items,
+        "next_pickup": next_pickup,
+        "next_pickup_virtual": lambda conn, area, category, now: next_pickup(conn, area, category, now, virtual=True),
+    }
+
+    conn = connect_readonly(db)
+    try:
+        path = db_file(conn)
+        counts = {}
+        # 収集日は整数の表を数える（ビューを数えると行ごとに結合する）
+        for key, table in (
+            ("items", "items"),
+            ("item_aliases", "item_aliases"),
+            ("areas", "areas"),
+            ("collection_events", "collection_days"),
+            ("next_pickups", "next_pickup_days"),
+        ):
+            counts[key] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        queries = build_queries(conn, n=n, seed=seed)
+
+        # 初回に作るもの: 時間は普通に測り、メモリは作り直して tracemalloc で測る
+        warm: dict[str, dict] = {}
+
+        def measure_build(name: str, build, forget) -> bool:
+            try:
+                t0 = time.perf_counter()
+                build()
+                ms = (time.perf_counter() - t0) * 1000
+            except (sqlite3.Error, ValueError) as e:
+                warm[name] = {"error": str(e)}
+                return False
+            forget()
+            tracemalloc.start()
+            try:
+                build()
+                current, _peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            warm[name] = {"ms": round(ms, 2), "kb": round(current / 1024, 1)}
+            return True
+
+        measure_build("item_index", lambda: get_item_index(conn), lambda: forget_item_index(path))
+        index = get_item_index(conn)
+        measure_build("fuzzy_index", index.warm, lambda: setattr(index, "fuzzy", None))
+        virtual_ok = measure_build(
+            "virtual_schedule", lambda: get_virtual_schedule(conn), lambda: forget_virtual_schedule(path)
+        )
+        warm["item_index"]["type"] = type(index).__name__
+
+        results = {}
+        for op in ops:
+            args_list = queries[op]
+            if not args_list or (op == "next_pickup_virtual" and not virtual_ok):
+                continue
+            fn = calls[op]
+            for args in args_list[:200]:
+                fn(conn, *args)
+            latencies = []
+            hits = 0
+            for args in args_list:
+                t0 = time.perf_counter_ns()
+                r = fn(conn, *args)
+                latencies.append(time.perf_counter_ns() - t0)
+                hits += bool(r)
+            results[op] = _stats(latencies, hits)
+    finally:
+        conn.close()
+
+    return {
+        "db": str(db),
+        "db_bytes": db.stat().st_size,
+        "counts": counts,
+        "warm": warm,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "ops": results,
+    }
+
+
+def run_db_isolated(db: Path, n: int, seed: int, ops: tuple[str, ...]) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "backend.bench.query_bench", "--run-db", str(db),
+         "-n", str(n), "--seed", str(seed), "--ops", ",".join(ops)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark failed for {db}:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout)
+
+
+# ================
+# 前の結果との比較
+# ================
+
+def compare(base: dict, current: dict, tolerance: float = 0.25, floor_us: float = 2.0) -> list[str]:
+    """
+    同じラベル・同じ関数の p50 を比べ、tolerance（割合）を超えて遅くなったものを返す。
+    数マイクロ秒の差は計測の揺れなので floor_us 未満の差は見ない。
+    """
+    old = {(r["label"], op): s for r in base.get("results", []) for op, s in r["ops"].items()}
+    regressions = []
+    for r in current["results"]:
+        for op, s in r["ops"].items():
+            prev = old.get((r["label"], op))
+            if prev is None:
+                continue
+            ratio = s["p50_us"] / prev["p50_us"] if prev["p50_us"] else 1.0
+            mark = ""
+            if s["p50_us"] - prev["p50_us"] > floor_us and ratio > 1 + tolerance:
+                mark = "  ⚠️"
+                regressions.append(f"{r['label']} {op}: p50 {prev['p50_us']} -> {s['p50_us']} us")
+            print(
+                f"  {r['label']:>5} {op:<22} p50 {prev['p50_us']:>9.2f} -> {s['p50_us']:>9.2f} us ({ratio - 1:+.0%})"
+                f"  p99 {prev['p99_us']:>9.2f} -> {s['p99_us']:>9.2f} us{mark}"
+            )
+    return regressions
+
+
+# ================
+# メイン処理
+# ================
+
+def _git_revision() -> str | None:
+    try:
+        proc = subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=ROOT_DIR, capture_output=True, text=True, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return proc.stdout.strip() or None
+
+
+def print_result(r: dict) -> None:
+    c = r["counts"]
+    w = r["warm"]
+    print(
+        f"[{r['label']}] {Path(r['db']).name}: items {c['items']} / areas {c['areas']} / "
+        f"events {c['collection_events']} / next_pickups {c['next_pickups']} ({r['db_bytes'] // 1024} KB)"
+    )
+    for name, s in w.items():
+        if "error" in s:
+            print(f"    {name:<22} skipped: {s['error']}")
+        else:
+            print(f"    {name:<22} build {s['ms']:>9.1f} ms  {s['kb']:>9.1f} KB  {s.get('type', '')}")
+    print(f"    {'op':<22} {'p50 us':>9} {'p99 us':>9} {'ops/s':>10} {'hit':>6}")
+    for op, s in r["ops"].items():
+        print(f"    {op:<22} {s['p50_us']:>9.2f} {s['p99_us']:>9.2f} {s['ops_per_sec']:>10.0f} {s['hit_rate']:>6.1%}")
+    print(f"    max RSS {r['max_rss_kb'] // 1024} MB")
+
+
+def main():
+    import argparse
+    import platform
+
+    p = argparse.ArgumentParser(description="検索まわりの関数のベンチマーク")
+    p.add_argument("--db", type=Path, default=DB_PATH, help="元にするDB（倍率1はこのDBをそのまま測る）")
+    p.add_argument("--scales", default="1,10,100", help="倍率（カンマ区切り。品目は倍率倍、市と年は --cities/--years）")
+    p.add_argument("--cities", type=int, help="水増しするときの市の数（既定: 倍率の平方根）")
+    p.add_argument("--years", type=int, help="水増しするときの年数（既定: 1 + log10(倍率)）")
+    p.add_argument("--work-dir", type=Path, default=WORK_DIR, help="水増ししたDBを置くディレクトリ（次回は使い回す）")
+    p.add_argument("--rebuild", action="store_true", help="水増ししたDBを作り直す")
+    p.add_argument("-n", type=int, default=5000, help="関数ごとの呼び出し回数")
+    p.add_argument("--seed", type=int, default=0, help="問い合わせを作る乱数の種")
+    p.add_argument("--ops", default=",".join(OPS), help="測る関数（カンマ区切り）")
+    p.add_argument("--json", help="結果をJSONで保存する")
+    p.add_argument("--compare", help="前の結果（--json で保存したもの）と比べ、遅くなっていたら終了コード1")
+    p.add_argument("--tolerance", type=float, default=0.25, help="--compare で許す p50 の悪化（割合）")
+    p.add_argument("--run-db", type=Path, help=argparse.SUPPRESS)   # 子プロセス用: 1つのDBを測ってJSONを出す
+    args = p.parse_args()
+
+    ops = tuple(op for op in args.ops.split(",") if op)
+    unknown = [op for op in ops if op not in OPS]
+    if unknown:
+        p.error(f"unknown ops: {', '.join(unknown)}")
+
+    if args.run_db:
+        print(json.dumps(run_db(args.run_db, n=args.n, seed=args.seed, ops=ops), ensure_ascii=False))
+        return
+
+    if not args.db.exists():
+        raise FileNotFoundError(f"db not found: {args.db}")
+
+    results = []
+    for scale in sorted({int(s) for s in args.scales.split(",") if s}):
+        if scale <= 1:
+            db = args.db
+        else:
+            cities, years = scale_shape(scale)
+            cities = args.cities or cities
+            years = args.years or years
+            db = scaled_db_path(args.work_dir, scale, cities, years)
+            if args.rebuild or is_stale(db, args.db):
+                args.work_dir.mkdir(parents=True, exist_ok=True)
+                t0 = time.perf_counter()
+                build_scaled_db(args.db, db, scale, cities, years)
+                print(f"built {db.name} in {time.perf_counter() - t0:.1f}s")
+        r = {"label": f"x{scale}", "scale": scale, **run_db_isolated(db, args.n, args.seed, ops)}
+        results.append(r)
+        print_result(r)
+
+    report = {
+        "revision": _git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "n": args.n,
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"保存しました: {args.json}")
+
+    if args.compare:
+        base = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"compare with {args.compare} ({base.get('revision')})")
+        regressions = compare(base, report, tolerance=args.tolerance)
+        if regressions:
+            for r in regressions:
+                print(f"⚠️ 遅くなりました: {r}")
+            sys.exit(1)
+    print("✅ 完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+# /backend/bench/synth_data.py
+# 負荷試験用の合成データを作る（収集日程の schedule_r*.yaml と、品目の raw CSV）
+# 実行 → python -m backend.bench.synth_data --municipalities 20 --years 3 --items 100000 --seed-db
+#        （同じ --seed なら同じファイルになる。--seed-db で作ったデータをシードし、かかった時間を表示する）
+#        シードしたDBは python -m backend.bench.query_bench --db <DB> --scales 1 でそのまま測れる
+
+from __future__ import annotations
+
+import csv
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+ROOT_DIR = BACKEND_DIR.parent
+WORK_DIR = BACKEND_DIR / "data" / "bench" / "synth"
+
+ITEMS_CSV_NAME = "nonoichi_garbage.csv"
+
+# 区分は schedule_r7.yaml と同じ（品目CSVの区分名と突き合わせるので変えない）
+CATEGORIES = (
+    ("burnable", "一般ごみ", "07:00"),
+    ("nonburnable", "燃えないごみ", "07:30"),
+    ("can", "あきかん", "07:30"),
+    ("bottle", "あきびん", "07:30"),
+    ("large_burnable", "燃える粗大ごみ", "07:30"),
+    ("petbottle", "ペットボトル", "07:30"),
+    ("plastic_container", "容器包装プラスチック", "07:30"),
+)
+
+WEEKDAYS = ("MON", "TUE", "WED", "THU", "FRI", "SAT")
+# 一般ごみの曜日の組（週2回）
+BURN_DAYS = (("MON", "THU"), ("TUE", "FRI"), ("WED", "SAT"))
+# 月1回の区分（第n曜日）。容器包装プラスチックは月2回
+MONTHLY = ("nonburnable", "can", "bottle", "large_burnable", "petbottle")
+ORDINAL = {1: "1st", 2: "2nd", 3: "3rd", 4: "4th"}
+WEEKDAY_JA = dict(zip(WEEKDAYS, "月火水木金土"))
+CATEGORY_NAME = {c: n for c, n, _ in CATEGORIES}
+
+# 市町・地区の名前の部品（組み合わせて重ならない名前を作る）
+PLACE_HEADS = ("本", "新", "上", "下", "東", "西", "南", "北", "中", "大", "小", "高", "若", "桜", "緑", "松", "竹", "梅")
+PLACE_TAILS = ("町", "林", "庄", "田", "川", "野", "山", "原", "島", "沢", "浜", "丘", "台", "宮", "寺", "池", "森", "橋")
+
+# 品目名の部品: 様子 + 頭に付く語 + 材質 + もの + 後ろに付く語（区分は もの -> 材質 -> 頭の語 の順に決める）
+ITEM_LOOKS = ("", "", "", "白い", "黒い", "赤い", "青い", "古い", "丸い", "四角い", "透明な", "やわらかい")
+ITEM_HEADS = ("", "", "", "子ども用", "業務用", "折りたたみ", "電動", "大型", "小型", "使い捨て", "携帯用", "卓上")
+ITEM_MATERIALS = (
+    ("", None),
+    ("", None),
+    ("プラスチック製", "一般ごみ"),
+    ("木製", "一般ごみ"),
+    ("布製", "一般ごみ"),
+    ("紙製", "一般ごみ"),
+    ("ゴム製", "一般ごみ"),
+    ("金属製", "燃えないごみ"),
+    ("ガラス製", "燃えないごみ"),
+    ("陶器製", "燃えないごみ"),
+    ("ステンレス製", "燃えないごみ"),
+)
+ITEM_THINGS = (
+    ("バケツ", "一般ごみ"), ("ハンガー", "一般ごみ"), ("まな板", "一般ごみ"), ("コップ", "燃えないごみ"),
+    ("ケース", "一般ごみ"), ("かご", "一般ごみ"), ("いす", "燃える粗大ごみ"), ("机", "燃える粗大ごみ"),
+    ("棚", "燃える粗大ごみ"), ("ほうき", "一般ごみ"), ("ちりとり", "一般ごみ"), ("鍋", "燃えないごみ"),
+    ("フライパン", "燃えないごみ"), ("やかん", "燃えないごみ"), ("傘", "燃えないごみ"), ("時計", "燃えないごみ"),
+    ("おもちゃ", "一般ごみ"), ("ぬいぐるみ", "一般ごみ"), ("カーペット", "燃える粗大ごみ"), ("すだれ", "燃える粗大ごみ"),
+    ("スリッパ", "一般ごみ"), ("サンダル", "一般ごみ"), ("ボール", "一般ごみ"), ("ラケット", "一般ごみ"),
+    ("食器", "燃えないごみ"), ("花びん", "燃えないごみ"), ("植木鉢", "燃えないごみ"), ("じょうろ", "一般ごみ"),
+    ("ライト", "燃えないごみ"), ("扇風機", "燃えないごみ"), ("ドライヤー", "燃えないごみ"), ("アイロン", "燃えないごみ"),
+    ("ざる", "一般ごみ"), ("ボウル", "燃えないごみ"), ("水筒", "燃えないごみ"), ("弁当箱", "一般ごみ"),
+    ("収納ボックス", "一般ごみ"), ("物干しざお", "燃えないごみ"), ("すのこ", "燃える粗大ごみ"), ("ござ", "燃える粗大ごみ"),
+    ("空き缶", "あきかん"), ("缶詰の缶", "あきかん"), ("ジャムのびん", "あきびん"), ("調味料のびん", "あきびん"),
+    ("飲料のペットボトル", "ペットボトル"), ("卵のパック", "容器包装プラスチック"), ("お菓子の袋", "容器包装プラスチック"),
+    ("トレイ", "容器包装プラスチック"), ("緩衝材", "容器包装プラスチック"), ("カップ麺の容器", "容器包装プラスチック"),
+    ("新聞紙", "古紙（新聞紙）"), ("段ボール", "古紙（段ボール）"), ("雑誌", "古紙（チラシ・雑誌・本・コピー用紙類）"),
+    ("牛乳パック", "紙パック"), ("古着", "古着・布類"), ("消火器", "自己処理"), ("タイヤ", "自己処理"),
+    ("バッテリー", "自己処理"), ("ピアノ", "自己処理"), ("ガスボンベ", "自己処理"),
+)
+ITEM_TAILS = ("", "", "", "（大）", "（小）", "のふた", "の部品", "セット", "カバー", "（壊れたもの）")
+# 材質・頭の語で区分を変えない もの（容器・資源・自己処理）
+FIXED_CATEGORIES = frozenset({
+    "あきかん", "あきびん", "ペットボトル", "容器包装プラスチック", "古紙（新聞紙）", "古紙（段ボール）",
+    "古紙（チラシ・雑誌・本・コピー用紙類）", "紙パック", "古着・布類", "自己処理",
+})
+NOTES = {
+    "一般ごみ": ("ごみ袋に入らない場合は「燃える粗大ごみ」へ。", "電池を使用している場合は取り外してください。"),
+    "燃えないごみ": ("できるだけ小さくしてください。", "割れたものは紙に包んで「キケン」と書いてください。"),
+    "燃える粗大ごみ": ("長さ2m以内に切ってください。", "1回に3点まで出せます。"),
+    "あきかん": ("中を洗ってください。",),
+    "あきびん": ("中を洗ってください。ふたやキャップは取り外してください。",),
+    "ペットボトル": ("キャップとラベルは「容器包装プラスチック」へ。",),
+    "容器包装プラスチック": ("汚れを落としてから出してください。",),
+}
+ROWS_PER_PAGE = 15
+
+
+@dataclass(frozen=True)
+class SynthSpec:
+    seed: int = 0
+    municipalities: int = 1
+    areas: int = 41              # 市町ごとの地区数
+    groups: int = 4              # 市町ごとの地区グループ数
+    years: int = 1               # 版（年度）の数
+    first_edition: int = 7       # 最初の版（r7 = 2025年度）
+    items: int = 1300
+    exceptions: int = 2          # 市町・版ごとの例外（休み・臨時収集）の数
+
+
+def fiscal_year(edition: int) -> int:
+    # 令和n年度 -> 西暦（4月始まり）
+    return 2018 + edition
+
+
+def municipality_names(n: int) -> list[str]:
+    # 「本川市」「新林町」…。部品を使い切ったら番号を付ける
+    tails = PLACE_TAILS[1:]   # 「本町町」にならないように「町」は使わない
+    out = []
+    for i in range(n):
+        head = PLACE_HEADS[i % len(PLACE_HEADS)]
+        tail = tails[(i // len(PLACE_HEADS)) % len(tails)]
+        lap = i // (len(PLACE_HEADS) * len(tails))
+        out.append(f"{head}{tail}{lap + 1 if lap else ''}{'市' if i % 3 else '町'}")
+    return out
+
+
+def area_names(rnd: random.Random, municipality: str, n: int) -> list[str]:
+    # 市町名を頭に付ける（areas.name は全体で一意）。丁目付きの地区も混ぜる
+    names: list[str] = []
+    seen: set[str] = set()
+    for _ in range(n * 20):
+        if len(names) >= n:
+            break
+        base = rnd.choice(PLACE_HEADS) + rnd.choice(PLACE_TAILS)
+        parts = [f"{base}{c}丁目" for c in range(1, rnd.randint(2, 6))] if rnd.random() < 0.3 else [base]
+        for x in parts:
+            if x not in seen:
+                seen.add(x)
+                names.append(x)
+    # 部品の組み合わせを使い切ったら番号で埋める
+    names += [f"第{i}地区" for i in range(len(names) + 1, n + 1)]
+    return [f"{municipality}{x}" for x in names[:n]]
+
+
+def _split(rnd: random.Random, values: list[str], k: int) -> list[list[str]]:
+    # values を k 個の空でないグループに分ける（大きさはばらつかせる）
+    k = max(1, min(k, len(values)))
+    cuts = sorted(rnd.sample(range(1, len(values)), k - 1)) if k > 1 else []
+    bounds = [0, *cuts, len(values)]
+    return [values[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def _year_end(weekdays: tuple[str, ...], year: int) -> dict:
+    # 年末は12/30まで、年始は1/5から（その曜日の収集日に合わせる）
+    wanted = {WEEKDAYS.index(w) for w in weekdays}
+    last = date(year, 12, 30)
+    while last.weekday() not in wanted:
+        last -= timedelta(days=1)
+    restart = date(year + 1, 1, 5)
+    while restart.weekday() not in wanted:
+        restart += timedelta(days=1)
+    return {"last_collection": last.isoformat(), "restart": restart.isoformat()}
+
+
+def build_schedule(spec: SynthSpec, edition: int) -> dict:
+    """
+    1つの版（年度）の収集日程。schedule_r7.yaml と同じ形の dict を返す。
+    市町・地区・ルールの形は seed と市町の番号だけで決まり、版が変わっても同じ（日付と例外だけが変わる）。
+    """
+    year = fiscal_year(edition)
+    area_groups = []
+    schedule_groups: dict[str, dict] = {}
+    links = []
+    exceptions = []
+
+    for m, city in enumerate(municipality_names(spec.municipalities)):
+        rnd = random.Random(f"{spec.seed}:{m}")
+        prefix = f"m{m:03d}"
+        monthly_weekday = rnd.choice(WEEKDAYS[:5])
+        wd = monthly_weekday.lower()
+        wd_ja = WEEKDAY_JA[monthly_weekday]
+
+        for g, members in enumerate(_split(rnd, area_names(rnd, city, spec.areas), spec.groups), start=1):
+            group_id = f"{prefix}_group_{g}"
+            area_groups.append({"id": group_id, "name": f"{city}地区グループ{g}", "areas": members})
+
+            burn = rnd.choice(BURN_DAYS)
+            burn_id = f"{prefix}_burn_{'_'.join(d.lower() for d in burn)}"
+            schedule_groups.setdefault(burn_id, {
+                "id": burn_id,
+                "category_id": "burnable",
+                "name": f"{city} 一般ごみ（{'・'.join(WEEKDAY_JA[d] for d in burn)}）",
+                "rule": {"type": "weekly", "weekdays": list(burn)},
+                "note": {"year_end": _year_end(burn, year)},
+            })
+            schedules = [{"category_id": "burnable", "schedule_id": burn_id}]
+
+            for category_id in MONTHLY:
+                nth = rnd.randint(1, 4)
+                sg_id = f"{prefix}_{category_id}_{ORDINAL[nth]}_{wd}"
+                schedule_groups.setdefault(sg_id, {
+                    "id": sg_id,
+                    "category_id": category_id,
+                    "name": f"{city} {CATEGORY_NAME[category_id]}（第{nth}{wd_ja}曜）",
+                    "rule": {"type": "monthly_nth_weekday", "nth": nth, "weekday": monthly_weekday},
+                })
+                schedules.append({"category_id": category_id, "schedule_id": sg_id})
+
+            first = rnd.randint(1, 2)
+            sg_id = f"{prefix}_plastic_{ORDINAL[first]}_{wd}_and_{ORDINAL[first + 2]}_{wd}"
+            schedule_groups.setdefault(sg_id, {
+                "id": sg_id,
+                "category_id": "plastic_container",
+                "name": f"{city} 容器包装プラスチック（第{first}・第{first + 2}{wd_ja}曜）",
+                "rule": {"type": "monthly_multiple_nth_weekday", "nth": [first, first + 2], "weekday": monthly_weekday},
+            })
+            schedules.append({"category_id": "plastic_container", "schedule_id": sg_id})
+            links.append({"area_group_id": group_id, "schedules": schedules})
+
+        # 例外は版ごとに変える（連休の休み・臨時収集）
+        erng = random.Random(f"{spec.seed}:{m}:{edition}")
+        burn_ids = sorted(k for k in schedule_groups if k.startswith(f"{prefix}_burn_"))
+        for i in range(spec.exceptions):
+            day = date(year, 4, 1) + timedelta(days=erng.randrange(365))
+            if i % 2 == 0:
+                exceptions.append({
+                    "type": "skip",
+                    "start": day.isoformat(),
+                    "end": (day + timedelta(days=erng.randint(0, 2))).isoformat(),
+                    "schedule_id": erng.choice(burn_ids),
+                })
+            else:
+                exceptions.append({"type": "add", "date": day.isoformat(), "schedule_id": erng.choice(burn_ids)})
+
+    return {
+        "effective_start": f"{year}-04-01",
+        "effective_end": f"{year + 1}-03-31",
+        "sources": {
+            "pdf": {
+                "title": f"合成データ {year}年度（r{edition}） {spec.municipalities}市町 seed={spec.seed}",
+                "file_path": f"synthetic/schedule_r{edition}.yaml",
+                "fetched_at": f"{year}-03-01",
+            }
+        },
+        "categories": [{"id": c, "name": n, "deadline_time": t} for c, n, t in CATEGORIES],
+        "area_groups": area_groups,
+        "exceptions": exceptions,
+        "schedule_groups": list(schedule_groups.values()),
+        "area_group_schedule_links": links,
+    }
+
+
+def build_items(spec: SynthSpec) -> list[tuple[str, str, str, int]]:
+    """
+    品目の行 (item_name, category, note, page)。名前は部品の組み合わせから重ならないように選び、辞典と同じく名前順に並べる。
+    """
+    sizes = (len(ITEM_LOOKS), len(ITEM_HEADS), len(ITEM_MATERIALS), len(ITEM_THINGS), len(ITEM_TAILS))
+    total = sizes[0] * sizes[1] * sizes[2] * sizes[3] * sizes[4]
+    # 組み合わせが足りないときは「（2）」「（3）」…を付けて周回する
+    laps = -(-spec.items * 2 // total)
+
+    rnd = random.Random(f"{spec.seed}:items")
+    rows: dict[str, tuple[str, str, str]] = {}
+    # 空の部品が重なると同じ名前になるので、多めに引いて重なりを捨てる
+    for n in rnd.sample(range(total * laps), min(total * laps, spec.items * 2)):
+        n, t = divmod(n, sizes[4])
+        n, k = divmod(n, sizes[3])
+        n, m = divmod(n, sizes[2])
+        n, h = divmod(n, sizes[1])
+        lap, look = divmod(n, sizes[0])
+        head, (material, material_category), (thing, thing_category), tail = (
+            ITEM_HEADS[h], ITEM_MATERIALS[m], ITEM_THINGS[k], ITEM_TAILS[t]
+        )
+        name = f"{ITEM_LOOKS[look]}{head}{material}{thing}{tail}{f'（{lap + 1}）' if lap else ''}"
+        if name in rows:
+            continue
+        if thing_category in FIXED_CATEGORIES:
+            category = thing_category
+        elif head == "大型" and thing_category != "燃えないごみ":
+            category = "燃える粗大ごみ"
+        else:
+            category = material_category or thing_category
+        notes = NOTES.get(category, ())
+        note = notes[rnd.randrange(len(notes))] if notes and rnd.random() < 0.5 else ""
+        rows[name] = (name, category, note)
+        if len(rows) == spec.items:
+            break
+
+    ordered = sorted(rows.values())
+    return [(name, category, note, i // ROWS_PER_PAGE + 1) for i, (name, category, note) in enumerate(ordered)]
+
+
+def write_dataset(spec: SynthSpec, out_dir: Path) -> tuple[list[Path], Path]:
+    """
+    out_dir に schedule_r*.yaml（版の数だけ）と品目の raw CSV を書く。前回の版のファイルは消してから書く。
+    """
+    import yaml  # 書き出すときだけ
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("schedule_r*.yaml"):
+        old.unlink()
+
+    schedules = []
+    for edition in range(spec.first_edition, spec.first_edition + spec.years):
+        path = out_dir / f"schedule_r{edition}.yaml"
+        with path.open("w", encoding="utf-8") as f:
+            yaml.safe_dump(build_schedule(spec, edition), f, allow_unicode=True, sort_keys=False, width=1000)
+        schedules.append(path)
+
+    items_csv = out_dir / ITEMS_CSV_NAME
+    with items_csv.open("w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["item_name", "category", "note", "page"])
+        w.writerows(build_items(spec))
+    return schedules, items_csv
+
+
+def seed_dataset(out_dir: Path, db: Path, *extra: str) -> float:
+    # seed_schedule に合成データを入れさせて、かかった秒数を返す
+    from backend.app.db import seed_schedule
+
+    t0 = time.perf_counter()
+    seed_schedule.main([
+        "--db", str(db),
+        "--schedule-dir", str(out_dir),
+        "--items-csv", str(out_dir / ITEMS_CSV_NAME),
+        "--no-export",
+        *extra,
+    ])
+    return time.perf_counter() - t0
+
+
+def main():
+    import argparse
+    import json
+    import sqlite3
+
+    p = argparse.ArgumentParser(description="負荷試験用の合成データ（収集日程YAML・品目CSV）")
+    p.add_argument("--out", type=Path, default=WORK_DIR, help="出力先ディレクトリ")
+    p.add_argument("--seed", type=int, default=0, help="乱数の種（同じ種なら同じファイル）")
+    p.add_argument("--municipalities", type=int, default=1, help="市町の数")
+    p.add_argument("--areas", type=int, default=41, help="市町ごとの地区数")
+    p.add_argument("--groups", type=int, default=4, help="市町ごとの地区グループ数")
+    p.add_argument("--years", type=int, default=1, help="版（年度）の数")
+    p.add_argument("--first-edition", type=int, default=7, help="最初の版（7 = r7 = 2025年度）")
+    p.add_argument("--items", type=int, default=1300, help="品目数")
+    p.add_argument("--exceptions", type=int, default=2, help="市町・版ごとの例外の数")
+    p.add_argument("--seed-db", action="store_true", help="作ったデータを --db にシードして時間を測る")
+    p.add_argument("--db", type=Path, help="シード先（既定: 出力先の nonoichi_waste.db。既存のファイルは消す）")
+    p.add_argument("--no-events", action="store_true", help="シード時に収集日を展開しない")
+    p.add_argument("--json", help="シードの計測結果をJSONで保存する")
+    args = p.parse_args()
+
+    spec = SynthSpec(
+        seed=args.seed,
+        municipalities=max(1, args.municipalities),
+        areas=max(1, args.areas),
+        groups=max(1, args.groups),
+        years=max(1, args.years),
+        first_edition=args.first_edition,
+        items=max(1, args.items),
+        exceptions=max(0, args.exceptions),
+    )
+    t0 = time.perf_counter()
+    schedules, items_csv = write_dataset(spec, args.out)
+    print(
+        f"✅ wrote {len(schedules)} schedule editions and {items_csv.name} to {args.out} "
+        f"({spec.municipalities} municipalities x {spec.areas} areas, {spec.items} items, "
+        f"{time.perf_counter() - t0:.1f}s)"
+    )
+    if not args.seed_db:
+        return
+
+    db = args.db or args.out / "nonoichi_waste.db"
+    for p_ in (db, db.with_name(db.name + "-wal"), db.with_name(db.name + "-shm")):
+        if p_.exists():
+            p_.unlink()
+    extra = ("--no-events",) if args.no_events else ()
+    full_s = seed_dataset(args.out, db, *extra)
+    # 2回目は差分なし（ハッシュだけ見て終わる）
+    again_s = seed_dataset(args.out, db, *extra)
+
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("sources", "areas", "area_groups", "schedule_groups", "collection_days", "next_pickup_days", "items")
+        }
+    finally:
+        conn.close()
+
+    result = {
+        "spec": spec.__dict__,
+        "db": str(db),
+        "db_bytes": db.stat().st_size,
+        "full_seed_s": round(full_s, 2),
+        "unchanged_seed_s": round(again_s, 2),
+        "counts": counts,
+    }
+    print(f"seed (full)     : {full_s:.2f}s")
+    print(f"seed (unchanged): {again_s:.2f}s")
+    print(f"db              : {db} ({db.stat().st_size // 1024} KB)")
+    print("rows            : " + ", ".join(f"{k} {v}" for k, v in counts.items()))
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"保存しました: {args.json}")
+    print("✅ 完了")
+
+
+if __name__ == "__main__":
+    main()
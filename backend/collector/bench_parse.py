@@ -0,0 +1,84 @@
+# /backend/collector/bench_parse.py
+# 表解析のベンチマークスクリプト
+# 実行 → 保存済みHTML（既定はリポジトリの fixtures/pages）を lxml版 / BeautifulSoup版 で解析し、時間・メモリ・結果の一致を表示
+#        クロール後のページキャッシュを測るなら --pages-dir backend/data/raw/cache
+
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(__file__))
+from collect_data import iter_table_rows_bs4, iter_table_rows_lxml
+from fixture_server import FIXTURE_DIR
+
+# ================
+# 計測
+# ================
+
+def load_pages(pages_dir: str) -> list[tuple[str, str]]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+def bench(parse, pages: list[tuple[str, str]], repeat: int) -> tuple[float, int, dict[str, list]]:
+    """
+    (1周あたりの秒数, tracemalloc のピークバイト数, ファイル名 -> 解析結果) を返す
+    ※ tracemalloc はPython側の確保のみ計測する（lxml のC側のツリーは含まれない）
+    """
+    results = {name: list(parse(html)) for name, html in pages}  # ウォームアップ兼結果取得
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for _, html in pages:
+            for _ in parse(html):
+                pass
+    elapsed = (time.perf_counter() - t0) / repeat
+
+    tracemalloc.start()
+    for _, html in pages:
+        list(parse(html))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, results
+
+# ================
+# メイン処理
+# ================
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="表解析（lxml / BeautifulSoup）のベンチマーク")
+    ap.add_argument("--pages-dir", default=FIXTURE_DIR, help="解析するHTMLのディレクトリ（既定: fixtures/pages）")
+    ap.add_argument("--repeat", type=int, default=50, help="計測の繰り返し回数")
+    args = ap.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        print(f"⚠️ HTMLがありません: {args.pages_dir}")
+        sys.exit(1)
+
+    total_rows = 0
+    stats = {}
+    for label, parse in (("lxml", iter_table_rows_lxml), ("bs4", iter_table_rows_bs4)):
+        elapsed, peak, results = bench(parse, pages, args.repeat)
+        stats[label] = (elapsed, peak, results)
+        total_rows = sum(len(r) for r in results.values())
+        print(f"{label:5s}: {elapsed * 1000:8.1f} ms / {len(pages)}ページ"
+              f"  ({elapsed / len(pages) * 1000:.2f} ms/ページ, ピーク {peak / 1024 / 1024:.1f} MiB)")
+
+    speedup = stats["bs4"][0] / stats["lxml"][0] if stats["lxml"][0] else float("inf")
+    print(f"速度比: {speedup:.1f}倍（{total_rows}行）")
+
+    mismatched = [name for name, _ in pages if stats["lxml"][2][name] != stats["bs4"][2][name]]
+    if mismatched:
+        print(f"⚠️ 解析結果が一致しないページ: {', '.join(mismatched)}")
+        sys.exit(1)
+    print("✅ 全ページで解析結果が一致しました")
+
+if __name__ == "__main__":
+    main()
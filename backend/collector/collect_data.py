@@ -1,20 +1,36 @@
 # /backend/collector/collect_data.py
 # 野々市市分別辞典データ収集スクリプト
-# -> data/raw/nonoichi_garbage.csv に保存
+# -> data/raw/nonoichi_garbage.csv に保存（--ingest でDBの items へ直接反映、--no-csv でCSV省略）
 
 import pandas as pd
 import requests
 import time
 import os
+import sys
 import random
 import re
+import json
+import hashlib
+import csv
+import threading
+from collections import deque
+from itertools import chain
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator
 from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 
 # 保存先の設定
 # os.path.dirname(__file__)は、このファイルが置かれているディレクトリを指す
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '../data/raw')
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'nonoichi_garbage.csv')
 FAILED_PAGES_FILE = os.path.join(OUTPUT_DIR, 'failed_pages.txt')
+# ページごとのレスポンスキャッシュ（ETag/Last-Modified と解析結果）と、中断再開用のチェックポイント
+CACHE_DIR = os.path.join(OUTPUT_DIR, 'cache')
+CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, 'crawl_state.json')
 
 # 野々市市の分別辞典URL(ベースURL)
 BASE_URL = "https://gb.hn-kouiki.jp/nonoichi"
@@ -32,17 +48,162 @@ HEADERS = {
 }
 
 EXPECTED_COLS = {"品　目", "分別種類"}
+ROW_COLUMNS = ["item_name", "category", "note"]
+
+# 1行 = (item_name, category, note)
+Row = tuple[str, str, str]
+
+# table.table.table-striped.table-hover と同じ条件のXPath
+TABLE_XPATH = (
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' table ')"
+    " and contains(concat(' ', normalize-space(@class), ' '), ' table-striped ')"
+    " and contains(concat(' ', normalize-space(@class), ' '), ' table-hover ')]"
+)
+
+# 並列取得の既定値（サーバーに優しく: 同時接続数と1秒あたりのリクエスト数の上限）
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = 2.0 # req/s
+MAX_CONSECUTIVE_ERRORS = 4
 
 # ================
 # ユーティリティ
 # ================
 
+class TokenBucket:
+    """
+    アクセス間隔の制御（トークンバケット）
+    rate: 1秒あたりに補充されるトークン数、burst: 貯められる上限
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        # トークンが1つ貯まるまで待ってから取り出す
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def atomic_write_json(obj, path: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+class PageCache:
+    """
+    URL+ページ番号ごとのディスクキャッシュ
+      <key>.html : 本文
+      <key>.json : ETag / Last-Modified / 解析済みの行
+    次回は If-None-Match / If-Modified-Since を付けて取りに行き、304なら解析済みの行をそのまま使う。
+    """
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, base_url: str, page_num: int, ext: str) -> str:
+        key = hashlib.sha1(f"{base_url}?page={page_num}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"page_{page_num:03d}_{key}.{ext}")
+
+    def load_meta(self, base_url: str, page_num: int) -> dict | None:
+        path = self._path(base_url, page_num, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_html(self, base_url: str, page_num: int) -> str | None:
+        path = self._path(base_url, page_num, "html")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def conditional_headers(self, base_url: str, page_num: int) -> dict:
+        meta = self.load_meta(base_url, page_num)
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load_rows(self, base_url: str, page_num: int) -> list[Row] | None:
+        meta = self.load_meta(base_url, page_num)
+        return None if meta is None else [tuple(r) for r in meta["rows"]]
+
+    def store(self, base_url: str, page_num: int, html: str, response_headers, rows: list[Row]) -> None:
+        with open(self._path(base_url, page_num, "html") + ".tmp", "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(self._path(base_url, page_num, "html") + ".tmp", self._path(base_url, page_num, "html"))
+        atomic_write_json(
+            {
+                "url": base_url,
+                "page": page_num,
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "fetched_at": datetime.now().isoformat(timespec="seconds"),
+                "rows": [list(r) for r in rows],
+            },
+            self._path(base_url, page_num, "json"),
+        )
+
+class CrawlCheckpoint:
+    """
+    中断再開用の進捗（解析まで終わったページ番号）。1ページ終わるごとに書き出す。
+    行データ自体は PageCache にあるので、ここにはページ番号だけ持つ。
+    """
+    def __init__(self, path: str = CHECKPOINT_FILE, base_url: str = BASE_URL, resume: bool = True):
+        self.path = path
+        self.base_url = base_url
+        self.done: set[int] = set()
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("base_url") == base_url:
+                self.done = set(state.get("done", []))
+
+    def mark_done(self, page_num: int) -> None:
+        self.done.add(page_num)
+        atomic_write_json({"base_url": self.base_url, "done": sorted(self.done)}, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
 def parse_total_pages(html: str) -> int | None:
     # HTML内の「全〇ページ/件数：〇件」から総ページ数を取得
     match = re.search(r"全\s*([0-9]+)\s*ページ", html)
     return int(match.group(1)) if match else None
 
-def fetch_page(session: requests.Session, page_num:int, max_retries:int=3) -> str:
+def fetch_page(
+    session: requests.Session,
+    page_num: int,
+    max_retries: int = 3,
+    base_url: str = BASE_URL,
+    bucket: TokenBucket | None = None,
+) -> str:
+    # HTML文字列を返す
+    return fetch_response(session, page_num, max_retries, base_url, bucket).text
+
+def fetch_response(
+    session: requests.Session,
+    page_num: int,
+    max_retries: int = 3,
+    base_url: str = BASE_URL,
+    bucket: TokenBucket | None = None,
+    headers: dict | None = None,
+) -> requests.Response:
     # BASE_URLにpage_num（START_PAGE）を渡す
     params = {"page": page_num}
     # 失敗原因を保存
@@ -50,12 +211,14 @@ def fetch_page(session: requests.Session, page_num:int, max_retries:int=3) -> st
 
     for attempt in range(1, max_retries + 1):
         try:
-            r = session.get(BASE_URL, params=params, timeout=10)
+            # リトライも含めて1リクエストごとにトークンを取る
+            if bucket is not None:
+                bucket.acquire()
+            r = session.get(base_url, params=params, headers=headers, timeout=10)
             # HTTP 4xx/5xxの時に発生
             r.raise_for_status()
-            # HTML文字列を返す
-            print(f" -> Page {page_num} 通信成功")
-            return r.text
+            print(f" -> Page {page_num} 通信成功" + (" (304 未更新)" if r.status_code == 304 else ""))
+            return r
         # ネットワーク/タイムアウト/4xx,5xxエラー
         except requests.exceptions.RequestException as e:
             last_err = e
@@ -64,14 +227,55 @@ def fetch_page(session: requests.Session, page_num:int, max_retries:int=3) -> st
             print(f" -> Attempt {attempt} failed: {e} - retrying...")
     raise last_err # 全リトライ失敗時
 
-def parse_table_rows(html:str) -> pd.DataFrame:
+def _text(strings: Iterable[str], sep: str) -> str:
+    # BeautifulSoup の get_text(sep, strip=True) と同じ結合
+    return sep.join(t.strip() for t in strings if t and t.strip())
+
+def _iter_strings(el) -> Iterator[str]:
+    # 要素内のテキストを文書順に（コメントは含めない）
+    if el.text:
+        yield el.text
+    for child in el:
+        if isinstance(child.tag, str):
+            yield from _iter_strings(child)
+        if child.tail:
+            yield child.tail
+
+def iter_table_rows_lxml(html: str) -> Iterator[Row]:
+    """
+    高速版: lxml の XPath で直接 (item_name, category, note) を1行ずつ返す。
+    BeautifulSoup 版（iter_table_rows_bs4）と同じ結果になるようにしている。
+    """
+    root = lxml.html.fromstring(html)
+    tables = root.xpath(TABLE_XPATH)
+    if not tables:
+        raise ValueError("target table not found")
+
+    for tr in tables[0].xpath(".//tbody//tr"):
+        tds = tr.xpath(".//td")
+        if len(tds) < 2:
+            continue
+
+        item = _text(_iter_strings(tds[0]), " ")
+        # category: 2つ目のtdの直下のテキスト（無ければtd全体）
+        direct = [tds[1].text] + [c.tail for c in tds[1]]
+        td_category = [t.strip() for t in direct if t and t.strip()]
+        category = td_category[0] if td_category else _text(_iter_strings(tds[1]), " ")
+
+        # note: divがあればテキスト化
+        div = tds[1].xpath(".//div")
+        note = _text(_iter_strings(div[0]), "\n") if div else ""
+
+        yield (item, category, note)
+
+def iter_table_rows_bs4(html: str) -> Iterator[Row]:
+    # 従来の BeautifulSoup 版（高速版で読めないページ用）
     soup = BeautifulSoup(html, "lxml")
 
     table = soup.select_one("table.table.table-striped.table-hover")
     if table is None:
         raise ValueError("target table not found")
 
-    rows = []
     for tr in table.select("tbody tr"):
         tds = tr.find_all("td")
         if len(tds) < 2:
@@ -86,14 +290,21 @@ def parse_table_rows(html:str) -> pd.DataFrame:
         div = tds[1].find("div")
         note = div.get_text("\n", strip=True) if div else ""
 
-        rows.append({
-            "item_name": item,
-            "category": category,
-            "note": note,
-        })
+        yield (item, category, note)
+
+def iter_table_rows(html: str) -> list[Row]:
+    """
+    表の行を (item_name, category, note) のリストで返す。
+    まず lxml 版で読み、lxml が読めなかった（解析・XPathのエラー、表が無い）ページだけ BeautifulSoup 版で読み直す。
+    """
+    try:
+        return list(iter_table_rows_lxml(html))
+    except (etree.ParserError, etree.ParseError, etree.XPathError, ValueError):
+        return list(iter_table_rows_bs4(html))
+
+def parse_table_rows(html:str) -> pd.DataFrame:
+    return pd.DataFrame(iter_table_rows(html), columns=ROW_COLUMNS)
 
-    return pd.DataFrame(rows)
-    
 def atomic_write_csv(df: pd.DataFrame, path: str, encoding: str = "utf-8-sig") -> None:
     """
     一時ファイルに書いてから置換する（途中で落ちてもCSVが壊れにくい）
@@ -102,98 +313,320 @@ def atomic_write_csv(df: pd.DataFrame, path: str, encoding: str = "utf-8-sig") -
     df.to_csv(tmp, index=False, encoding=encoding)
     os.replace(tmp, path)
 
+@contextmanager
+def open_rows_csv(path: str, encoding: str = "utf-8-sig"):
+    """
+    (item_name, category, note, page) を1行ずつ書くための csv.writer を返す（DataFrameを作らない）。
+    一時ファイルに書き、最後まで書けたときだけ置換する。
+    """
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding=encoding, newline="") as f:
+            w = csv.writer(f, lineterminator="\n")
+            w.writerow(ROW_COLUMNS + ["page"])
+            yield w
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def atomic_write_rows_csv(rows: Iterable[tuple], path: str, encoding: str = "utf-8-sig") -> int:
+    """
+    (item_name, category, note, page) を1行ずつCSVへ書く。書いた行数を返す。
+    """
+    count = 0
+    with open_rows_csv(path, encoding) as w:
+        for row in rows:
+            w.writerow(row)
+            count += 1
+    return count
+
+
+def ingest_rows(
+    rows: Iterable[Row],
+    prune: bool | Callable[[], bool] = True,
+    sha256: str | Callable[[], str] | None = None,
+) -> int:
+    """
+    取得した行をCSVを経由せずに items テーブルへ直接入れる（1トランザクション）。
+    カテゴリの除外・ID/正規化名の作成は seed_schedule と同じ処理を使う。反映した行数を返す。
+    prune=False のとき（取得失敗ページがあるとき）は、今回見つからなかった品目を消さない。
+    取得しながら流すときは prune と sha256 に関数を渡す（行を読み切ってから呼ぶ）。
+    """
+    # スクリプトとして実行されるので、リポジトリのルートを import パスに足してから読み込む
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    from backend.app.db.init_db import apply_schema
+    from backend.app.db import seed_schedule as seed
+
+    conn = seed.connect()
+    try:
+        apply_schema(conn)
+        if conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0] == 0:
+            raise RuntimeError("categories が空です。先に seed_schedule を実行してください")
+        with seed.bulk_load(conn, defer_indexes=False):
+            # items より先に source が要る（外部キー）。ハッシュが後で分かるときは読み切ってから入れ直す
+            seed.upsert_items_source(conn, None if callable(sha256) else sha256)
+            n = seed.seed_items_from_rows(conn, rows, seed.ITEMS_SOURCE_ID, prune=prune)
+            if callable(sha256):
+                seed.upsert_items_source(conn, sha256())
+            return n
+    finally:
+        conn.close()
+
+def load_page(
+    session: requests.Session,
+    page_num: int,
+    base_url: str = BASE_URL,
+    bucket: TokenBucket | None = None,
+    cache: PageCache | None = None,
+) -> tuple[str, list[Row]]:
+    """
+    1ページ取得して解析する。(HTML, 行のリスト) を返す。
+    cache があれば条件付きGETにし、304（未更新）なら保存済みの解析結果を使う（解析し直さない）。
+    """
+    headers = cache.conditional_headers(base_url, page_num) if cache else None
+    r = fetch_response(session, page_num, base_url=base_url, bucket=bucket, headers=headers)
+    if r.status_code == 304 and cache is not None:
+        rows = cache.load_rows(base_url, page_num)
+        html = cache.load_html(base_url, page_num)
+        if rows is not None and html is not None:
+            return html, rows
+        # キャッシュが欠けていたら普通に取り直す
+        r = fetch_response(session, page_num, base_url=base_url, bucket=bucket)
+
+    rows = iter_table_rows(r.text)
+    if cache is not None:
+        cache.store(base_url, page_num, r.text, r.headers, rows)
+    return r.text, rows
+
+def iter_pages(
+    pages: Iterable[int],
+    base_url: str = BASE_URL,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    cache: PageCache | None = None,
+    checkpoint: CrawlCheckpoint | None = None,
+    failed_pages: list[int] | None = None,
+) -> Iterator[tuple[int, list[Row]]]:
+    """
+    pages を並列に取得し、届いた順に解析して、(ページ番号, 行のリスト) をページ順に返す。
+    前のページが全部片付いた時点でそのページを返すので、手元に溜まるのは順番待ちのページだけ。
+    逐次版と同じく、連続エラーが多い／表が無い／データが空のページが出たらそれ以降は打ち切る。
+    checkpoint に済みとして記録されたページは取りに行かず、cache の解析結果を使う（中断からの再開）。
+    取得に失敗したページは failed_pages に足していく（読み切った後に見る）。
+    """
+    pages = sorted(pages)
+    if failed_pages is None:
+        failed_pages = []
+    bucket = TokenBucket(rate, burst=concurrency)
+    local = threading.local()
+    sessions: list[requests.Session] = []
+
+    def get_session() -> requests.Session:
+        # requests.Session はスレッド間で共有しない
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.headers.update(HEADERS)
+            sessions.append(local.session)
+        return local.session
+
+    def work(page_num: int) -> list[Row]:
+        _, rows = load_page(get_session(), page_num, base_url=base_url, bucket=bucket, cache=cache)
+        return rows
+
+    # 順番待ち: 片付いたが、前のページがまだのもの（None は返さないページ）
+    waiting = deque(pages)
+    settled: dict[int, list[Row] | None] = {}
+    stop_at: int | None = None # このページ以降は捨てる
+    error_count = 0
+
+    def ready() -> Iterator[tuple[int, list[Row]]]:
+        while waiting and waiting[0] in settled:
+            page_num = waiting.popleft()
+            rows = settled.pop(page_num)
+            if rows is not None and (stop_at is None or page_num < stop_at):
+                yield page_num, rows
+
+    # 前回の実行で済んでいるページ
+    if checkpoint is not None and cache is not None:
+        for page_num in pages:
+            rows = cache.load_rows(base_url, page_num) if page_num in checkpoint.done else None
+            if rows is not None:
+                settled[page_num] = rows
+        if settled:
+            print(f"チェックポイントから再開: {len(settled)} ページは取得済み")
+    todo = [p for p in pages if p not in settled]
+
+    def stop(page_num: int) -> None:
+        # page_num 以降はもう要らないので、まだ始まっていない取得を取り消す
+        nonlocal stop_at
+        stop_at = page_num if stop_at is None else min(stop_at, page_num)
+        for f, p in futures.items():
+            if p >= stop_at:
+                f.cancel()
+
+    try:
+        yield from ready()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(work, p): p for p in todo}
+            for fut in as_completed(futures):
+                page_num = futures[fut]
+                settled[page_num] = None
+                if fut.cancelled() or (stop_at is not None and page_num >= stop_at):
+                    yield from ready()
+                    continue
+                try:
+                    rows = fut.result()
+                    error_count = 0 # 成功したらリセット
+                except requests.exceptions.RequestException as e:
+                    failed_pages.append(page_num)
+                    print(f"[Page {page_num}] -> 取得失敗: {e}")
+                    error_count += 1
+                    if error_count >= MAX_CONSECUTIVE_ERRORS:
+                        print(" -> 連続エラーが多いため終了します。")
+                        stop(page_num + 1)
+                    yield from ready()
+                    continue
+                except ValueError:
+                    print(f"[Page {page_num}] -> 表データが見つかりません。HTML構造が想定外の可能性があるため以降は停止します。")
+                    failed_pages.append(page_num)
+                    stop(page_num)
+                    yield from ready()
+                    continue
+
+                # 終了判定
+                if len(rows) == 0:
+                    print(f"[Page {page_num}] -> データがありません。以降は終了します。")
+                    stop(page_num)
+                    yield from ready()
+                    continue
+
+                settled[page_num] = rows
+                print(f"[Page {page_num}] -> {len(rows)} 件のデータを見つけました。")
+                if checkpoint is not None:
+                    checkpoint.mark_done(page_num)
+                yield from ready()
+    finally:
+        for sess in sessions:
+            sess.close()
+
+def crawl_pages(
+    pages: list[int],
+    base_url: str = BASE_URL,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    cache: PageCache | None = None,
+    checkpoint: CrawlCheckpoint | None = None,
+) -> tuple[dict[int, list[Row]], list[int]]:
+    """
+    iter_pages を読み切って (ページ番号 -> 行のリスト, 取得失敗ページ) を返す。
+    """
+    failed_pages: list[int] = []
+    results = dict(iter_pages(pages, base_url, concurrency, rate, cache, checkpoint, failed_pages))
+    return results, sorted(failed_pages)
 
 # ================
 # メイン処理
 # ================
 
 def main():
-    print("=== データ収集を開始します (ページ番号順) ===")
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default=BASE_URL, help="取得元URL（ローカルのテスト用サーバーを指すこともできる）")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時接続数")
+    ap.add_argument("--rate", type=float, default=DEFAULT_RATE, help="1秒あたりの最大リクエスト数")
+    ap.add_argument("--output", default=OUTPUT_FILE, help="保存先CSV")
+    ap.add_argument("--ingest", action="store_true", help="取得した行をそのままDBの items に入れる")
+    ap.add_argument("--no-csv", action="store_true", help="CSVを書き出さない（--ingest と一緒に使う）")
+    ap.add_argument("--no-cache", action="store_true", help="キャッシュを使わず全ページ取り直す")
+    ap.add_argument("--restart", action="store_true", help="チェックポイントを無視して最初から取得する")
+    args = ap.parse_args()
+    if args.no_csv and not args.ingest:
+        ap.error("--no-csv は --ingest と一緒に使ってください")
+
+    print("=== データ収集を開始します (並列取得) ===")
     os.makedirs(OUTPUT_DIR, exist_ok = True)
 
-    all_data =[]
-    error_count = 0 # 連続エラーカウント
-    failed_pages = [] # 取得失敗ページリスト
+    failed_pages: list[int] = [] # 取得失敗ページリスト
+
+    cache = None if args.no_cache else PageCache()
+    checkpoint = None if args.no_cache else CrawlCheckpoint(base_url=args.base_url, resume=not args.restart)
 
     with requests.Session() as session:
         session.headers.update(HEADERS)
 
-        # 1ページ目を処理
+        # 1ページ目を処理（総ページ数を知るため先に1件だけ取る）
         try:
             # BASE_URLから総ページ数を取得する
             print(f"[Page {START_PAGE}] を取得中...")
-            html1 = fetch_page(session, START_PAGE)
+            # HTML文字列内の<table>タグから行を読み込む
+            html1, rows1 = load_page(session, START_PAGE, base_url=args.base_url, cache=cache)
             total_pages = parse_total_pages(html1) or MAX_PAGE
             print(f"総ページ数（推定/取得）: {total_pages}")
 
-            # HTML文字列内の<table>タグを表としてDataFrameに読み込む
-            df1 = parse_table_rows(html1)
-            if len(df1) == 0:
+            if len(rows1) == 0:
                 print("[Page 1]データがありません。終了します。")
                 return
-            all_data.append(df1.assign(page=START_PAGE))
-            print(f"[Page {START_PAGE}] -> {len(df1)} 件のデータを見つけました。")
+            print(f"[Page {START_PAGE}] -> {len(rows1)} 件のデータを見つけました。")
 
         except ValueError as e:
             print(f"[Page {START_PAGE}] -> 表データが見つかりません。終了します。")
-
-        # 2ページ目以降をループ処理
-        for page_num in range(START_PAGE + 1, total_pages + 1):
-            print(f"[Page {page_num}] を取得中...")
-
-            # アクセスマナー
-            time.sleep(1.0)
-
-            # 取得
-            try:
-                html = fetch_page(session, page_num)
-                error_count = 0 # 成功したらリセット
-            except requests.exceptions.RequestException as e:
-                failed_pages.append(page_num)
-                print(f"[Page {page_num}] -> 取得失敗: {e}")
-                error_count += 1
-                if error_count >= 4:
-                    print(" -> 連続エラーが多いため終了します。")
-                    break
-                else:
-                    continue
-            
-            # 解析
-            try:
-                df = parse_table_rows(html)
-            except ValueError as e:
-                print(f"[Page {page_num}] -> 表データが見つかりません。終了します。")
-                failed_pages.append(page_num)
-                print("HTML構造が想定外の可能性があるため停止します。")
-                break
-
-            # 終了判定
-            if len(df) == 0:
-                print(f"[Page {page_num}] -> データがありません。終了します。")
-                break
-
-            all_data.append(df.assign(page=page_num))
-            print(f"[Page {page_num}] -> {len(df)} 件のデータを見つけました。")
-
-        # 保存処理
-        if len(all_data) > 0:
-            print("\n=== 全データを結合しています ===")
-            final_df = pd.concat(all_data, ignore_index=True)
-            atomic_write_csv(final_df, OUTPUT_FILE)
-            print(f"保存完了！場所: {OUTPUT_FILE}")
-            print(f"データ総数: {len(final_df)} 件")
-
-            # 失敗ページを記録
-            if failed_pages:
-                with open(FAILED_PAGES_FILE, "w", encoding="utf-8") as f:
-                    for p in failed_pages:
-                        f.write(f"{p}\n")
-                print(f"取得失敗ページを保存しました: {FAILED_PAGES_FILE} (件数: {len(failed_pages)})")
-            # 先頭確認
-            print("先頭5件")        
-            print(final_df.head())
-        else:
-            print("取得したデータがありません。")
+            return
+
+    # 2ページ目以降を並列に取得し、ページ順に揃ったところからCSVとDBへ流す（全ページ分を溜めない）
+    pages = iter_pages(
+        range(START_PAGE + 1, total_pages + 1),
+        base_url=args.base_url,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        cache=cache,
+        checkpoint=checkpoint,
+        failed_pages=failed_pages,
+    )
+    digest = hashlib.sha256()
+    total = 0
+
+    def ordered_rows() -> Iterator[Row]:
+        # ページ順に1行ずつ流す。CSVは流しながら書き、読み切った時点で置き換える（DB側で失敗してもCSVは残る）
+        nonlocal total
+        with nullcontext() if args.no_csv else open_rows_csv(args.output) as writer:
+            for page_num, rows in chain([(START_PAGE, rows1)], pages):
+                for row in rows:
+                    if writer is not None:
+                        writer.writerow(row + (page_num,))
+                    digest.update(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+                    total += 1
+                    yield row
+
+    if args.ingest:
+        print("\n=== 取得しながらDBへ直接反映しています ===")
+        # 取得失敗ページがあるときは、見つからなかった品目を消さない（読み切った後に決める）
+        n = ingest_rows(ordered_rows(), prune=lambda: not failed_pages, sha256=digest.hexdigest)
+        print(f"✅ DBへ反映しました: {n} 件")
+    else:
+        print("\n=== 取得しながらCSVへ書き出しています ===")
+        for _ in ordered_rows():
+            pass
+    if not args.no_csv:
+        print(f"保存完了！場所: {args.output}")
+    print(f"データ総数: {total} 件")
+
+    # 失敗ページを記録
+    if failed_pages:
+        with open(FAILED_PAGES_FILE, "w", encoding="utf-8") as f:
+            for p in sorted(failed_pages):
+                f.write(f"{p}\n")
+        print(f"取得失敗ページを保存しました: {FAILED_PAGES_FILE} (件数: {len(failed_pages)})")
+    elif checkpoint is not None:
+        # 全ページ取れたので次回は最初から（失敗があれば残して、次回は失敗分だけ取りに行く）
+        checkpoint.clear()
+    # 先頭確認
+    print("先頭5件")
+    for row in rows1[:5]:
+        print(row)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
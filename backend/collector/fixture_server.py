@@ -0,0 +1,153 @@
+# /backend/collector/fixture_server.py
+# 分別辞典サイトの代わりに fixtures/pages の保存済みHTMLを返すローカルHTTPサーバー（テスト・ベンチ用）
+# 実行 → python backend/collector/fixture_server.py --port 8765
+#        python backend/collector/collect_data.py --base-url http://127.0.0.1:8765/nonoichi
+
+import hashlib
+import os
+import re
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# page_001.html, page_002.html ... （?page=N に対応）
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "pages")
+PAGE_FILE_RE = re.compile(r"page_(\d+)\.html$")
+
+# ================
+# サーバー
+# ================
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            page_num = int(query.get("page", ["1"])[0])
+        except ValueError:
+            page_num = -1
+        path = os.path.join(self.server.pages_dir, f"page_{page_num:03d}.html")
+        if not os.path.exists(path):
+            self.server.record(page_num, 404, self.headers)
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        with open(path, "rb") as f:
+            body = f.read()
+        # 本文が変われば ETag も変わる（書き換えたページだけ 200 で返る）
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        last_modified = formatdate(os.stat(path).st_mtime, usegmt=True)
+
+        if self.headers.get("If-None-Match") == etag:
+            self.server.record(page_num, 304, self.headers)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.server.record(page_num, 200, self.headers)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, pages_dir: str):
+        super().__init__(address, _Handler)
+        self.pages_dir = pages_dir
+        self.requests: list[tuple[int, int, str | None]] = []
+        self.lock = threading.Lock()
+
+    def record(self, page_num: int, status: int, headers) -> None:
+        with self.lock:
+            self.requests.append((page_num, status, headers.get("If-None-Match")))
+
+class FixtureServer:
+    """
+    fixtures/pages のHTMLを ?page=N で返すサーバーを別スレッドで動かす。
+      with FixtureServer() as server:
+          crawl_pages([1, 2, 3], base_url=server.base_url)
+    ETag / Last-Modified を付けて返し、If-None-Match が一致すれば 304 を返す。
+    受けたリクエストは (ページ番号, ステータス, If-None-Match) で requests に残る。
+    """
+    def __init__(self, pages_dir: str = FIXTURE_DIR, host: str = "127.0.0.1", port: int = 0):
+        self.pages_dir = pages_dir
+        self._server = _Server((host, port), pages_dir)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/nonoichi"
+
+    @property
+    def requests(self) -> list[tuple[int, int, str | None]]:
+        with self._server.lock:
+            return list(self._server.requests)
+
+    def clear(self) -> None:
+        with self._server.lock:
+            self._server.requests.clear()
+
+    def page_numbers(self) -> list[int]:
+        return sorted(
+            int(m.group(1)) for name in os.listdir(self.pages_dir) if (m := PAGE_FILE_RE.match(name))
+        )
+
+    def serve_forever(self) -> None:
+        # 前面で動かす（コマンドラインから）
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+# ================
+# メイン処理
+# ================
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="保存済みHTMLを返すローカルサーバー（collect_data.py の --base-url 用）")
+    ap.add_argument("--pages-dir", default=FIXTURE_DIR, help="page_NNN.html を置いたディレクトリ")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    server = FixtureServer(args.pages_dir, args.host, args.port)
+    print(f"✅ {len(server.page_numbers())} ページを配信します: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import shutil
+
+import pytest
+
+from backend.app.db import seed_schedule
+
+
+@pytest.fixture(scope="session")
+def seeded_db_template(tmp_path_factory):
+    # seed_schedule で作りたてのDB（一度だけ作り、テストごとにコピーして使う）
+    path = tmp_path_factory.mktemp("seed") / "nonoichi_waste.db"
+    seed_schedule.main(["--db", str(path), "--no-export"])
+    return path
+
+
+@pytest.fixture
+def seeded_db(seeded_db_template, tmp_path):
+    path = tmp_path / "nonoichi_waste.db"
+    shutil.copy(seeded_db_template, path)
+    return path
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import os
+import shutil
+
+import pytest
+from lxml import etree
+
+from backend.collector import collect_data
+from backend.collector.collect_data import (
+    CrawlCheckpoint,
+    PageCache,
+    crawl_pages,
+    iter_pages,
+    iter_table_rows,
+    iter_table_rows_bs4,
+)
+from backend.collector.fixture_server import FIXTURE_DIR, FixtureServer
+
+PAGES = [1, 2, 3]
+
+
+def expected_rows(pages_dir: str = FIXTURE_DIR) -> dict[int, list[tuple[str, str, str]]]:
+    # 期待値は BeautifulSoup 版で直接読んだもの（クローラは lxml 版で読む）
+    out = {}
+    for p in PAGES:
+        with open(os.path.join(pages_dir, f"page_{p:03d}.html"), encoding="utf-8") as f:
+            out[p] = list(iter_table_rows_bs4(f.read()))
+    return out
+
+
+def statuses(server: FixtureServer) -> dict[int, int]:
+    return {page: status for page, status, _ in server.requests}
+
+
+@pytest.fixture
+def server():
+    with FixtureServer() as s:
+        yield s
+
+
+def test_crawl_parses_every_fixture_page(server):
+    results, failed = crawl_pages(PAGES, base_url=server.base_url, concurrency=3, rate=100)
+    assert failed == []
+    assert results == expected_rows()
+    assert all(len(rows) > 0 for rows in results.values())
+    assert statuses(server) == {1: 200, 2: 200, 3: 200}
+
+
+def test_second_crawl_revalidates_with_etag_and_reuses_parsed_rows(server, tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path / "cache"))
+    first, _ = crawl_pages(PAGES, base_url=server.base_url, rate=100, cache=cache)
+    server.clear()
+
+    # 304 のページは解析し直さない
+    def no_parse(html):
+        raise AssertionError("a 304 page was parsed again")
+
+    monkeypatch.setattr(collect_data, "iter_table_rows", no_parse)
+    second, failed = crawl_pages(PAGES, base_url=server.base_url, rate=100, cache=cache)
+    assert failed == []
+    assert second == first
+    assert statuses(server) == {1: 304, 2: 304, 3: 304}
+    assert all(etag for _, _, etag in server.requests)
+
+
+def test_changed_page_is_fetched_again(tmp_path):
+    pages_dir = tmp_path / "pages"
+    shutil.copytree(FIXTURE_DIR, pages_dir)
+    cache = PageCache(str(tmp_path / "cache"))
+    with FixtureServer(str(pages_dir)) as server:
+        crawl_pages(PAGES, base_url=server.base_url, rate=100, cache=cache)
+        server.clear()
+
+        page2 = pages_dir / "page_002.html"
+        page2.write_text(page2.read_text(encoding="utf-8").replace("燃えないごみ", "一般ごみ"), encoding="utf-8")
+        results, failed = crawl_pages(PAGES, base_url=server.base_url, rate=100, cache=cache)
+
+    assert failed == []
+    assert statuses(server) == {1: 304, 2: 200, 3: 304}
+    assert results == expected_rows(str(pages_dir))
+    assert cache.load_rows(server.base_url, 2) == results[2]
+
+
+def test_checkpoint_skips_pages_done_in_a_previous_run(server, tmp_path):
+    cache = PageCache(str(tmp_path / "cache"))
+    state = str(tmp_path / "crawl_state.json")
+    crawl_pages([1, 2], base_url=server.base_url, rate=100, cache=cache,
+                checkpoint=CrawlCheckpoint(state, base_url=server.base_url))
+    server.clear()
+
+    resumed = CrawlCheckpoint(state, base_url=server.base_url)
+    assert resumed.done == {1, 2}
+    results, failed = crawl_pages(PAGES, base_url=server.base_url, rate=100, cache=cache, checkpoint=resumed)
+    assert failed == []
+    assert results == expected_rows()
+    assert statuses(server) == {3: 200}
+
+
+def test_iter_pages_yields_in_page_order(server):
+    failed = []
+    pages = list(iter_pages(reversed(PAGES), base_url=server.base_url, concurrency=3, rate=100, failed_pages=failed))
+    assert [p for p, _ in pages] == PAGES
+    assert dict(pages) == expected_rows()
+    assert failed == []
+
+
+def test_bs4_fallback_only_covers_lxml_parse_errors(monkeypatch):
+    with open(os.path.join(FIXTURE_DIR, "page_001.html"), encoding="utf-8") as f:
+        html = f.read()
+
+    def unparsable(html):
+        raise etree.ParserError("Document is empty")
+
+    monkeypatch.setattr(collect_data, "iter_table_rows_lxml", unparsable)
+    assert iter_table_rows(html) == list(iter_table_rows_bs4(html))
+
+    # lxml 版のバグは BeautifulSoup 版で読み直して隠さない
+    def broken(html):
+        raise TypeError("bug in the lxml reader")
+
+    monkeypatch.setattr(collect_data, "iter_table_rows_lxml", broken)
+    with pytest.raises(TypeError):
+        iter_table_rows(html)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+
+import pytest
+
+from backend.app.db.init_db import DB_PATH, SCHEMA_PATH, _sql_shape, apply_schema, missing_schema, schema_indexes
+
+# 整数キーを足す前の形（文字の主キー、collection_events / next_pickups が表）
+LEGACY_SCHEMA = """
+CREATE TABLE sources (
+    source_id   TEXT PRIMARY KEY,
+    source_type TEXT NOT NULL,
+    title       TEXT NOT NULL,
+    url         TEXT,
+    file_path   TEXT,
+    fetched_at  TEXT,
+    sha256      TEXT
+);
+CREATE TABLE categories (
+    category_id           TEXT PRIMARY KEY,
+    name                  TEXT NOT NULL UNIQUE,
+    deadline_time         TEXT,
+    disposal_instructions TEXT,
+    source_id             TEXT,
+    updated_at            TEXT,
+    FOREIGN KEY(source_id) REFERENCES sources(source_id)
+);
+CREATE TABLE areas (
+    area_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    note TEXT,
+    source_id TEXT,
+    updated_at TEXT,
+    FOREIGN KEY(source_id) REFERENCES sources(source_id)
+);
+CREATE TABLE collection_events (
+  event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  area_id  TEXT NOT NULL,
+  category_id TEXT NOT NULL,
+  collection_date TEXT NOT NULL,
+  deadline_time   TEXT,
+  note      TEXT,
+  source_id TEXT,
+  UNIQUE(area_id, category_id, collection_date),
+  FOREIGN KEY(area_id) REFERENCES areas(area_id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(category_id) ON DELETE CASCADE,
+  FOREIGN KEY(source_id) REFERENCES sources(source_id)
+);
+CREATE TABLE next_pickups (
+  area_id  TEXT NOT NULL,
+  category_id TEXT NOT NULL,
+  day      TEXT NOT NULL,
+  collection_date TEXT NOT NULL,
+  deadline_time   TEXT,
+  PRIMARY KEY (area_id, category_id, day)
+) WITHOUT ROWID;
+CREATE TABLE items (
+  item_id   TEXT PRIMARY KEY,
+  name      TEXT NOT NULL,
+  name_norm TEXT NOT NULL UNIQUE,
+  category_id TEXT NOT NULL,
+  note      TEXT,
+  source_id TEXT,
+  source_url TEXT,
+  fetched_at TEXT,
+  updated_at TEXT,
+  FOREIGN KEY(category_id) REFERENCES categories(category_id),
+  FOREIGN KEY(source_id) REFERENCES sources(source_id)
+);
+CREATE INDEX idx_events_area_date ON collection_events(area_id, collection_date);
+
+INSERT INTO sources(source_id, source_type, title) VALUES ('src_pdf_r7', 'pdf', 'R7'), ('src_web', 'web', '辞典');
+INSERT INTO categories(category_id, name, deadline_time) VALUES ('burnable', '一般ごみ', '07:00'), ('plastic', 'プラ', '07:30');
+INSERT INTO areas(area_id, name) VALUES ('a1', '本町１丁目'), ('a2', '本町２丁目');
+INSERT INTO items(item_id, name, name_norm, category_id, source_id) VALUES ('i1', 'アイロン', 'アイロン', 'burnable', 'src_web');
+INSERT INTO collection_events(area_id, category_id, collection_date, deadline_time, note, source_id) VALUES
+  ('a1', 'burnable', '2025-04-03', '07:00', NULL, 'src_pdf_r7'),
+  ('a1', 'burnable', '2025-04-07', '07:00', '振替', 'src_pdf_r7'),
+  ('a2', 'plastic',  '2025-04-09', '07:30', NULL, 'src_pdf_r7');
+INSERT INTO next_pickups(area_id, category_id, day, collection_date, deadline_time) VALUES
+  ('a1', 'burnable', '2025-04-04', '2025-04-07', '07:00');
+"""
+
+EVENTS_SQL = """
+SELECT area_id, category_id, collection_date, deadline_time, note, source_id
+FROM collection_events ORDER BY area_id, collection_date
+"""
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("PRAGMA foreign_keys = ON")
+    yield conn
+    conn.close()
+
+
+def object_type(conn: sqlite3.Connection, name: str) -> str | None:
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def test_apply_schema_moves_legacy_tables_to_integer_tables(legacy_db):
+    before = legacy_db.execute(EVENTS_SQL).fetchall()
+    apply_schema(legacy_db)
+
+    # 文字の表はビューになり、中身は整数の表に移っている
+    assert object_type(legacy_db, "collection_events") == "view"
+    assert object_type(legacy_db, "next_pickups") == "view"
+    assert object_type(legacy_db, "legacy_collection_events") is None
+    assert object_type(legacy_db, "legacy_next_pickups") is None
+    assert legacy_db.execute("SELECT COUNT(*) FROM collection_days").fetchone()[0] == 3
+    assert legacy_db.execute(EVENTS_SQL).fetchall() == before
+    assert legacy_db.execute(
+        "SELECT area_id, category_id, day, collection_date, deadline_time FROM next_pickups"
+    ).fetchall() == [("a1", "burnable", "2025-04-04", "2025-04-07", "07:00")]
+
+    # 整数キーは元の行の順
+    assert legacy_db.execute("SELECT area_id, area_no FROM areas ORDER BY area_no").fetchall() == [("a1", 1), ("a2", 2)]
+    assert legacy_db.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_apply_schema_adds_columns_and_is_idempotent(legacy_db):
+    apply_schema(legacy_db)
+    apply_schema(legacy_db)
+    columns = {row[1] for row in legacy_db.execute("PRAGMA table_info(items)")}
+    assert "name_key" in columns
+    assert {row[1] for row in legacy_db.execute("PRAGMA table_info(sources)")} >= {"effective_start", "effective_end"}
+    assert legacy_db.execute("SELECT COUNT(*) FROM collection_days").fetchone()[0] == 3
+
+
+def test_view_trigger_writes_through_to_collection_days(legacy_db):
+    apply_schema(legacy_db)
+    legacy_db.execute(
+        "INSERT INTO collection_events(area_id, category_id, collection_date, deadline_time, note, source_id) "
+        "VALUES ('a2', 'plastic', '2025-04-23', '07:30', '追加', 'src_pdf_r7')"
+    )
+    assert legacy_db.execute(
+        "SELECT deadline_time, note FROM collection_events WHERE area_id = 'a2' AND collection_date = '2025-04-23'"
+    ).fetchone() == ("07:30", "追加")
+    assert legacy_db.execute("SELECT COUNT(*) FROM collection_days").fetchone()[0] == 4
+
+
+def test_missing_schema_reports_legacy_db_until_migrated(legacy_db):
+    missing = missing_schema(legacy_db)
+    assert "collection_days" in missing
+    assert "areas.area_no" in missing
+    apply_schema(legacy_db)
+    assert missing_schema(legacy_db) == []
+
+
+def test_shipped_db_has_the_current_schema():
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        assert missing_schema(conn) == []
+    finally:
+        conn.close()
+
+
+def test_apply_schema_rebuilds_indexes_whose_columns_changed(seeded_db):
+    name, wanted = next(iter(schema_indexes(SCHEMA_PATH.read_text(encoding="utf-8")).items()))
+    table = re.search(r"\bON\s+(\w+)", wanted).group(1)
+    conn = sqlite3.connect(str(seeded_db))
+    try:
+        # 以前の版で同じ名前の索引を別の列に張っていた、とする
+        column = conn.execute(f"PRAGMA table_info({table})").fetchall()[-1][1]
+        conn.execute(f"DROP INDEX {name}")
+        conn.execute(f"CREATE INDEX {name} ON {table}({column})")
+        apply_schema(conn)
+        apply_schema(conn)
+        current = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone()[0]
+        assert _sql_shape(current) == _sql_shape(wanted)
+    finally:
+        conn.close()
+
+
+def test_apply_schema_recreates_views_whose_definition_changed(seeded_db):
+    conn = sqlite3.connect(str(seeded_db))
+    try:
+        # event_id を足す前のビュー（トリガーも一緒に消える）
+        conn.execute("DROP VIEW collection_events")
+        conn.execute(
+            "CREATE VIEW collection_events AS SELECT d.area_no, d.category_no, d.day FROM collection_days d"
+        )
+        apply_schema(conn)
+        apply_schema(conn)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(collection_events)")]
+        assert columns[:2] == ["event_id", "area_id"]
+        count, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT event_id) FROM collection_events").fetchone()
+        assert count == distinct > 0
+        # トリガーも作り直されている
+        area_id, category_id = conn.execute("SELECT area_id, category_id FROM collection_events LIMIT 1").fetchone()
+        conn.execute(
+            "INSERT INTO collection_events(area_id, category_id, collection_date) VALUES (?, ?, '2030-01-01')",
+            (area_id, category_id),
+        )
+        assert conn.execute(
+            "SELECT COUNT(*) FROM collection_events WHERE collection_date = '2030-01-01'"
+        ).fetchone()[0] == 1
+    finally:
+        conn.close()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pytest
+
+from backend.app.kana import fold_long_vowels, reading_key, romaji_to_katakana
+
+
+@pytest.mark.parametrize(
+    "spellings",
+    [
+        ["カーペット", "かーぺっと", "kaapetto", "ka-petto", "ｶｰﾍﾟｯﾄ"],
+        ["コーヒー", "こーひー", "koohii", "KOOHII"],
+        ["テレビ", "てれび", "terebi", "ﾃﾚﾋﾞ"],
+        ["ティッシュ", "てぃっしゅ", "tisshu"],
+        ["ペット・ボトル", "ペットボトル", "ぺっと ぼとる"],
+    ],
+)
+def test_spellings_share_a_reading_key(spellings):
+    keys = {reading_key(s) for s in spellings}
+    assert len(keys) == 1, keys
+
+
+@pytest.mark.parametrize(
+    "word, kana",
+    [
+        ("konnichiwa", "コンニチワ"),
+        ("kinniku", "キンニク"),
+        ("onna", "オンナ"),
+        ("shinnyuu", "シンニュウ"),
+        ("hon", "ホン"),
+        ("honn", "ホン"),
+        ("kinnkyuu", "キンキュウ"),
+        ("hanbaagu", "ハンバアグ"),
+    ],
+)
+def test_romaji_n(word, kana):
+    assert romaji_to_katakana(word) == kana
+
+
+def test_different_words_keep_different_keys():
+    assert reading_key("かさ") != reading_key("かさい")
+    assert reading_key("いす") != reading_key("いし")
+
+
+def test_romaji_can_be_turned_off():
+    assert reading_key("terebi", romaji=False) == "terebi"
+
+
+def test_fold_long_vowels_keeps_vowels_after_a_different_sound():
+    assert fold_long_vowels("カアペット") == "カペット"
+    assert fold_long_vowels("コオヒイ") == "コヒ"
+    # 母音が違えば落とさない（カイ・アイ）
+    assert fold_long_vowels("カイ") == "カイ"
+    assert fold_long_vowels("アイ") == "アイ"
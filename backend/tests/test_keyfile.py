@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import sqlite3
+
+from backend.app.db.snapshot import snapshot_fingerprint
+from backend.app.keyfile import MappedItemIndex, keyfile_for, write_keyfile
+from backend.app.query import ItemIndex, forget_item_index, get_item_index
+
+
+def write_keys(db) -> None:
+    conn = sqlite3.connect(str(db))
+    try:
+        write_keyfile(ItemIndex.load(conn), keyfile_for(db), snapshot_fingerprint(conn))
+    finally:
+        conn.close()
+
+
+def test_keyfile_is_used_when_it_matches_the_db(seeded_db):
+    write_keys(seeded_db)
+    conn = sqlite3.connect(str(seeded_db))
+    try:
+        index = get_item_index(conn)
+        assert isinstance(index, MappedItemIndex)
+        assert index.lookup("アイロン") == ItemIndex.load(conn).lookup("アイロン")
+    finally:
+        forget_item_index(str(seeded_db))
+        conn.close()
+
+
+def test_stale_keyfile_is_ignored(seeded_db):
+    write_keys(seeded_db)
+    # キーファイルを書いた後にDBだけ作り直した、とする
+    conn = sqlite3.connect(str(seeded_db))
+    try:
+        conn.execute("UPDATE sources SET fetched_at = 'later'")
+        conn.commit()
+        assert isinstance(get_item_index(conn), ItemIndex)
+    finally:
+        forget_item_index(str(seeded_db))
+        conn.close()
+
+
+def test_old_format_keyfile_is_ignored(seeded_db):
+    keyfile_for(seeded_db).write_bytes(b"NWKEYS1\0" + b"\0" * 64)
+    conn = sqlite3.connect(str(seeded_db))
+    try:
+        assert isinstance(get_item_index(conn), ItemIndex)
+    finally:
+        forget_item_index(str(seeded_db))
+        conn.close()
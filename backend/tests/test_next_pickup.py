@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+from backend.app.next_pickup import next_pickup, next_pickups_bulk
+from backend.app.virtual_events import ENV_OPEN_ENDED, VirtualSchedule
+
+AREA = "あすなろ団地"
+# 同梱の日程（R7）は 2026-03-31 まで
+AFTER_LAST_EDITION = "2026-05-01T06:00"
+
+
+@pytest.fixture
+def conn(seeded_db):
+    conn = sqlite3.connect(str(seeded_db))
+    yield conn
+    conn.close()
+
+
+def test_no_pickup_after_the_last_edition_by_default(conn, monkeypatch):
+    monkeypatch.delenv(ENV_OPEN_ENDED, raising=False)
+    assert next_pickup(conn, AREA, "一般ごみ", now="2026-03-30T09:00").collection_date == "2026-03-31"
+    assert next_pickup(conn, AREA, "一般ごみ", now=AFTER_LAST_EDITION) is None
+
+
+def test_open_ended_extends_the_last_edition(conn, monkeypatch):
+    monkeypatch.setenv(ENV_OPEN_ENDED, "1")
+    # 展開済みの範囲は表から、過ぎた日はルールから
+    assert next_pickup(conn, AREA, "一般ごみ", now="2026-03-30T09:00").collection_date == "2026-03-31"
+    assert next_pickup(conn, AREA, "一般ごみ", now=AFTER_LAST_EDITION).collection_date == "2026-05-01"
+    bulk = next_pickups_bulk(conn, AREA, ["一般ごみ", "燃えないごみ", None], now=AFTER_LAST_EDITION)
+    assert [p.collection_date if p else None for p in bulk] == ["2026-05-01", "2026-05-13", None]
+
+
+@pytest.mark.parametrize("source_id, skipped", [("src_pdf_r7", True), ("src_pdf_r8", False)])
+def test_exceptions_only_apply_to_their_own_edition(conn, source_id, skipped):
+    # 3/31 を休みにする例外。R7 の例外なら効き、別の版（R8）の例外は R7 の日程には効かない
+    conn.execute("INSERT OR IGNORE INTO sources(source_id, source_type, title) VALUES ('src_pdf_r8', 'pdf', 'R8')")
+    conn.execute(
+        "INSERT INTO schedule_exceptions(kind, start_date, end_date, source_id) VALUES ('skip', '2026-03-31', '2026-03-31', ?)",
+        (source_id,),
+    )
+    found = VirtualSchedule.load(conn).next_event(AREA, "一般ごみ", date(2026, 3, 30))
+    if skipped:
+        assert found is None   # R7 は 3/31 で終わる
+    else:
+        assert found[0] == date(2026, 3, 31)
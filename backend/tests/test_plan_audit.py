@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import pytest
+
+from backend.app.db.plan_audit import audit, prepare_db
+from backend.app.pool import connect_readonly
+
+
+@pytest.mark.parametrize("mode", ["as-is", "schema", "snapshot"])
+def test_runtime_sql_has_no_full_scans(seeded_db, tmp_path, mode):
+    db = prepare_db(seeded_db, tmp_path, mode)
+    conn = connect_readonly(db)
+    try:
+        statements = audit(conn)
+    finally:
+        conn.close()
+    assert any(st.phase == "request" for st in statements)
+    errors = [(st.callers, f.detail) for st in statements for f in st.findings if f.level == "error"]
+    assert errors == []
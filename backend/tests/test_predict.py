@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import api
+from backend.app.inference import STUB_MODEL, Predictor, StubModel, register_stub_labels, synthetic_jpegs
+from backend.app.phash_cache import PHashCache
+
+
+@pytest.fixture
+def serve_db(seeded_db, monkeypatch):
+    for name in (api.ENV_MODEL, api.ENV_INFER_WORKERS, api.ENV_SNAPSHOTS, api.ENV_IMMUTABLE):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv(api.ENV_DB, str(seeded_db))
+    return seeded_db
+
+
+def test_predict_is_disabled_without_a_model(serve_db):
+    with TestClient(api.app) as client:
+        res = client.post("/predict", files={"file": ("a.jpg", synthetic_jpegs(1)[0], "image/jpeg")})
+    assert res.status_code == 503
+
+
+def test_infer_workers_without_a_model_refuses_to_start(serve_db, monkeypatch):
+    monkeypatch.setenv(api.ENV_INFER_WORKERS, "2")
+    with pytest.raises(RuntimeError, match=api.ENV_MODEL):
+        with TestClient(api.app):
+            pass
+
+
+def test_cached_prediction_uses_the_reloaded_label_map(seeded_db):
+    conn = sqlite3.connect(str(seeded_db))
+    register_stub_labels(conn)
+    image = synthetic_jpegs(1)[0]
+
+    async def run():
+        predictor = Predictor(STUB_MODEL, cache=PHashCache())
+        await predictor.start(conn)
+        try:
+            first = await predictor.predict(image)
+            # 新しい版ではこのラベルを別の区分に割り当てた、とする
+            other = conn.execute(
+                "SELECT category_id FROM categories WHERE category_id <> ? ORDER BY category_id LIMIT 1",
+                (first.target.target_id,),
+            ).fetchone()[0]
+            conn.execute(
+                "UPDATE model_label_maps SET target_id = ? WHERE model_version = ? AND label_index = ?",
+                (other, StubModel.version, first.label_index),
+            )
+            conn.commit()
+            predictor.label_map = predictor.read_label_map(conn)
+            return first, await predictor.predict(image), other
+        finally:
+            await predictor.close()
+
+    try:
+        first, second, other = asyncio.run(run())
+    finally:
+        conn.close()
+    assert not first.cached
+    assert second.cached
+    assert second.target.target_id == other
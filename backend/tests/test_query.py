@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from backend.app.kana import reading_key
+from backend.app.keyfile import MappedItemIndex, write_keyfile
+from backend.app.query import ItemIndex
+from backend.app.textnorm import normalize_text
+
+
+@pytest.fixture
+def conn(seeded_db):
+    conn = sqlite3.connect(str(seeded_db))
+    # 長音を畳むと同じ読みキーになる2品目（ビール / ビル）と、キーが1品目だけのもの
+    category_id = conn.execute("SELECT category_id FROM categories ORDER BY category_id LIMIT 1").fetchone()[0]
+    for item_id, name in [("t_beer", "ビール"), ("t_bill", "ビル"), ("t_kettle", "ケトル")]:
+        conn.execute(
+            "INSERT INTO items(item_id, name, name_norm, name_key, category_id) VALUES (?, ?, ?, ?, ?)",
+            (item_id, name, normalize_text(name), reading_key(name), category_id),
+        )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(params=["memory", "keyfile"])
+def index(request, conn, tmp_path):
+    index = ItemIndex.load(conn)
+    if request.param == "memory":
+        yield index
+        return
+    mapped = MappedItemIndex(write_keyfile(index, tmp_path / "items.keys", "0" * 64))
+    yield mapped
+    mapped.close()
+
+
+def test_reading_key_shared_by_two_items_is_not_a_definite_hit(index):
+    assert reading_key("ビール") == reading_key("ビル")
+    # 表記どおりなら完全一致で引ける
+    assert index.lookup("ビール").name == "ビール"
+    assert index.lookup("ビル").name == "ビル"
+    # 読みだけではどちらか決められない
+    for query in ["びーる", "びる", "biiru"]:
+        assert index.lookup(query) is None
+
+
+def test_unique_reading_key_still_resolves(index):
+    assert index.lookup("けとる").name == "ケトル"
+    assert index.lookup("ketoru").name == "ケトル"
+
+
+def test_shared_reading_key_suggests_every_item(index):
+    names = [hit.name for hit in index.suggest("びーる")]
+    assert "ビール" in names and "ビル" in names
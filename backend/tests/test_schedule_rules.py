@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from backend.app.schedule_rules import exception_from_dict, generate_dates, next_occurrence, nth_weekday_of_month
+
+# 2026-01-01 は木曜。年末年始の例外を「毎週木曜（一般ごみ）」「毎週木曜（プラ）」「第1水曜（燃えないごみ）」に当てる
+PATTERNS = {
+    "burn_thu": ("burnable", {"type": "weekly", "weekdays": ["THU"]}),
+    "plastic_thu": ("plastic", {"type": "weekly", "weekdays": ["THU"]}),
+    "nonburn_wed1": ("non_burnable", {"type": "monthly_nth_weekday", "nth": 1, "weekday": "WED"}),
+}
+START, END = date(2025, 12, 25), date(2026, 1, 15)
+
+
+def dates_by_pattern(*exceptions: dict) -> dict[str, list[str]]:
+    # seed_schedule と同じく、パターンごとに当てはまる例外だけを渡す
+    parsed = [exception_from_dict(e) for e in exceptions]
+    out = {}
+    for sg_id, (category_id, rule) in PATTERNS.items():
+        mine = [e for e in parsed if e.applies_to(sg_id, category_id)]
+        out[sg_id] = [d.isoformat() for d in generate_dates(rule, START, END, mine)]
+    return out
+
+
+def test_no_exceptions():
+    assert dates_by_pattern() == {
+        "burn_thu": ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-15"],
+        "plastic_thu": ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-15"],
+        "nonburn_wed1": ["2026-01-07"],
+    }
+
+
+def test_unscoped_skip_applies_to_every_pattern():
+    got = dates_by_pattern({"type": "skip", "start": "2025-12-31", "end": "2026-01-07"})
+    assert got["burn_thu"] == ["2025-12-25", "2026-01-08", "2026-01-15"]
+    assert got["plastic_thu"] == ["2025-12-25", "2026-01-08", "2026-01-15"]
+    assert got["nonburn_wed1"] == []
+
+
+def test_scoped_skip():
+    got = dates_by_pattern({"type": "skip", "start": "2026-01-01", "category_id": "burnable"})
+    assert got["burn_thu"] == ["2025-12-25", "2026-01-08", "2026-01-15"]
+    assert got["plastic_thu"] == ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-15"]
+    assert got["nonburn_wed1"] == ["2026-01-07"]
+
+
+def test_unscoped_substitute_moves_only_patterns_collecting_that_day():
+    got = dates_by_pattern({"type": "substitute", "date": "2026-01-01", "to": "2026-01-03"})
+    assert got["burn_thu"] == ["2025-12-25", "2026-01-03", "2026-01-08", "2026-01-15"]
+    assert got["plastic_thu"] == ["2025-12-25", "2026-01-03", "2026-01-08", "2026-01-15"]
+    # 1/1 に収集の無い第1水曜には 1/3 を足さない
+    assert got["nonburn_wed1"] == ["2026-01-07"]
+
+
+def test_scoped_substitute():
+    got = dates_by_pattern(
+        {"type": "substitute", "date": "2026-01-01", "to": "2026-01-03", "schedule_id": "plastic_thu"}
+    )
+    assert got["burn_thu"] == ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-15"]
+    assert got["plastic_thu"] == ["2025-12-25", "2026-01-03", "2026-01-08", "2026-01-15"]
+    assert got["nonburn_wed1"] == ["2026-01-07"]
+
+
+def test_unscoped_add_applies_to_every_pattern():
+    got = dates_by_pattern({"type": "add", "date": "2026-01-10"})
+    assert got["burn_thu"] == ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-10", "2026-01-15"]
+    assert got["plastic_thu"] == ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-10", "2026-01-15"]
+    assert got["nonburn_wed1"] == ["2026-01-07", "2026-01-10"]
+
+
+def test_scoped_add():
+    got = dates_by_pattern({"type": "add", "date": "2026-01-10", "category_id": "non_burnable"})
+    assert got["burn_thu"] == ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-15"]
+    assert got["nonburn_wed1"] == ["2026-01-07", "2026-01-10"]
+
+
+def test_add_on_a_rule_date_is_not_doubled():
+    got = dates_by_pattern({"type": "add", "date": "2026-01-08"})
+    assert got["burn_thu"] == ["2025-12-25", "2026-01-01", "2026-01-08", "2026-01-15"]
+
+
+def test_next_occurrence_after_the_moved_day():
+    # 1/1 より後から探しても、振替先は振り替えたパターンにだけ出る
+    exceptions = [exception_from_dict({"type": "substitute", "date": "2026-01-01", "to": "2026-01-03"})]
+    thu = PATTERNS["burn_thu"][1]
+    wed1 = PATTERNS["nonburn_wed1"][1]
+    assert next_occurrence(thu, date(2026, 1, 1), exceptions=exceptions) == date(2026, 1, 3)
+    assert next_occurrence(thu, date(2025, 12, 31), exceptions=exceptions) == date(2026, 1, 3)
+    assert next_occurrence(wed1, date(2026, 1, 1), exceptions=exceptions) == date(2026, 1, 7)
+
+
+def test_negative_nth_counts_from_the_end_of_the_month():
+    # 2026-01: 水曜は 7, 14, 21, 28 日 / 2026-04: 1, 8, 15, 22, 29 日
+    assert nth_weekday_of_month(2026, 1, 2, -1) == date(2026, 1, 28)
+    assert nth_weekday_of_month(2026, 1, 2, -4) == date(2026, 1, 7)
+    assert nth_weekday_of_month(2026, 1, 2, -5) is None
+    assert nth_weekday_of_month(2026, 4, 2, -5) == date(2026, 4, 1)
+
+
+def test_last_and_first_weekday_rule():
+    rule = {"type": "monthly_multiple_nth_weekday", "nth": [1, -1], "weekday": "WED"}
+    got = generate_dates(rule, date(2026, 1, 1), date(2026, 2, 28))
+    assert [d.isoformat() for d in got] == ["2026-01-07", "2026-01-28", "2026-02-04", "2026-02-25"]
+
+
+def test_next_occurrence_with_negative_nth():
+    rule = {"type": "monthly_nth_weekday", "nth": -1, "weekday": "WED"}
+    assert next_occurrence(rule, date(2026, 1, 27)) == date(2026, 1, 28)
+    assert next_occurrence(rule, date(2026, 1, 28)) == date(2026, 2, 25)
+    assert next_occurrence(rule, date(2026, 1, 28), inclusive=True) == date(2026, 1, 28)
+
+
+@pytest.mark.parametrize("nth", [0, 6, -6])
+def test_out_of_range_nth_is_rejected(nth):
+    with pytest.raises(ValueError):
+        generate_dates({"type": "monthly_nth_weekday", "nth": nth, "weekday": "WED"}, START, END)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from backend.app.db import seed_schedule
+from backend.app.db.seed_schedule import RAW_ITEMS_CSV
+
+REMOVED = "アイロン"
+
+
+@pytest.fixture
+def items_csv(tmp_path):
+    # 同梱の raw CSV から1行だけ抜いたもの
+    lines = RAW_ITEMS_CSV.read_text(encoding="utf-8-sig").splitlines(keepends=True)
+    kept = [line for line in lines if not line.startswith(f"{REMOVED},")]
+    assert len(kept) == len(lines) - 1
+    path = tmp_path / "items.csv"
+    path.write_text("".join(kept), encoding="utf-8")
+    return path
+
+
+def item_names(db) -> set[str]:
+    conn = sqlite3.connect(str(db))
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM items")}
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("full", [False, True], ids=["incremental", "full"])
+def test_reseed_removes_items_missing_from_the_csv(seeded_db, items_csv, full):
+    assert REMOVED in item_names(seeded_db)
+    argv = ["--db", str(seeded_db), "--items-csv", str(items_csv), "--no-export"]
+    seed_schedule.main(argv + (["--full"] if full else []))
+    names = item_names(seeded_db)
+    assert REMOVED not in names
+    assert "アイゼン" in names
+
+
+def test_later_edition_is_qualified_only_where_it_clashes(tmp_path):
+    # R8 は R7 を写して期間だけ変えたもの（地区グループ・パターンの id と名前が全部重なる）
+    r7 = (seed_schedule.SCHEDULE_DIR / "schedule_r7.yaml").read_text(encoding="utf-8")
+    (tmp_path / "schedule_r7.yaml").write_text(r7, encoding="utf-8")
+    r8 = r7.replace('effective_start: "2025-04-01"', 'effective_start: "2026-04-01"')
+    r8 = r8.replace('effective_end:   "2026-03-31"', 'effective_end:   "2027-03-31"')
+    (tmp_path / "schedule_r8.yaml").write_text(r8, encoding="utf-8")
+
+    plain = seed_schedule.load_schedule(tmp_path / "schedule_r7.yaml")
+    r7_edition, r8_edition = seed_schedule.load_schedule_editions(tmp_path)
+    # 先の版は YAML のまま
+    assert r7_edition.schedule["area_groups"] == plain["area_groups"]
+    assert r7_edition.schedule["schedule_groups"] == plain["schedule_groups"]
+    # 後の版だけ版が付く
+    g = r8_edition.schedule["schedule_groups"][0]
+    assert g["id"] == f"r8:{plain['schedule_groups'][0]['id']}"
+    assert g["name"] == f"[r8] {plain['schedule_groups'][0]['name']}"
+    link = r8_edition.schedule["area_group_schedule_links"][0]
+    assert link["area_group_id"].startswith("r8:")
+    assert all(x["schedule_id"].startswith("r8:") for x in link["schedules"])
+
+    db = tmp_path / "two.db"
+    seed_schedule.main(["--db", str(db), "--schedule-dir", str(tmp_path), "--no-export"])
+    conn = sqlite3.connect(str(db))
+    try:
+        counts = dict(conn.execute("SELECT source_id, COUNT(*) FROM schedule_groups GROUP BY source_id"))
+    finally:
+        conn.close()
+    assert counts == {"src_pdf_r7": len(plain["schedule_groups"]), "src_pdf_r8": len(plain["schedule_groups"])}